@@ -0,0 +1,428 @@
+"""
+Benchmark suite for the gobble tick engine and the candle data pipeline
+
+Times every case over seeded synthetic price series, reports throughput (ticks/s) and peak memory (tracemalloc),
+and saves the results as JSON so they can be compared between commits.
+
+Usage (from the repo root):
+    python -m benchmark.benchmark --sizes 1000 100000 --label before
+    python -m benchmark.benchmark --sizes 1000 100000 --label after --compare benchmark/results/before.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+import tracemalloc
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+import pandas as pd
+
+from gobble_tick.synthetic import gbm_prices, declining_prices, synthetic_candles
+
+RESULTS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), 'results'))
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+
+GENERATORS = {
+    'gbm': gbm_prices,
+    'decline': declining_prices,
+}
+
+
+def serve_candles(candles):
+    """Start a local stand-in for the Finnhub candle endpoint serving the given candles
+
+    Args:
+        candles (dict): column -> np.ndarray for t, o, h, l, c, v
+
+    Returns:
+        ThreadingHTTPServer: running server (call shutdown() when done)
+
+    """
+    class CandleHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            query = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+            start, stop = np.searchsorted(candles['t'], [int(query['from']), int(query['to']) + 1])
+            if start == stop:
+                json_data = {'s': 'no_data'}
+            else:
+                json_data = {column: values[start:stop].tolist() for column, values in candles.items()}
+                json_data['s'] = 'ok'
+
+            body = json.dumps(json_data).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), CandleHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class BenchmarkCase:
+    """A timed operation over synthetic data of a given size
+
+    Subclasses implement setup (untimed) returning the function to time, and optionally teardown.
+    """
+
+    name = None
+    max_size = None  # skip sizes above this (e.g. where a single run would take minutes)
+    generators = ('gbm',)
+    budget_seconds = None  # optional time budget, measurements over it are flagged (and fail the run)
+
+    def setup(self, prices, work_dir):
+        raise NotImplementedError
+
+    def teardown(self):
+        pass
+
+
+class GobbleTickRunCase(BenchmarkCase):
+    name = 'gobble_tick_run'
+    generators = ('gbm', 'decline')
+
+    def setup(self, prices, work_dir):
+        from gobble_tick.algorithm import GobbleTick
+
+        # Enough bank to keep buying on every tick
+        gt = GobbleTick(bank=1000 * len(prices), gobble_amount=1000, exit_rate=0.03)
+        price_df = pd.DataFrame({'price': prices})
+        return lambda: gt.run(price_df=price_df, to_file=False)
+
+
+class SweepCase(BenchmarkCase):
+    name = 'sweep_10x10'
+    max_size = 1_000_000
+    generators = ('gbm', 'decline')
+
+    def setup(self, prices, work_dir):
+        from gobble_tick.sweep import sweep
+
+        gobble_amounts = np.linspace(100, 5000, 10)
+        exit_rates = np.linspace(0.005, 0.1, 10)
+        return lambda: sweep(prices, bank=50000, gobble_amounts=gobble_amounts, exit_rates=exit_rates)
+
+
+class StoreInsertCase(BenchmarkCase):
+    name = 'candle_store_insert'
+
+    def setup(self, prices, work_dir):
+        from finnhub.store import CandleStore
+
+        candles = synthetic_candles(prices)
+        store_dir = os.path.join(work_dir, 'insert_store')
+
+        def insert():
+            shutil.rmtree(store_dir, ignore_errors=True)
+            CandleStore(store_dir).insert('SYN', '1', candles)
+        return insert
+
+
+class StoreLoadCase(BenchmarkCase):
+    name = 'candle_store_load'
+
+    def setup(self, prices, work_dir):
+        from finnhub.store import CandleStore
+
+        store = CandleStore(os.path.join(work_dir, 'load_store'))
+        store.insert('SYN', '1', synthetic_candles(prices))
+        return lambda: store.load_df('SYN', '1')['o'].sum()
+
+
+class CsvLoadCase(BenchmarkCase):
+    name = 'candle_csv_load'
+    max_size = 1_000_000
+
+    def setup(self, prices, work_dir):
+        from finnhub.api import FinnhubRequest
+
+        request = FinnhubRequest(symbol='SYN', resolution='1', count=len(prices))
+        request.CANDLE_DATA_OUTPUT_DIR = work_dir
+        df = pd.DataFrame(synthetic_candles(prices))
+        df['Date'] = pd.to_datetime(df['t'], unit='s')
+        df.to_csv(request.get_candle_data_file_path())
+        return lambda: request.get_candle_data(from_file=True, to_file=False)
+
+
+class ResampleCase(BenchmarkCase):
+    name = 'resample_1_to_D'
+
+    def setup(self, prices, work_dir):
+        from finnhub.resample import resample
+
+        candles = synthetic_candles(prices)
+        return lambda: resample(candles, resolution='D')
+
+
+class PagedFetchCase(BenchmarkCase):
+    name = 'paged_fetch_local'
+    max_size = 1_000_000
+
+    def setup(self, prices, work_dir):
+        from finnhub.api import FinnhubRequest
+        from finnhub.store import CandleStore
+        from finnhub.fetch import CandleFetcher
+
+        candles = synthetic_candles(prices)
+        self.server = serve_candles(candles)
+        self.candle_api = FinnhubRequest.CANDLE_API
+        FinnhubRequest.CANDLE_API = f"http://127.0.0.1:{self.server.server_port}/api/v1/stock/candle"
+
+        store_dir = os.path.join(work_dir, 'fetch_store')
+        request = FinnhubRequest(
+            symbol='SYN', resolution='1', from_time=int(candles['t'][0]), to_time=int(candles['t'][-1])
+        )
+
+        def fetch():
+            shutil.rmtree(store_dir, ignore_errors=True)
+            fetcher = CandleFetcher(store=CandleStore(store_dir), calls_per_minute=1_000_000)
+            return request.get_paged_candle_data(fetcher=fetcher)
+        return fetch
+
+    def teardown(self):
+        from finnhub.api import FinnhubRequest
+
+        FinnhubRequest.CANDLE_API = self.candle_api
+        self.server.shutdown()
+
+
+class GobbleTickPlotCase(BenchmarkCase):
+    name = 'gobble_tick_plot'
+    max_size = 100_000
+
+    def setup(self, prices, work_dir):
+        from gobble_tick.algorithm import GobbleTick
+        import gobble_tick.plot
+
+        candles = synthetic_candles(prices)
+        df = GobbleTick(bank=50000, gobble_amount=1000, exit_rate=0.03).run_from_finnhub_df(
+            df=pd.DataFrame(candles), to_file=False
+        )
+        df['Date'] = pd.to_datetime(df['t'], unit='s')
+        path = os.path.join(work_dir, 'gobble_tick_plot.html')
+        return lambda: gobble_tick.plot.multiplot_gobble_tick(df=df, name=path, auto_open=False)
+
+
+class CandlePlotCase(BenchmarkCase):
+    name = 'candle_plot'
+    max_size = 100_000
+
+    def setup(self, prices, work_dir):
+        from finnhub.api import FinnhubRequest
+
+        request = FinnhubRequest(symbol='SYN', resolution='1', count=len(prices))
+        request.CANDLE_PLOT_OUTPUT_DIR = work_dir
+        df = pd.DataFrame(synthetic_candles(prices))
+        df['Date'] = pd.to_datetime(df['t'], unit='s')
+        return lambda: request.plot_candle_data(df=df, auto_open=False)
+
+
+class CliRunColdStartCase(BenchmarkCase):
+    """`python -m gobble_tick.cli run` on cached candles in a fresh interpreter, start up and imports included"""
+    name = 'cli_run_cold_start'
+    max_size = 10_000
+    budget_seconds = 1.0
+
+    def setup(self, prices, work_dir):
+        df = pd.DataFrame(synthetic_candles(prices))
+        df['Date'] = pd.to_datetime(df['t'], unit='s')
+        df.to_csv(os.path.join(work_dir, f'SYN_{len(prices)}1.csv'))
+
+        command = [
+            sys.executable, '-m', 'gobble_tick.cli', 'run', 'SYN', '--resolution', '1', '--count', str(len(prices)),
+            '--candle-data-dir', work_dir, '--output-dir', work_dir,
+        ]
+        repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        return lambda: subprocess.run(command, cwd=repo_dir, check=True, capture_output=True)
+
+
+CASES = [
+    GobbleTickRunCase,
+    SweepCase,
+    StoreInsertCase,
+    StoreLoadCase,
+    CsvLoadCase,
+    ResampleCase,
+    PagedFetchCase,
+    GobbleTickPlotCase,
+    CandlePlotCase,
+    CliRunColdStartCase,
+]
+
+
+def measure(fn, repeat=1, memory=True):
+    """Time a function (best of `repeat` runs) and optionally measure its peak traced memory in a separate run
+
+    Returns:
+        tuple: (seconds, peak memory in bytes or None)
+
+    """
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - start)
+
+    # tracemalloc slows Python-heavy code down, so memory gets its own untimed run
+    peak_bytes = None
+    if memory:
+        tracemalloc.start()
+        try:
+            fn()
+            peak_bytes = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return min(seconds), peak_bytes
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, case_names=None, repeat=1, memory=True, seed=0):
+    """Run every case for every size and price generator
+
+    Args:
+        sizes (list): number of ticks to benchmark
+        case_names (list): optional subset of case names to run
+        repeat (int): number of timed runs per measurement (best is kept)
+        memory (bool): if True, measure peak memory too
+        seed (int): random seed of the synthetic prices
+
+    Returns:
+        list: one dict per measurement with case, generator, size, seconds, ticks_per_second and peak_mb
+
+    """
+    results = []
+    for case_class in CASES:
+        if case_names and case_class.name not in case_names:
+            continue
+
+        for generator in case_class.generators:
+            for size in sizes:
+                if case_class.max_size is not None and size > case_class.max_size:
+                    continue
+
+                prices = gbm_prices(size, seed=seed) if generator == 'gbm' else GENERATORS[generator](size)
+                case = case_class()
+                work_dir = tempfile.mkdtemp(prefix='gobble_tick_benchmark_')
+                try:
+                    fn = case.setup(prices=prices, work_dir=work_dir)
+                    seconds, peak_bytes = measure(fn, repeat=repeat, memory=memory)
+                finally:
+                    case.teardown()
+                    shutil.rmtree(work_dir, ignore_errors=True)
+
+                result = {
+                    'case': case_class.name,
+                    'generator': generator,
+                    'size': size,
+                    'seconds': seconds,
+                    'ticks_per_second': size / seconds if seconds else None,
+                    'peak_mb': peak_bytes / 2 ** 20 if peak_bytes is not None else None,
+                    'budget_seconds': case_class.budget_seconds,
+                    'over_budget': case_class.budget_seconds is not None and seconds > case_class.budget_seconds,
+                }
+                print(format_result(result), flush=True)
+                results.append(result)
+
+    return results
+
+
+def format_result(result):
+    peak = f"{result['peak_mb']:10.1f} MB" if result['peak_mb'] is not None else ''
+    over_budget = f" OVER BUDGET ({result['budget_seconds']} s)" if result.get('over_budget') else ''
+    return (
+        f"{result['case']:<22} {result['generator']:<8} {result['size']:>10,} "
+        f"{result['seconds']:10.4f} s {result['ticks_per_second']:14,.0f} ticks/s {peak}{over_budget}"
+    )
+
+
+def get_git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(__file__),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(results, label=None, path=None):
+    """Save results as JSON along with the commit and environment they were measured on
+
+    Returns:
+        str: output path
+
+    """
+    commit = get_git_commit()
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{label or commit or 'results'}.json")
+
+    with open(path, 'w') as f:
+        json.dump({
+            'label': label,
+            'commit': commit,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': sys.version.split()[0],
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'results': results,
+        }, f, indent=2)
+    return path
+
+
+def compare_results(baseline_path, results):
+    """Print speed-up of results over a saved baseline (>1 = faster now) for every matching measurement"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    baseline_seconds = {(r['case'], r['generator'], r['size']): r['seconds'] for r in baseline['results']}
+
+    print(f"\nCompared to {baseline.get('label') or baseline.get('commit')}:")
+    for result in results:
+        old_seconds = baseline_seconds.get((result['case'], result['generator'], result['size']))
+        if old_seconds:
+            speedup = old_seconds / result['seconds']
+            print(f"{result['case']:<22} {result['generator']:<8} {result['size']:>10,} {speedup:8.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="numbers of ticks")
+    parser.add_argument('--cases', nargs='+', choices=[case.name for case in CASES], help="subset of cases to run")
+    parser.add_argument('--repeat', type=int, default=1, help="timed runs per measurement (best is kept)")
+    parser.add_argument('--no-memory', action='store_true', help="skip peak memory measurement")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--label', help="name of the results file (defaults to the current commit)")
+    parser.add_argument('--output', help="explicit path of the results file")
+    parser.add_argument('--compare', help="results file to compare against")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(
+        sizes=args.sizes, case_names=args.cases, repeat=args.repeat, memory=not args.no_memory, seed=args.seed,
+    )
+    output_path = save_results(results, label=args.label, path=args.output)
+    print(f"Output to {output_path}")
+
+    if args.compare:
+        compare_results(args.compare, results)
+
+    if any(result['over_budget'] for result in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+"""
+Share counts and value of holdings through corporate actions (mergers, splits, spinoffs, conversions)
+
+Actions are applied in date order to running share counts, which only costs O(number of actions). Each one becomes a
+few share (and cash) deltas on the first trading date at or after its date, found by binary search on the sorted
+price index. Share counts and value over the whole history then come from cumulative sums of those deltas over the
+(dates x symbols) price panel.
+
+Action kinds (ratio = shares of the target per share of the symbol):
+  - split: symbol -> ratio * shares of itself (e.g. ratio 2 for a 2-for-1 split, 0.1 for a 1-for-10 reverse split)
+  - merger: symbol -> ratio * shares of target + cash per share, symbol is no longer held
+  - spinoff: symbol is kept, plus ratio * shares of target
+  - convert: symbol is sold and target bought at the same value, at both closes of that date (ratio ignored)
+"""
+import numpy as np
+import pandas as pd
+
+ACTION_KINDS = ('split', 'merger', 'spinoff', 'convert')
+
+# Columns of an actions table (target/ratio/cash default to None/1/0 when missing)
+ACTION_COLUMNS = ['date', 'symbol', 'kind', 'target', 'ratio', 'cash']
+
+
+def get_actions_df(actions):
+    """Actions table sorted by date (stable, so same-day actions keep their order)
+
+    Args:
+        actions: DataFrame or list of dicts with date, symbol, kind, and target/ratio/cash as needed (see module doc)
+
+    Returns:
+        DataFrame: ACTION_COLUMNS
+
+    """
+    actions_df = pd.DataFrame(actions).reindex(columns=ACTION_COLUMNS)
+    unknown_kinds = set(actions_df['kind']) - set(ACTION_KINDS)
+    if unknown_kinds:
+        raise ValueError(f"Unknown action kinds: {unknown_kinds}, expected one of {ACTION_KINDS}")
+
+    actions_df['ratio'] = actions_df['ratio'].fillna(1.0).astype(np.float64)
+    actions_df['cash'] = actions_df['cash'].fillna(0.0).astype(np.float64)
+    return actions_df.sort_values('date', kind='stable', ignore_index=True)
+
+
+def get_date_index(dates, date):
+    """Index of the first date at or after date in a sorted DatetimeIndex (len(dates) if after the last one)"""
+    return int(dates.searchsorted(get_timestamp(dates, date), side='left'))
+
+
+def get_timestamp(dates, date):
+    """date as a Timestamp comparable to dates (localized to their timezone if it has none)"""
+    date = pd.Timestamp(date)
+    if dates.tz is not None and date.tz is None:
+        date = date.tz_localize(dates.tz)
+    return date
+
+
+def get_holdings(prices, start_shares, actions, round_shares=False):
+    """Share counts, cash and value of holdings over a price history, through corporate actions
+
+    Args:
+        prices (DataFrame): close price per symbol (columns), indexed by sorted dates, including the targets of
+          mergers/spinoffs/conversions (NaN before a symbol trades, carried forward over gaps for valuation)
+        start_shares (dict): symbol -> number of shares held on the first date, i.e. after any action dated before
+          it (such actions are skipped)
+        actions: corporate actions, see get_actions_df
+        round_shares (bool): if True, round new share counts to whole shares
+
+    Returns:
+        dict:
+          - 'shares': DataFrame (dates x symbols) of shares held at the close of each date
+          - 'value': DataFrame (dates x symbols) of the value of those shares
+          - 'summary': DataFrame of cash, stock_val and value per date
+          - 'actions': DataFrame of the applied actions (date_index, shares before/after and cash received)
+
+    Raises:
+        ValueError: if a symbol held or named by an action is not a column of prices, or a conversion happens on a
+          date the symbol or its target has no close price
+
+    """
+    dates = pd.DatetimeIndex(prices.index)
+    symbols = list(prices.columns)
+    columns = {symbol: i for i, symbol in enumerate(symbols)}
+    close = prices.to_numpy(dtype=np.float64)
+    num_dates = len(dates)
+
+    actions_df = get_actions_df(actions)
+    named_symbols = set(start_shares) | set(actions_df['symbol']) | set(actions_df['target'].dropna())
+    unknown_symbols = named_symbols - set(symbols)
+    if unknown_symbols:
+        raise ValueError(f"No prices for symbols {sorted(unknown_symbols)}, expected columns of prices: {symbols}")
+
+    # Share and cash deltas per (date index, symbol column), applied in date order to running counts
+    delta_rows, delta_columns, delta_shares = [], [], []
+    cash_rows, cash_deltas = [], []
+    applied = []
+
+    def add_delta(row, symbol, delta):
+        if delta:
+            delta_rows.append(row)
+            delta_columns.append(columns[symbol])
+            delta_shares.append(delta)
+
+    shares = {}
+    for symbol, num_shares in start_shares.items():
+        shares[symbol] = num_shares
+        add_delta(0, symbol, num_shares)
+
+    for action in actions_df.to_dict(orient='records'):
+        row = get_date_index(dates, action['date'])
+        symbol = action['symbol']
+        num_shares = shares.get(symbol, 0)
+        if row >= num_dates or not num_shares or get_timestamp(dates, action['date']) < dates[0]:
+            continue
+
+        kind = action['kind']
+        target = symbol if kind == 'split' else action['target']
+        if kind == 'convert':
+            missing = [name for name in (symbol, target) if np.isnan(close[row, columns[name]])]
+            if missing:
+                raise ValueError(f"Cannot convert {symbol} into {target} on {dates[row]}: no close price for "
+                                 f"{', '.join(missing)}")
+            new_shares = num_shares * close[row, columns[symbol]] / close[row, columns[target]]
+        else:
+            new_shares = num_shares * action['ratio']
+        if round_shares:
+            new_shares = round(new_shares)
+
+        cash = num_shares * action['cash'] if kind == 'merger' else 0.0
+        if cash:
+            cash_rows.append(row)
+            cash_deltas.append(cash)
+
+        # The symbol's shares go away (or are replaced by the split count), target shares are added
+        if kind != 'spinoff':
+            add_delta(row, symbol, -num_shares)
+            shares[symbol] = 0
+        add_delta(row, target, new_shares)
+        shares[target] = shares.get(target, 0) + new_shares
+
+        applied.append({**action, 'date_index': row, 'date_applied': dates[row], 'shares': num_shares,
+                        'new_shares': new_shares, 'cash_received': cash})
+
+    # Share counts and cash of every date from cumulative sums of the deltas
+    share_panel = np.zeros((num_dates, len(symbols)))
+    np.add.at(share_panel, (np.asarray(delta_rows, dtype=np.int64), np.asarray(delta_columns, dtype=np.int64)),
+              np.asarray(delta_shares, dtype=np.float64))
+    share_panel = np.cumsum(share_panel, axis=0)
+
+    cash = np.zeros(num_dates)
+    np.add.at(cash, np.asarray(cash_rows, dtype=np.int64), np.asarray(cash_deltas, dtype=np.float64))
+    cash = np.cumsum(cash)
+
+    # Value at the last known close (symbols which don't trade yet are only held once they do)
+    mark_prices = prices.ffill().fillna(0.0).to_numpy(dtype=np.float64)
+    value_panel = share_panel * mark_prices
+    stock_value = value_panel.sum(axis=1)
+
+    return {
+        'shares': pd.DataFrame(share_panel, index=prices.index, columns=symbols),
+        'value': pd.DataFrame(value_panel, index=prices.index, columns=symbols),
+        'summary': pd.DataFrame({'cash': cash, 'stock_val': stock_value, 'value': cash + stock_value},
+                                index=prices.index),
+        'actions': pd.DataFrame(applied),
+    }
+
+
+if __name__ == '__main__':
+    # Example: 1000 shares of A, split 2-for-1, spinoff of 1 C per 4 A, then A merges into B for 0.5 B + $3 per share
+    example_dates = pd.date_range('2021-01-01', periods=10, freq='B')
+    example_prices = pd.DataFrame({
+        'A': np.linspace(100, 60, 10),
+        'B': np.linspace(90, 110, 10),
+        'C': [np.nan] * 3 + list(np.linspace(20, 25, 7)),
+    }, index=example_dates)
+    example_actions = [
+        {'date': '2021-01-04', 'symbol': 'A', 'kind': 'split', 'ratio': 2},
+        {'date': '2021-01-06', 'symbol': 'A', 'kind': 'spinoff', 'target': 'C', 'ratio': 0.25},
+        {'date': '2021-01-09', 'symbol': 'A', 'kind': 'merger', 'target': 'B', 'ratio': 0.5, 'cash': 3.0},
+    ]
+    example_holdings = get_holdings(example_prices, {'A': 1000}, example_actions)
+    print(pd.concat([example_holdings['shares'], example_holdings['summary']], axis=1))
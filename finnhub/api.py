@@ -3,14 +3,18 @@ https://finnhub.io/docs/api#stock-candles
 """
 import os
 import sys
+import time
 import pandas as pd
-import requests
 from datetime import datetime
-import plotly.express as px
-import plotly.graph_objects as go
 
 import logging
 
+from finnhub.store import CandleStore
+from finnhub.resample import decimate_candles
+
+# requests, plotly and finnhub.fetch are imported inside the methods that use them, so reading cached data does not
+# pay for the network and plotting imports
+
 # logging.basicConfig(stream=sys.stdout, level=logging.DEBUG)
 logger = logging.getLogger(__file__)
 
@@ -22,6 +26,18 @@ class FinnhubRequest:
     CANDLE_DATA_OUTPUT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), 'candle_data'))
     CANDLE_PLOT_OUTPUT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), 'candle_plot'))
 
+    # Length of one candle per resolution, used to split long ranges into pages
+    RESOLUTION_SECONDS = {
+        '1': 60, '5': 5 * 60, '15': 15 * 60, '30': 30 * 60, '60': 60 * 60,
+        'D': 24 * 60 * 60, 'W': 7 * 24 * 60 * 60, 'M': 31 * 24 * 60 * 60,
+    }
+
+    # Candles per page (counted over calendar time, so pages of market hours hold fewer than this)
+    MAX_CANDLES_PER_CALL = 5000
+
+    # Suggested candle budget for plots of long data (see plot_candle_data)
+    MAX_PLOT_CANDLES = 2000
+
     def __init__(self, symbol, resolution, count=None, from_time=None, to_time=None):
         """
 
@@ -92,14 +108,14 @@ class FinnhubRequest:
 
         # Otherwise get data from API request
         else:
-            r = requests.get(self.get_candle_request_url())
-            logger.info(r)
-            json_data = r.json()
-            logger.debug(json_data)
+            json_data = self.request_candle_json()
 
-            # todo catch json_data being 'no_data'
-            df = pd.DataFrame(json_data)
-            df['Date'] = df['t'].apply(datetime.fromtimestamp)
+            # Cache empty ranges too (as empty CSV) so they are not requested again
+            if json_data.get('s') == 'no_data':
+                df = pd.DataFrame(columns=['c', 'h', 'l', 'o', 's', 't', 'v', 'Date'])
+            else:
+                df = pd.DataFrame(json_data)
+                df['Date'] = df['t'].apply(datetime.fromtimestamp)
 
         # Write to CSV file if query doesn't already exist
         if to_file and not data_exists_on_file:
@@ -107,18 +123,198 @@ class FinnhubRequest:
 
         return df
 
+    def request_candle_json(self):
+        """Send API request to finnhub and return the raw JSON response (dict of candle column lists + 's' status)"""
+        import requests
+
+        r = requests.get(self.get_candle_request_url())
+        logger.info(r)
+        json_data = r.json()
+        logger.debug(json_data)
+        return json_data
+
+    def store_candle_json(self, store):
+        """Send API request to finnhub and store the response, see store_candle_response
+
+        Args:
+            store (CandleStore): store to insert into
+
+        Returns:
+            dict: raw JSON response
+
+        """
+        requested_at = int(time.time())
+        json_data = self.request_candle_json()
+        self.store_candle_response(store=store, json_data=json_data, requested_at=requested_at)
+        return json_data
+
+    def store_candle_response(self, store, json_data, requested_at):
+        """Insert the candles of a response to this request into a CandleStore and record the range as covered
+
+        Ranges which return 'no_data' are recorded as covered too. Coverage ends one candle length before the time
+        of the request, so the newest candle (which may still be in progress, or not published yet) is requested
+        again by the next refresh and its partial o/h/l/c/v replaced.
+
+        Args:
+            store (CandleStore): store to insert into
+            json_data (dict): raw JSON response to this request
+            requested_at (int): UNIX timestamp the request was sent at
+
+        """
+        status = json_data.get('s')
+
+        if status == 'ok':
+            num_new = store.insert(self.symbol, self.resolution, json_data)
+            logger.info(f"Stored {num_new} new candles for {self.get_candle_id()}")
+
+        # Only candles which had closed by the time of the request are final
+        last_final_time = requested_at - self.RESOLUTION_SECONDS[str(self.resolution)]
+
+        # Range of a count request is only known from the candles it returned
+        if self.count is None:
+            covered_from, covered_to = self.from_time, min(self.to_time, last_final_time)
+        elif status == 'ok':
+            covered_from, covered_to = min(json_data['t']), last_final_time
+        else:
+            return
+
+        if status in ('ok', 'no_data') and covered_from <= covered_to:
+            store.add_coverage(self.symbol, self.resolution, covered_from, covered_to)
+
+    def get_update_requests(self, store, to_time=None):
+        """Requests needed to bring a CandleStore up to date for this request
+
+        With from_time/to_time, only the parts of that range which were never requested are fetched, so a range
+        fully covered by local data needs no API call. With count, the first call sends this request as-is and later
+        refreshes request everything after the covered range up to to_time (default now). Coverage stops before the
+        newest candle of every response (see store_candle_response), so refreshes always re-request it.
+
+        Args:
+            store (CandleStore): store to check coverage of
+            to_time (int): optional UNIX timestamp to refresh count requests up to
+
+        Returns:
+            list: FinnhubRequest for every missing range (empty if nothing is missing)
+
+        """
+        now = int(time.time())
+        coverage = store.get_coverage(self.symbol, self.resolution)
+
+        if self.count is None:
+            missing_ranges = store.get_missing_ranges(self.symbol, self.resolution, self.from_time, min(self.to_time, now))
+            return [
+                FinnhubRequest(symbol=self.symbol, resolution=self.resolution, from_time=from_time, to_time=to_time)
+                for from_time, to_time in missing_ranges
+            ]
+
+        if not coverage:
+            return [self]
+
+        return [FinnhubRequest(
+            symbol=self.symbol,
+            resolution=self.resolution,
+            from_time=coverage[-1][1] + 1,
+            to_time=to_time if to_time is not None else now,
+        )]
+
+    def get_candle_store_data(self, store=None, refresh=True, to_time=None):
+        """Get candle data through the columnar CandleStore, only requesting candles it does not hold yet
+
+        Args:
+            store (CandleStore): optional store (defaults to finnhub/candle_store)
+            refresh (bool): if True, request and store missing candles before loading (see get_update_requests)
+            to_time (int): optional UNIX timestamp to refresh count requests up to
+
+        Returns:
+            DataFrame: stored candles in from_time/to_time (all stored candles for count requests)
+
+        """
+        store = store if store is not None else CandleStore()
+
+        if refresh:
+            for update_request in self.get_update_requests(store=store, to_time=to_time):
+                update_request.store_candle_json(store=store)
+
+        return store.load_df(self.symbol, self.resolution, from_time=self.from_time, to_time=self.to_time)
+
+    def get_page_requests(self, max_candles_per_call=MAX_CANDLES_PER_CALL):
+        """Split a from_time/to_time request into consecutive API-sized requests (pages)
+
+        Args:
+            max_candles_per_call (int): max number of candles to request per page
+
+        Returns:
+            list: FinnhubRequest for every page, covering [from_time, to_time] without overlap
+
+        """
+        if self.count is not None:
+            raise ValueError("Paging requires from_time and to_time instead of count")
+
+        page_seconds = self.RESOLUTION_SECONDS[str(self.resolution)] * max_candles_per_call
+        return [
+            FinnhubRequest(
+                symbol=self.symbol,
+                resolution=self.resolution,
+                from_time=page_from,
+                to_time=min(page_from + page_seconds - 1, self.to_time),
+            )
+            for page_from in range(self.from_time, self.to_time + 1, page_seconds)
+        ]
+
+    def get_paged_candle_data(self, store=None, fetcher=None, max_candles_per_call=MAX_CANDLES_PER_CALL):
+        """Download a long from_time/to_time range (e.g. years of 1 minute candles) as pages fetched in parallel
+
+        Only the missing parts of the range are requested. Pages are stitched together in the CandleStore, which
+        keeps a single candle per timestamp, so bars on page boundaries are never duplicated.
+
+        Args:
+            store (CandleStore): optional store (defaults to finnhub/candle_store, ignored if fetcher is given)
+            fetcher (CandleFetcher): optional fetcher to send the pages with (e.g. to share its rate limit)
+            max_candles_per_call (int): max number of candles to request per page
+
+        Returns:
+            DataFrame: contiguous typed candle data for [from_time, to_time]
+
+        """
+        from finnhub.fetch import CandleFetcher
+
+        fetcher = fetcher if fetcher is not None else CandleFetcher(store=store)
+
+        page_requests = [
+            page_request
+            for update_request in self.get_update_requests(store=fetcher.store)
+            for page_request in update_request.get_page_requests(max_candles_per_call=max_candles_per_call)
+        ]
+        fetcher.fetch_all(page_requests, missing_only=False)
+
+        return fetcher.store.load_df(self.symbol, self.resolution, from_time=self.from_time, to_time=self.to_time)
+
     def get_candle_data_file_path(self):
         return os.path.join(self.CANDLE_DATA_OUTPUT_DIR, f"{self.get_candle_id()}.csv")
 
     def quick_candle_line_data(self, df):
         """Plot candle data in simple line plot"""
+        import plotly.express as px
+
         melt_df = df.melt(id_vars=['Date'], value_vars=['o', 'c', 'h', 'l'])
         fig = px.line(data_frame=melt_df, x='Date', y='value', color='variable')
         fig.update_layout(title=self.symbol)
         fig.write_html(f'./basic_{self.get_candle_id()}.html')
 
-    def plot_candle_data(self, df, auto_open=True):
-        """Convenient method to visualize candle data"""
+    def plot_candle_data(self, df, auto_open=True, max_candles=None):
+        """Convenient method to visualize candle data
+
+        Args:
+            df (DataFrame): candle data
+            auto_open (bool): if True, open the plot in a browser
+            max_candles (int): optional candle budget, longer data is re-aggregated into this many candles to keep
+              the HTML small and responsive (e.g. MAX_PLOT_CANDLES for minute data)
+
+        """
+        import plotly.graph_objects as go
+
+        if max_candles is not None:
+            df = decimate_candles(df, max_candles=max_candles)
         fig = go.Figure(data=[go.Candlestick(x=df['Date'], open=df['o'], high=df['h'], low=df['l'], close=df['c'])])
         fig.write_html(os.path.join(self.CANDLE_PLOT_OUTPUT_DIR, f'{self.get_candle_id()}.html'), auto_open=auto_open)
 
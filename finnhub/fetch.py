@@ -0,0 +1,167 @@
+"""
+Bulk candle fetcher for many (symbol, resolution, range) requests at once
+
+Requests are sent from a thread pool sharing one pooled HTTP session, throttled by a token bucket to stay under
+Finnhub's per-minute limit, and retried with exponential backoff on 429 and 5xx responses. Responses are stored
+into the CandleStore from the calling thread as they arrive, so the store never sees concurrent writes.
+"""
+import time
+import threading
+import logging
+from datetime import timezone
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from finnhub.store import CandleStore
+
+logger = logging.getLogger(__file__)
+
+
+class TokenBucket:
+    """Thread-safe token bucket: allows bursts of `capacity` calls, refilled at `rate` calls per second"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available and take it"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class CandleFetcher:
+
+    # Finnhub free tier limit
+    CALLS_PER_MINUTE = 60
+    RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+    def __init__(self, store=None, max_workers=8, calls_per_minute=CALLS_PER_MINUTE, max_retries=5, backoff=1.0,
+                 timeout=30):
+        """
+
+        Args:
+            store (CandleStore): optional store to stream results into (defaults to finnhub/candle_store)
+            max_workers (int): number of concurrent requests (and pooled connections)
+            calls_per_minute (int): rate limit, also the burst size
+            max_retries (int): retries per request on 429/5xx, connection errors or timeouts
+            backoff (float): seconds to wait before the first retry, doubled on every retry (unless Retry-After is set)
+            timeout (float): seconds to wait for each response
+
+        """
+        self.store = store if store is not None else CandleStore()
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.rate_limiter = TokenBucket(rate=calls_per_minute / 60, capacity=calls_per_minute)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def request_json(self, finnhub_request):
+        """Send one request through the shared session, rate limited and retried
+
+        Args:
+            finnhub_request (FinnhubRequest): request to send
+
+        Returns:
+            tuple: (raw JSON response, UNIX timestamp the successful request was sent at)
+
+        """
+        url = finnhub_request.get_candle_request_url()
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            requested_at = int(time.time())
+            try:
+                r = self.session.get(url, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                retry_after = None
+            else:
+                if r.status_code not in self.RETRY_STATUS_CODES or attempt == self.max_retries:
+                    r.raise_for_status()
+                    return r.json(), requested_at
+                retry_after = get_retry_after(r.headers.get('Retry-After'))
+
+            wait = retry_after if retry_after is not None else self.backoff * 2 ** attempt
+            logger.info(f"Retrying {finnhub_request.get_candle_id()} in {wait}s (attempt {attempt + 1})")
+            time.sleep(wait)
+
+    def fetch(self, finnhub_requests, missing_only=True):
+        """Fetch many requests concurrently, storing each response as soon as it arrives
+
+        Args:
+            finnhub_requests (list): FinnhubRequest for every (symbol, resolution, range) to fetch
+            missing_only (bool): if True, only request what the store does not hold yet (see get_update_requests)
+
+        Yields:
+            tuple: (FinnhubRequest actually sent, raw JSON response), in order of arrival
+
+        """
+        if missing_only:
+            finnhub_requests = [
+                update_request
+                for finnhub_request in finnhub_requests
+                for update_request in finnhub_request.get_update_requests(store=self.store)
+            ]
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self.request_json, finnhub_request): finnhub_request
+                for finnhub_request in finnhub_requests
+            }
+            for future in as_completed(futures):
+                finnhub_request = futures[future]
+                json_data, requested_at = future.result()
+                finnhub_request.store_candle_response(store=self.store, json_data=json_data, requested_at=requested_at)
+                yield finnhub_request, json_data
+
+    def fetch_all(self, finnhub_requests, missing_only=True):
+        """Fetch many requests concurrently and wait for all of them, see fetch
+
+        Returns:
+            int: number of requests sent
+
+        """
+        return sum(1 for _ in self.fetch(finnhub_requests, missing_only=missing_only))
+
+
+def get_retry_after(value):
+    """Seconds to wait from a Retry-After header, given as a number of seconds or an HTTP date
+
+    Returns:
+        float: seconds to wait (0 if the date has passed), None if the header is missing or can't be parsed
+
+    """
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)  # HTTP dates are always GMT
+    return max(0.0, retry_at.timestamp() - time.time())
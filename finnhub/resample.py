@@ -0,0 +1,171 @@
+"""
+Build coarser candles locally from the finest resolution stored for a symbol
+
+One fine-grained fetch (e.g. 1 minute candles) then serves every coarser resolution without extra API calls, and all
+resolutions stay consistent with each other. Aggregation is vectorized over bucket boundaries:
+open = first, high = max, low = min, close = last, volume = sum, t = time of the first candle in the bucket.
+"""
+import numpy as np
+import pandas as pd
+
+from finnhub.store import CandleStore
+
+# Finnhub resolutions from finest to coarsest
+RESOLUTIONS = ['1', '5', '15', '30', '60', 'D', 'W', 'M']
+
+# Day/week/month boundaries are taken in the exchange's local time
+MARKET_TIMEZONE = 'America/New_York'
+
+
+def get_bucket_keys(t, resolution, tz=MARKET_TIMEZONE):
+    """Key of the candle at the given resolution each timestamp falls into (non-decreasing for sorted t)
+
+    Args:
+        t (np.ndarray): sorted UNIX timestamps
+        resolution (str): target resolution
+        tz (str): timezone of day/week/month boundaries
+
+    Returns:
+        np.ndarray: int64 bucket key per timestamp
+
+    """
+    t = np.asarray(t, dtype=np.int64)
+    resolution = str(resolution)
+
+    # Intraday buckets are whole minutes/hours, which line up with US market hours in any UTC offset
+    if resolution.isdigit():
+        return t // (int(resolution) * 60)
+
+    local = pd.to_datetime(t, unit='s', utc=True).tz_convert(tz)
+    if resolution == 'D':
+        return (local.year * 10000 + local.month * 100 + local.day).to_numpy(dtype=np.int64)
+    if resolution == 'W':
+        # Days since epoch of the Monday starting the week
+        days = local.tz_localize(None).normalize().to_numpy().astype('datetime64[D]').astype(np.int64)
+        return days - local.dayofweek.to_numpy()
+    if resolution == 'M':
+        return (local.year * 12 + local.month).to_numpy(dtype=np.int64)
+
+    raise ValueError(f"Unsupported resolution: {resolution}")
+
+
+def resample(columns, resolution, tz=MARKET_TIMEZONE):
+    """Aggregate candles into a coarser resolution
+
+    Args:
+        columns: DataFrame or dict of arrays with columns t, o, h, l, c, v sorted by t (e.g. CandleStore.load)
+        resolution (str): target resolution
+        tz (str): timezone of day/week/month boundaries
+
+    Returns:
+        dict: column -> np.ndarray of the resampled candles
+
+    """
+    t = np.asarray(columns['t'], dtype=np.int64)
+    if not len(t):
+        return {column: np.asarray(columns[column])[:0] for column in ['t', 'o', 'h', 'l', 'c', 'v']}
+
+    keys = get_bucket_keys(t, resolution=resolution, tz=tz)
+    return aggregate_buckets(columns, get_bucket_starts(keys))
+
+
+def get_bucket_starts(keys):
+    """Index of the first row of every run of equal (non-decreasing) bucket keys"""
+    return np.concatenate([[0], np.flatnonzero(keys[1:] != keys[:-1]) + 1])
+
+
+def aggregate_buckets(columns, starts):
+    """Aggregate consecutive candles into one candle per bucket
+
+    Args:
+        columns: DataFrame or dict of arrays with columns t, o, h, l, c, v
+        starts (np.ndarray): index of the first candle of every bucket (see get_bucket_starts)
+
+    Returns:
+        dict: column -> np.ndarray with one candle per bucket
+
+    """
+    t = np.asarray(columns['t'], dtype=np.int64)
+    ends = np.concatenate([starts[1:], [len(t)]]) - 1
+
+    return {
+        't': t[starts],
+        'o': np.asarray(columns['o'], dtype=np.float64)[starts],
+        'h': np.maximum.reduceat(np.asarray(columns['h'], dtype=np.float64), starts),
+        'l': np.minimum.reduceat(np.asarray(columns['l'], dtype=np.float64), starts),
+        'c': np.asarray(columns['c'], dtype=np.float64)[ends],
+        'v': np.add.reduceat(np.asarray(columns['v'], dtype=np.float64), starts),
+    }
+
+
+def decimate_candles(df, max_candles):
+    """Re-aggregate candles into at most max_candles evenly sized groups of consecutive candles, e.g. for plotting
+
+    Unlike resample, groups are by position rather than time, so the output size is bounded whatever the resolution.
+
+    Args:
+        df (DataFrame): candle data with columns t, o, h, l, c, v (and optionally Date)
+        max_candles (int): max number of candles to return
+
+    Returns:
+        DataFrame: decimated candles (df itself if it is small enough), Date = Date of the first candle of each group
+
+    """
+    num_candles = len(df.index)
+    if num_candles <= max_candles:
+        return df
+
+    starts = get_bucket_starts(np.arange(num_candles) * max_candles // num_candles)
+    decimated_df = pd.DataFrame(aggregate_buckets(df, starts))
+    if 'Date' in df.columns:
+        decimated_df['Date'] = df['Date'].to_numpy()[starts]
+    return decimated_df
+
+
+def get_finest_resolution(store, symbol):
+    """Finest resolution fetched (not derived) for a symbol in the store, None if there is none"""
+    stored = {resolution for stored_symbol, resolution in store.iter_datasets() if stored_symbol == symbol}
+    return next((resolution for resolution in RESOLUTIONS if resolution in stored), None)
+
+
+def get_derived_resolution_id(resolution, source_resolution):
+    """Dataset name of a resampled series in the store, kept apart from fetched data (e.g. 'D_from_1')"""
+    return f"{resolution}_from_{source_resolution}"
+
+
+def get_resampled_df(symbol, resolution, store=None, source_resolution=None, tz=MARKET_TIMEZONE):
+    """Get candles at a resolution by resampling the finest stored resolution, caching the result in the store
+
+    The cached series is brought up to date incrementally: only source candles from the last (possibly incomplete)
+    resampled candle onwards are aggregated again.
+
+    Args:
+        symbol (str): stock symbol
+        resolution (str): target resolution
+        store (CandleStore): optional store (defaults to finnhub/candle_store)
+        source_resolution (str): optional resolution to resample from (defaults to the finest one stored)
+        tz (str): timezone of day/week/month boundaries
+
+    Returns:
+        DataFrame: candles with the same columns as CandleStore.load_df
+
+    """
+    store = store if store is not None else CandleStore()
+    resolution = str(resolution)
+    source_resolution = source_resolution if source_resolution is not None else get_finest_resolution(store, symbol)
+
+    if source_resolution is None:
+        raise ValueError(f"No candle data stored for {symbol}")
+    if source_resolution == resolution:
+        return store.load_df(symbol, resolution)
+    if RESOLUTIONS.index(source_resolution) > RESOLUTIONS.index(resolution):
+        raise ValueError(f"Cannot resample {source_resolution} candles into finer {resolution} candles")
+
+    derived_id = get_derived_resolution_id(resolution, source_resolution)
+
+    # Last resampled candle may have been built from an incomplete bucket, so rebuild it along with newer ones
+    last_time = store.last_timestamp(symbol, derived_id)
+    source_columns = store.load(symbol, source_resolution, from_time=last_time)
+    store.insert(symbol, derived_id, resample(source_columns, resolution=resolution, tz=tz))
+
+    return store.load_df(symbol, derived_id)
@@ -0,0 +1,225 @@
+"""
+Columnar on-disk candle store
+
+One dataset per (symbol, resolution), stored as one raw binary file per column:
+    candle_store/<symbol>/<resolution>/<column>.bin
+
+Columns are typed (t = int64 UNIX timestamp, o/h/l/c/v = float64), appended in place and read back through memory
+maps, so loading a long history costs almost nothing until the data is actually touched.
+
+Each dataset also records which time ranges have been requested (coverage.json), including ranges which returned
+no data, so a request fully covered by local data never reaches the API and partly covered ones only fetch the gaps.
+"""
+import os
+import json
+import numpy as np
+import pandas as pd
+
+# Column name -> dtype, 't' is written last so an interrupted append never exposes a partial row
+CANDLE_COLUMNS = {
+    'o': np.dtype('<f8'),
+    'h': np.dtype('<f8'),
+    'l': np.dtype('<f8'),
+    'c': np.dtype('<f8'),
+    'v': np.dtype('<f8'),
+    't': np.dtype('<i8'),
+}
+
+
+class CandleStore:
+
+    STORE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), 'candle_store'))
+
+    def __init__(self, store_dir=None):
+        """
+
+        Args:
+            store_dir (str): optional root dir of the store (defaults to finnhub/candle_store)
+
+        """
+        self.store_dir = store_dir if store_dir is not None else self.STORE_DIR
+
+    def get_dataset_dir(self, symbol, resolution):
+        """Dir holding the column files of one (symbol, resolution) dataset"""
+        return os.path.join(self.store_dir, symbol, str(resolution))
+
+    def get_column_path(self, symbol, resolution, column):
+        return os.path.join(self.get_dataset_dir(symbol, resolution), f"{column}.bin")
+
+    def iter_datasets(self):
+        """Yield (symbol, resolution) of every dataset in the store"""
+        if not os.path.isdir(self.store_dir):
+            return
+        for symbol in sorted(os.listdir(self.store_dir)):
+            symbol_dir = os.path.join(self.store_dir, symbol)
+            for resolution in sorted(os.listdir(symbol_dir)):
+                yield symbol, resolution
+
+    def get_num_rows(self, symbol, resolution):
+        """Number of complete rows stored (shortest column, in case an append was interrupted)"""
+        num_rows = []
+        for column, dtype in CANDLE_COLUMNS.items():
+            path = self.get_column_path(symbol, resolution, column)
+            num_rows.append(os.path.getsize(path) // dtype.itemsize if os.path.exists(path) else 0)
+        return min(num_rows)
+
+    def load(self, symbol, resolution, from_time=None, to_time=None):
+        """Memory-map the columns of a dataset, optionally restricted to a time range
+
+        Args:
+            symbol (str): stock symbol
+            resolution (str): candle resolution
+            from_time (int): optional UNIX timestamp, first candle time to include
+            to_time (int): optional UNIX timestamp, last candle time to include
+
+        Returns:
+            dict: column -> read-only np.ndarray (memory mapped), sorted by 't'
+
+        """
+        num_rows = self.get_num_rows(symbol, resolution)
+        columns = {}
+        for column, dtype in CANDLE_COLUMNS.items():
+            if num_rows == 0:
+                columns[column] = np.empty(0, dtype=dtype)
+            else:
+                path = self.get_column_path(symbol, resolution, column)
+                columns[column] = np.memmap(path, dtype=dtype, mode='r', shape=(num_rows,))
+
+        # Timestamps are sorted, so the time range is a binary search
+        t = columns['t']
+        start = 0 if from_time is None else np.searchsorted(t, from_time, side='left')
+        stop = len(t) if to_time is None else np.searchsorted(t, to_time, side='right')
+        return {column: values[start:stop] for column, values in columns.items()}
+
+    def load_df(self, symbol, resolution, from_time=None, to_time=None):
+        """Load a dataset as DataFrame with the same columns as FinnhubRequest.get_candle_data ('Date' is UTC)"""
+        columns = self.load(symbol, resolution, from_time=from_time, to_time=to_time)
+        df = pd.DataFrame({column: columns[column] for column in ['c', 'h', 'l', 'o', 't', 'v']}, copy=False)
+        df['Date'] = pd.to_datetime(df['t'], unit='s')
+        return df
+
+    def last_timestamp(self, symbol, resolution):
+        """UNIX timestamp of the newest stored candle (None if nothing is stored)"""
+        num_rows = self.get_num_rows(symbol, resolution)
+        if num_rows == 0:
+            return None
+        t = np.memmap(self.get_column_path(symbol, resolution, 't'), dtype=CANDLE_COLUMNS['t'], mode='r')
+        return int(t[num_rows - 1])
+
+    def insert(self, symbol, resolution, candles):
+        """Add candles to a dataset
+
+        Candles which are all newer than the stored ones, or which only replace the newest stored ones (the usual
+        refresh, re-requesting the last candle), are appended in place. Anything else (e.g. filling an older gap) is
+        merged in and the dataset rewritten, newer data winning on equal timestamps.
+
+        Args:
+            symbol (str): stock symbol
+            resolution (str): candle resolution
+            candles: DataFrame or dict of arrays with (at least) columns t, o, h, l, c, v (e.g. Finnhub JSON)
+
+        Returns:
+            int: number of rows added to the dataset
+
+        """
+        t = np.asarray(candles['t'], dtype=CANDLE_COLUMNS['t'])
+        new_columns = {column: np.asarray(candles[column], dtype=dtype) for column, dtype in CANDLE_COLUMNS.items()}
+        if not len(t):
+            return 0
+
+        os.makedirs(self.get_dataset_dir(symbol, resolution), exist_ok=True)
+        num_rows = self.get_num_rows(symbol, resolution)
+
+        # Stored rows from the first new timestamp on, replaced in place if the new candles hold all of them
+        stored_t = self.load(symbol, resolution)['t']
+        num_kept_rows = int(np.searchsorted(stored_t, t.min(), side='left'))
+        is_tail_replaced = np.isin(stored_t[num_kept_rows:], t).all()
+        del stored_t  # Release the memory map before truncating its file
+
+        if is_tail_replaced:
+            keep = _last_per_timestamp(t)
+
+            # Also trims anything left over from an interrupted append before writing
+            for column, dtype in CANDLE_COLUMNS.items():
+                path = self.get_column_path(symbol, resolution, column)
+                with open(path, 'ab') as f:
+                    f.truncate(num_kept_rows * dtype.itemsize)
+                    f.write(new_columns[column][keep].tobytes())
+            return num_kept_rows + len(keep) - num_rows
+
+        # Stored rows first so new rows come last among equal timestamps and win
+        stored_columns = self.load(symbol, resolution)
+        merged_columns = {
+            column: np.concatenate([stored_columns[column], new_columns[column]]) for column in CANDLE_COLUMNS
+        }
+        keep = _last_per_timestamp(merged_columns['t'])
+        for column in CANDLE_COLUMNS:
+            path = self.get_column_path(symbol, resolution, column)
+            with open(f"{path}.tmp", 'wb') as f:
+                f.write(merged_columns[column][keep].tobytes())
+            os.replace(f"{path}.tmp", path)
+        return len(keep) - num_rows
+
+    def get_coverage_path(self, symbol, resolution):
+        return os.path.join(self.get_dataset_dir(symbol, resolution), 'coverage.json')
+
+    def get_coverage(self, symbol, resolution):
+        """Time ranges already requested for a dataset (including ones which returned no data)
+
+        Returns:
+            list: sorted, non-overlapping [from_time, to_time] UNIX timestamp ranges (inclusive)
+
+        """
+        path = self.get_coverage_path(symbol, resolution)
+        if not os.path.exists(path):
+            return []
+        with open(path) as f:
+            return json.load(f)
+
+    def add_coverage(self, symbol, resolution, from_time, to_time):
+        """Record that every candle in [from_time, to_time] is held, merging with touching/overlapping ranges"""
+        ranges = sorted(self.get_coverage(symbol, resolution) + [[int(from_time), int(to_time)]])
+
+        merged = [ranges[0]]
+        for range_from, range_to in ranges[1:]:
+            if range_from <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], range_to)
+            else:
+                merged.append([range_from, range_to])
+
+        os.makedirs(self.get_dataset_dir(symbol, resolution), exist_ok=True)
+        path = self.get_coverage_path(symbol, resolution)
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump(merged, f)
+        os.replace(f"{path}.tmp", path)
+        return merged
+
+    def get_missing_ranges(self, symbol, resolution, from_time, to_time):
+        """Parts of [from_time, to_time] which are not covered yet
+
+        Returns:
+            list: [from_time, to_time] UNIX timestamp ranges (inclusive) still to request
+
+        """
+        missing = []
+        start = from_time
+        for range_from, range_to in self.get_coverage(symbol, resolution):
+            if range_to < start:
+                continue
+            if range_from > to_time:
+                break
+            if range_from > start:
+                missing.append([start, range_from - 1])
+            start = range_to + 1
+        if start <= to_time:
+            missing.append([start, to_time])
+        return missing
+
+
+def _last_per_timestamp(t):
+    """Indices sorting t, keeping only the last occurrence of every timestamp"""
+    order = np.argsort(t, kind='stable')
+    sorted_t = t[order]
+    is_last = np.ones(len(order), dtype=bool)
+    is_last[:-1] = sorted_t[:-1] != sorted_t[1:]
+    return order[is_last]
@@ -0,0 +1,190 @@
+"""
+https://finnhub.io/docs/api#websocket-trades
+
+Finnhub's real-time trade stream, and a local stand-in server replaying stored candles or synthetic trades in the same
+message format:
+    -> {"type": "subscribe", "symbol": "SLAB"}
+    <- {"type": "trade", "data": [{"s": "SLAB", "p": 104.71, "t": 1582209000000, "v": 100}, ...]}
+(p = price, t = UNIX timestamp in milliseconds, v = volume)
+"""
+import json
+import time
+import asyncio
+import numpy as np
+
+from finnhub.websocket import serve
+
+TRADE_STREAM_URL = 'wss://ws.finnhub.io'
+
+# Trades per second of market time of synthetic trades (a liquid stock), so 1 minute bars hold 600 trades
+SYNTHETIC_TRADES_PER_SECOND = 10
+
+
+def get_trade_stream_url(token=None):
+    """URL of Finnhub's trade stream (token defaults to FinnhubRequest.TOKEN)"""
+    if token is None:
+        from finnhub.api import FinnhubRequest
+        token = FinnhubRequest.TOKEN
+    return f"{TRADE_STREAM_URL}?token={token}"
+
+
+async def subscribe(websocket, symbols):
+    """Subscribe to the trades of every symbol"""
+    for symbol in symbols:
+        await websocket.send(json.dumps({'type': 'subscribe', 'symbol': symbol}))
+
+
+def get_candle_trades(candles):
+    """Trades reproducing a series of candles: open, high, low and close of every candle, 1 ms apart
+
+    Aggregating them back at the candles' resolution gives the same o/h/l/c, with t = candle time and the volume of
+    each candle split evenly across its 4 trades.
+
+    Args:
+        candles: DataFrame or dict of arrays with columns t, o, h, l, c, v (e.g. FinnhubRequest.get_candle_data)
+
+    Returns:
+        dict: column -> np.ndarray for p (price), t (UNIX ms) and v (volume), sorted by t
+
+    """
+    t = np.asarray(candles['t'], dtype=np.int64) * 1000
+    return {
+        'p': np.stack([np.asarray(candles[column], dtype=np.float64) for column in 'ohlc'], axis=1).ravel(),
+        't': (t[:, None] + np.arange(4)).ravel(),
+        'v': np.repeat(np.asarray(candles['v'], dtype=np.float64) / 4, 4),
+    }
+
+
+def get_synthetic_trades(num_trades, seed=0, start_price=100.0, volatility=0.0002, start_time=1_600_000_000,
+                         trades_per_second=SYNTHETIC_TRADES_PER_SECOND):
+    """Seeded random walk of trades (log returns with the given per-trade volatility)
+
+    Args:
+        num_trades (int): number of trades
+        seed (int): random seed, same seed = same trades
+        start_price (float): price of the first trade
+        volatility (float): standard deviation of the log return between trades
+        start_time (int): UNIX timestamp (s) of the first trade
+        trades_per_second (float): trade rate in market time, sets how many bars the trades span (the replay rate is
+          set separately, see ReplayServer)
+
+    Returns:
+        dict: column -> np.ndarray for p (price), t (UNIX ms) and v (volume), sorted by t
+
+    """
+    rng = np.random.default_rng(seed)
+    log_returns = rng.normal(0, volatility, num_trades - 1)
+    return {
+        'p': np.round(start_price * np.exp(np.concatenate([[0.0], np.cumsum(log_returns)])), 2),
+        't': start_time * 1000 + (np.arange(num_trades) * 1000 // trades_per_second).astype(np.int64),
+        'v': rng.integers(1, 500, num_trades).astype(np.float64),
+    }
+
+
+class ReplayServer:
+    """Local stand-in for Finnhub's trade stream
+
+    Every subscription replays that symbol's trades from the start, in messages of batch_size trades, paced to
+    trades_per_second (as fast as the client reads if None). Sends wait on the connection, so a slow client shows up
+    as lag behind the pace (see get_stats). The connection is closed once every subscribed symbol has been replayed.
+    """
+
+    def __init__(self, trades_by_symbol, trades_per_second=None, batch_size=100, host='127.0.0.1', port=0):
+        """
+
+        Args:
+            trades_by_symbol (dict): symbol -> trades (see get_candle_trades, get_synthetic_trades)
+            trades_per_second (float): replay rate per symbol, None = unthrottled
+            batch_size (int): trades per message
+            host (str): host to listen on
+            port (int): port to listen on, 0 = any free port
+
+        """
+        self.trades_by_symbol = trades_by_symbol
+        self.trades_per_second = trades_per_second
+        self.batch_size = batch_size
+        self.host = host
+        self.port = port
+        self.server = None
+        self.url = None
+        self.stats = {'messages': 0, 'trades': 0, 'max_lag': 0.0}
+
+    async def start(self):
+        """Start listening
+
+        Returns:
+            str: ws:// URL of the server
+
+        """
+        self.server = await serve(self.handle, self.host, self.port)
+        host, port = self.server.sockets[0].getsockname()[:2]
+        self.url = f"ws://{host}:{port}"
+        return self.url
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def handle(self, websocket, path):
+        """Serve one connection: replay every symbol it subscribes to, until all are done"""
+        replays = []
+        subscribed = asyncio.Event()
+
+        async def read_subscriptions():
+            while True:
+                message = json.loads(await websocket.recv())
+                if message.get('type') == 'subscribe' and message.get('symbol') in self.trades_by_symbol:
+                    replays.append(asyncio.create_task(self.replay(websocket, message['symbol'])))
+                    subscribed.set()
+
+        reader = asyncio.create_task(read_subscriptions())
+        wait_subscribed = asyncio.create_task(subscribed.wait())
+        await asyncio.wait([reader, wait_subscribed], return_when=asyncio.FIRST_COMPLETED)
+        wait_subscribed.cancel()
+
+        # Subscriptions can keep coming in while replaying
+        while not all(replay.done() for replay in replays):
+            await asyncio.wait(replays)
+        reader.cancel()
+        await asyncio.gather(reader, *replays, return_exceptions=True)
+
+    async def replay(self, websocket, symbol):
+        """Send all trades of a symbol, paced to trades_per_second"""
+        trades = self.trades_by_symbol[symbol]
+        prices = np.asarray(trades['p'], dtype=np.float64).tolist()
+        times = np.asarray(trades['t'], dtype=np.int64).tolist()
+        volumes = np.asarray(trades['v'], dtype=np.float64).tolist()
+
+        start = time.perf_counter()
+        for batch_start in range(0, len(prices), self.batch_size):
+            batch_end = batch_start + self.batch_size
+            if self.trades_per_second is not None:
+                # Pace the stream and measure how far behind it is when the client can't keep up
+                due = start + batch_start / self.trades_per_second
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    self.stats['max_lag'] = max(self.stats['max_lag'], -delay)
+
+            data = [{'s': symbol, 'p': p, 't': t, 'v': v}
+                    for p, t, v in zip(prices[batch_start:batch_end], times[batch_start:batch_end],
+                                       volumes[batch_start:batch_end])]
+            await websocket.send(json.dumps({'type': 'trade', 'data': data}))
+            self.stats['messages'] += 1
+            self.stats['trades'] += len(data)
+
+            # Let other replays and the connection's reader run between batches
+            await asyncio.sleep(0)
+
+    def get_stats(self):
+        """Messages and trades sent, and max lag (s) behind the replay pace"""
+        return dict(self.stats)
@@ -0,0 +1,253 @@
+"""
+Minimal WebSocket (RFC 6455) client and server on asyncio streams
+
+Only what the Finnhub trade stream needs: text messages, ping/pong and close, no extensions or fragmented sends.
+Kept on the standard library so streaming has no extra dependency.
+"""
+import os
+import ssl
+import base64
+import struct
+import asyncio
+import hashlib
+from urllib.parse import urlsplit
+
+GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+OP_CONTINUATION = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+# Largest message accepted from the peer
+MAX_MESSAGE_BYTES = 2 ** 24
+
+
+class ConnectionClosed(Exception):
+    """The peer closed the connection (or it was lost)"""
+
+
+def get_accept_key(key):
+    """Sec-WebSocket-Accept value of a Sec-WebSocket-Key"""
+    return base64.b64encode(hashlib.sha1((key + GUID).encode()).digest()).decode()
+
+
+def apply_mask(payload, mask):
+    """XOR payload with the 4 byte mask (masking and unmasking are the same operation)"""
+    if not payload:
+        return payload
+    repeated_mask = (mask * (len(payload) // 4 + 1))[:len(payload)]
+    return (int.from_bytes(payload, 'little') ^ int.from_bytes(repeated_mask, 'little')).to_bytes(len(payload),
+                                                                                                 'little')
+
+
+class WebSocket:
+    """One open WebSocket connection (client side masks its frames, server side doesn't)"""
+
+    def __init__(self, reader, writer, is_client):
+        self.reader = reader
+        self.writer = writer
+        self.is_client = is_client
+        self.closed = False
+
+    async def send(self, message):
+        """Send a text message (str) or binary message (bytes)"""
+        if isinstance(message, str):
+            await self.send_frame(OP_TEXT, message.encode())
+        else:
+            await self.send_frame(OP_BINARY, message)
+
+    async def send_frame(self, opcode, payload):
+        if self.closed:
+            raise ConnectionClosed()
+
+        length = len(payload)
+        mask_bit = 0x80 if self.is_client else 0
+        if length < 126:
+            header = struct.pack('!BB', 0x80 | opcode, mask_bit | length)
+        elif length < 2 ** 16:
+            header = struct.pack('!BBH', 0x80 | opcode, mask_bit | 126, length)
+        else:
+            header = struct.pack('!BBQ', 0x80 | opcode, mask_bit | 127, length)
+
+        if self.is_client:
+            mask = os.urandom(4)
+            header += mask
+            payload = apply_mask(payload, mask)
+
+        self.writer.write(header + payload)
+        try:
+            # Waits while the peer is slow to read, so senders can't run ahead of the connection
+            await self.writer.drain()
+        except ConnectionError as e:
+            self.closed = True
+            raise ConnectionClosed() from e
+
+    async def recv(self):
+        """Receive the next message (answering pings along the way)
+
+        Returns:
+            str or bytes: text or binary message
+
+        Raises:
+            ConnectionClosed: if the peer closed the connection
+
+        """
+        fragments = []
+        message_opcode = None
+        while True:
+            opcode, fin, payload = await self.recv_frame()
+
+            if opcode == OP_PING:
+                await self.send_frame(OP_PONG, payload)
+                continue
+            if opcode == OP_PONG:
+                continue
+            if opcode == OP_CLOSE:
+                await self.close()
+                raise ConnectionClosed()
+
+            if opcode != OP_CONTINUATION:
+                message_opcode = opcode
+            fragments.append(payload)
+            if fin:
+                message = b''.join(fragments)
+                return message.decode() if message_opcode == OP_TEXT else message
+
+    async def recv_frame(self):
+        try:
+            first, second = await self.reader.readexactly(2)
+            length = second & 0x7F
+            if length == 126:
+                length, = struct.unpack('!H', await self.reader.readexactly(2))
+            elif length == 127:
+                length, = struct.unpack('!Q', await self.reader.readexactly(8))
+            if length > MAX_MESSAGE_BYTES:
+                raise ConnectionClosed(f"Frame of {length} bytes is over {MAX_MESSAGE_BYTES}")
+
+            mask = await self.reader.readexactly(4) if second & 0x80 else None
+            payload = await self.reader.readexactly(length)
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            self.closed = True
+            raise ConnectionClosed() from e
+
+        if mask is not None:
+            payload = apply_mask(payload, mask)
+        return first & 0x0F, bool(first & 0x80), payload
+
+    async def close(self):
+        """Send a close frame (if still open) and close the connection"""
+        if not self.closed:
+            try:
+                await self.send_frame(OP_CLOSE, b'')
+            except ConnectionClosed:
+                pass
+            self.closed = True
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return await self.recv()
+        except ConnectionClosed:
+            raise StopAsyncIteration
+
+
+async def connect(url):
+    """Open a client connection to a ws:// or wss:// URL
+
+    Returns:
+        WebSocket: open connection
+
+    """
+    parts = urlsplit(url)
+    is_secure = parts.scheme == 'wss'
+    port = parts.port or (443 if is_secure else 80)
+    reader, writer = await asyncio.open_connection(
+        parts.hostname, port, ssl=ssl.create_default_context() if is_secure else None
+    )
+
+    key = base64.b64encode(os.urandom(16)).decode()
+    path = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+    writer.write((
+        f"GET {path} HTTP/1.1\r\n"
+        f"Host: {parts.hostname}:{port}\r\n"
+        "Upgrade: websocket\r\n"
+        "Connection: Upgrade\r\n"
+        f"Sec-WebSocket-Key: {key}\r\n"
+        "Sec-WebSocket-Version: 13\r\n"
+        "\r\n"
+    ).encode())
+    await writer.drain()
+
+    status_line, headers = await _read_http_head(reader)
+    if ' 101 ' not in status_line or headers.get('sec-websocket-accept') != get_accept_key(key):
+        writer.close()
+        raise ConnectionError(f"WebSocket handshake with {url} failed: {status_line}")
+    return WebSocket(reader, writer, is_client=True)
+
+
+async def serve(handler, host='127.0.0.1', port=0):
+    """Start a WebSocket server calling `await handler(websocket, path)` for every connection
+
+    Returns:
+        asyncio.Server: running server (port=0 picks a free port, see server.sockets[0].getsockname())
+
+    """
+    async def on_connection(reader, writer):
+        try:
+            request_line, headers = await _read_http_head(reader)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            return
+
+        key = headers.get('sec-websocket-key')
+        if key is None or headers.get('upgrade', '').lower() != 'websocket':
+            writer.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n")
+            writer.close()
+            return
+
+        writer.write((
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {get_accept_key(key)}\r\n"
+            "\r\n"
+        ).encode())
+        await writer.drain()
+
+        websocket = WebSocket(reader, writer, is_client=False)
+        try:
+            await handler(websocket, request_line.split(' ')[1])
+        except ConnectionClosed:
+            pass
+        finally:
+            await websocket.close()
+
+    return await asyncio.start_server(on_connection, host, port)
+
+
+async def _read_http_head(reader):
+    """First line and headers (lower case names) of an HTTP request/response"""
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    return lines[0], headers
@@ -1,13 +1,21 @@
 """
 Gobble Tick Algorithm
 
-todo: use resistance/support indicators to dynamically change the gobble amount
-todo: use resistance/support indicators to dynamically change the exit rate
+The gobble amount and exit rate can change every tick through gobble_fn / exit_rate_fn, e.g. the support/resistance
+and ATR rules of gobble_tick.indicators
 
 """
 import os
+import copy
+import json
+import time
+import heapq
+import numpy as np
 import pandas as pd
 from pandas import DataFrame
+
+from gobble_tick.sweep import first_passage
+
 pd.options.display.width = 0
 pd.options.display.max_rows = 1000
 pd.options.display.max_columns = 999
@@ -23,13 +31,18 @@ class GobbleTick:
 
     DATA_OUTPUT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), 'data'))
 
-    def __init__(self, bank, gobble_amount, exit_rate):
+    def __init__(self, bank, gobble_amount, exit_rate, instrumentation=None, gobble_fn=None, exit_rate_fn=None):
         """
 
         Args:
             bank (int): amount of money in bank (in dollars)
             gobble_amount (int): amount of money to use to purchase stock each tick
             exit_rate (float): rate above buying price to target to sell (e.g. 0.01 = sell at 1% above buying price)
+            instrumentation (Instrumentation): optional collector of phase timers, counters and per-tick callbacks
+            gobble_fn (callable): optional fn(price, candle) -> gobble amount of each tick, overrides gobble_amount;
+              called once per tick in order, so it can keep streaming indicators (see gobble_tick.indicators), and
+              its reset() method (if any) is called on reset
+            exit_rate_fn (callable): optional fn(price, candle) -> exit rate of each tick, overrides exit_rate
         """
         # Make sure output paths exist
         os.makedirs(self.DATA_OUTPUT_PATH, exist_ok=True)
@@ -37,150 +50,420 @@ class GobbleTick:
         self.bank = bank
         self.gobble_amount = gobble_amount
         self.exit_rate = exit_rate
+        self.instrumentation = instrumentation
+        self.gobble_fn = gobble_fn
+        self.exit_rate_fn = exit_rate_fn
+
+        self.reset()
 
     def get_id(self):
-        """Create unique ID to store results"""
-        return f"{self.bank}_{self.gobble_amount}_{self.exit_rate}"
+        """Create unique ID to store results (dynamic parameters are labeled by the name of their function)"""
+        gobble_id = self.gobble_amount if self.gobble_fn is None else _get_fn_name(self.gobble_fn)
+        exit_rate_id = self.exit_rate if self.exit_rate_fn is None else _get_fn_name(self.exit_rate_fn)
+        return f"{self.bank}_{gobble_id}_{exit_rate_id}"
 
-    def run_from_finnhub_df(self, df, to_file=True, input_label=None):
-        """Run algorithm on data directly from Finnhub by selecting the 'o' (open) column as the price target"""
-        if input_label is not None:
-            self.DATA_OUTPUT_PATH = os.path.join(self.DATA_OUTPUT_PATH, input_label)
-            os.makedirs(self.DATA_OUTPUT_PATH, exist_ok=True)
+    def reset(self):
+        """Clear the incremental (on_tick) state: full bank, no open positions, back to tick 0"""
+        self.tick = 0  # number of ticks processed so far
+        self.timestamp = None  # timestamp of the last processed tick
+        self.bank_value = self.bank  # value held in cash
+        self.num_stocks_open = 0  # num stocks held
 
-        df['price'] = df['o']
-        return self.run(price_df=df, to_file=to_file)
+        # Open positions as a heap of (target, tick, gobble, enter) so each tick only touches the positions it closes
+        self.open_lots = []
 
-    def run(self, price_df, to_file=True, input_label=None):
-        """Run and store the algorithm in tabular form for tweaking and performance review
+        # Restart the indicators of dynamic parameters
+        for fn in (self.gobble_fn, self.exit_rate_fn):
+            if hasattr(fn, 'reset'):
+                fn.reset()
+
+    def on_tick(self, price, timestamp=None, candle=None):
+        """Advance the algorithm by a single tick, buying and selling against the incremental state
+
+        Costs O(log n) in the number of open positions, plus the positions closed on this tick.
 
         Args:
-            price_df (DataFrame): pandas DataFrame containing 'price' column
-            to_file (bool): if True, output data to CSV file
-            input_label (str): optional additional dir level to label based off of input dataset
+            price (float): stock price at this tick
+            timestamp: optional label of this tick (e.g. UNIX timestamp of the candle), kept in the state
+            candle (dict): optional candle of this tick ('h', 'l', 'c', ...), passed to gobble_fn / exit_rate_fn
 
         Returns:
-            DataFrame: df containing full algorithm context
+            dict: action taken on this tick
+              - tick, timestamp, price
+              - gobble, enter, target: num stocks bought, cash spent and target selling price of the new position
+              - exits: list of (tick, exit) for every position closed, by opening tick and cash made
+              - profit: profit made on exiting all positions on this tick
+              - bank, stock, stock_val, value: holdings after this action
 
         """
-        if input_label is not None:
-            self.DATA_OUTPUT_PATH = os.path.join(self.DATA_OUTPUT_PATH, input_label)
-            os.makedirs(self.DATA_OUTPUT_PATH, exist_ok=True)
+        i = self.tick
 
-        price_df_columns = price_df.columns
-        if 'price' in price_df_columns:
-            df = price_df
+        instrumentation = self.instrumentation
+        if instrumentation is not None:
+            phase_start = time.perf_counter()
+
+        # Carry the bank over from the previous tick (seeded with the starting bank)
+        bank_start = self.bank_value
+
+        # Parameters of this tick
+        gobble_amount = self.gobble_amount if self.gobble_fn is None else self.gobble_fn(price, candle)
+        exit_rate = self.exit_rate if self.exit_rate_fn is None else self.exit_rate_fn(price, candle)
+
+        # Limited to money in the bank
+        if bank_start < gobble_amount:
+            buy_in = bank_start
         else:
-            raise ValueError(f"price_df does not contain 'price' column: {price_df_columns}")
+            buy_in = gobble_amount
+
+        # Calculate tick buy-in
+        gobble = round(buy_in / price)
+        enter_total = gobble * price
+        target = price * (1 + exit_rate)
+
+        heapq.heappush(self.open_lots, (target, i, gobble, enter_total))
+        self.num_stocks_open += gobble
+
+        if instrumentation is not None:
+            phase_end = time.perf_counter()
+            instrumentation.add_time('entry', phase_end - phase_start)
+            phase_start = phase_end
+
+        # All positions which have reached the target and can be sold
+        close_lots = []
+        while self.open_lots and self.open_lots[0][0] <= price:
+            close_lots.append(heapq.heappop(self.open_lots))
+
+        # Exercise close and sum all gains (in tick order to keep float sums stable)
+        exits = []
+        closed_returns = 0
+        closed_profit = 0
+        for _, close_i, close_gobble, close_enter in sorted(close_lots, key=lambda lot: lot[1]):
+            # EXIT HERE
+            exit_total = price * close_gobble
+            exits.append((close_i, exit_total))
+            closed_returns += exit_total
+
+            exit_profit = exit_total - close_enter
+            closed_profit += exit_profit
+
+            self.num_stocks_open -= close_gobble
+
+        if instrumentation is not None:
+            phase_end = time.perf_counter()
+            instrumentation.add_time('exit_matching', phase_end - phase_start)
+            phase_start = phase_end
+
+        # Calculate bank value after this action
+        bank_value = bank_start - enter_total
+        bank_value += closed_returns
+        self.bank_value = bank_value
+
+        # Calculate stock value after this action
+        stock_value = price * self.num_stocks_open
+
+        self.tick = i + 1
+        self.timestamp = timestamp
+
+        action = {
+            'tick': i,
+            'timestamp': timestamp,
+            'price': price,
+            'gobble': gobble,
+            'enter': enter_total,
+            'target': target,
+            'exits': exits,
+            'profit': closed_profit,
+            'bank': bank_value,
+            'stock': self.num_stocks_open,
+            'stock_val': stock_value,
+            'value': bank_value + stock_value,
+        }
+
+        if instrumentation is not None:
+            instrumentation.add_time('valuation', time.perf_counter() - phase_start)
+            instrumentation.record_tick(
+                action=action, num_open_lots=len(self.open_lots), bank_exhausted=bank_start < gobble_amount
+            )
+
+        return action
+
+    def get_state(self):
+        """Snapshot the incremental state as JSON-serializable dict (see set_state)
+
+        Indicators of gobble_fn / exit_rate_fn are not part of the snapshot, they restart from the resumed tick.
+        """
+        return {
+            'bank': self.bank,
+            'gobble_amount': self.gobble_amount,
+            'exit_rate': self.exit_rate,
+            'tick': self.tick,
+            'timestamp': self.timestamp,
+            'bank_value': self.bank_value,
+            'num_stocks_open': self.num_stocks_open,
+            'open_lots': [list(lot) for lot in self.open_lots],
+        }
+
+    def set_state(self, state):
+        """Resume from a snapshot created by get_state
 
-        bank = self.bank
-        gobble_amount = self.gobble_amount
-        exit_rate = self.exit_rate
+        Args:
+            state (dict): output of GobbleTick.get_state
+
+        """
+        params = (state['bank'], state['gobble_amount'], state['exit_rate'])
+        if params != (self.bank, self.gobble_amount, self.exit_rate):
+            raise ValueError(f"State was created with different (bank, gobble_amount, exit_rate): {params}")
+
+        self.tick = state['tick']
+        self.timestamp = state['timestamp']
+        self.bank_value = state['bank_value']
+        self.num_stocks_open = state['num_stocks_open']
+
+        # Stored in heap order, so no need to re-heapify
+        self.open_lots = [tuple(lot) for lot in state['open_lots']]
+
+    @classmethod
+    def from_state(cls, state, **kwargs):
+        """Create GobbleTick and resume from a snapshot created by get_state (kwargs = other __init__ args)"""
+        gt = cls(bank=state['bank'], gobble_amount=state['gobble_amount'], exit_rate=state['exit_rate'], **kwargs)
+        gt.set_state(state)
+        return gt
+
+    def save_state(self, path):
+        """Save incremental state to JSON file, e.g. at the end of a daily job
 
-        df['enter'] = [None] * len(df.index)  # cash spent on opening position
-        df['target'] = [None] * len(df.index)  # target selling price
-        df['exit'] = [None] * len(df.index)  # cash made on exiting position
+        Args:
+            path (str): output JSON path
+
+        Returns:
+            str: output path
 
-        df['profit'] = [None] * len(df.index)  # profit made on exiting all positions on this tick
+        """
+        with open(path, 'w') as f:
+            json.dump(self.get_state(), f)
+        return path
+
+    @classmethod
+    def load_state(cls, path, **kwargs):
+        """Create GobbleTick from JSON file written by save_state (kwargs = other __init__ args)"""
+        with open(path) as f:
+            return cls.from_state(json.load(f), **kwargs)
 
-        df['bank'] = [None] * len(df.index)  # value held in cash
-        df['stock'] = [None] * len(df.index)  # num stocks held
-        df['stock_val'] = [None] * len(df.index)  # value held in stocks
-        df['value'] = [None] * len(df.index)  # value held total
+    def run_from_finnhub_df(self, df, to_file=True, input_label=None, cache=None):
+        """Run algorithm on data directly from Finnhub by selecting the 'o' (open) column as the price target"""
+        return self.run(price_df=df.assign(price=df['o']), to_file=to_file, input_label=input_label, cache=cache)
 
-        # df['price'] = df['c']  # use closing stock price in this example
-        df['tick'] = df.index  # tick = arbitrary unit of time, in this case use index of passed in data set
-        df['gobble'] = [None] * len(df.index)  # gobble = num stocks to purchase at given tick
+    def run(self, price_df, to_file=True, input_label=None, cache=None):
+        """Run and store the algorithm in tabular form for tweaking and performance review
 
-        # Iterate over rows (downwards) to simulate passing time
-        for i, row in df.iterrows():
-            price = row['price']
+        Every tick goes through on_tick on a fresh copy of this instance, so the incremental state is left untouched.
+        Results are collected in typed NumPy arrays (NaN = position never exited) and joined onto a new frame at the
+        end, so price_df itself is not modified.
 
-            # Seed the bank for the first row
-            bank_start = bank if i == 0 else df.at[i-1, 'bank']
+        Args:
+            price_df (DataFrame): pandas DataFrame containing 'price' column
+            to_file (bool): if True, output data to CSV file
+            input_label (str): optional additional dir level to label based off of input dataset
+            cache (ResultCache): optional result cache, runs over the same prices and parameters are loaded from it
+              instead of simulated again (see gobble_tick.cache); not used with gobble_fn / exit_rate_fn
 
-            # Limited to money in the bank
-            if bank_start < gobble_amount:
-                buy_in = bank_start
-            else:
-                buy_in = gobble_amount
+        Returns:
+            DataFrame: new df containing price_df columns plus full algorithm context
 
-            # Calculate tick buy-in
-            gobble = round(buy_in / price)
-            enter_total = gobble * price
-            target = price * (1 + exit_rate)
+        """
+        price_df_columns = price_df.columns
+        if 'price' not in price_df_columns:
+            raise ValueError(f"price_df does not contain 'price' column: {price_df_columns}")
 
-            df.at[i, 'gobble'] = gobble
-            df.at[i, 'enter'] = enter_total
-            df.at[i, 'target'] = target
+        bank = self.bank
+        prices = price_df['price'].to_numpy(dtype=np.float64)
+
+        # Dynamic parameters may use any candle column, and can't be keyed in the cache
+        is_dynamic = self.gobble_fn is not None or self.exit_rate_fn is not None
+        candles = price_df if is_dynamic else None
+        if is_dynamic:
+            cache = None
+
+        columns = None
+        if cache is not None:
+            cache_key = cache.get_key(
+                prices, kind='run', bank=bank, gobble_amount=self.gobble_amount, exit_rate=self.exit_rate
+            )
+            columns = cache.get(cache_key)
+
+        if columns is None:
+            columns = self.simulate(prices, candles=candles)
+            if cache is not None:
+                cache.put(cache_key, columns)
+
+        df = price_df.assign(
+            enter=columns['enter'],
+            target=columns['target'],
+            exit=columns['exit'],
+            profit=columns['profit'],
+            bank=columns['bank'],
+            stock=columns['stock'],
+            stock_val=columns['stock_val'],
+            value=columns['value'],
+            tick=price_df.index,  # tick = arbitrary unit of time, in this case use index of passed in data set
+            gobble=columns['gobble'],
+            gain=columns['value'] / bank,
+            stock_gain=prices / prices[0] if len(prices) else prices,
+        )
 
-            past_df = df[df.index <= i]
-            # print(past_df)
+        if to_file:
+            if self.instrumentation is not None:
+                phase_start = time.perf_counter()
 
-            # All positions which are currently open (held as stock)
-            open_df = past_df[pd.isnull(past_df['exit'])]
+            self.output_data_to_file(df=df, input_label=input_label)
 
-            # All positions which have reached the target and can be sold
-            close_df = open_df[(open_df['target'] <= price)]
+            if self.instrumentation is not None:
+                self.instrumentation.add_time('file_output', time.perf_counter() - phase_start)
 
-            # Exercise close and sum all gains
-            closed_returns = 0
-            closed_profit = 0
-            for close_i, close_row in close_df.iterrows():
-                # EXIT HERE
-                exit_total = price * close_row['gobble']
-                df.at[close_i, 'exit'] = exit_total
-                closed_returns += exit_total
+        return df
 
-                exit_profit = exit_total - close_row['enter']
-                closed_profit += exit_profit
+    def simulate(self, prices, candles=None):
+        """Feed every price through on_tick on a fresh copy of this instance and collect the results
 
-            # Amount of money made exiting positions this tick
-            df.at[i, 'profit'] = closed_profit
+        Args:
+            prices (np.ndarray): price at each tick
+            candles (DataFrame): optional candle of each tick (row per tick), passed to gobble_fn / exit_rate_fn
 
-            # Calculate bank value after this action
-            bank_value = bank_start - enter_total
-            bank_value += closed_returns
-            df.at[i, 'bank'] = bank_value
+        Returns:
+            dict: column -> np.ndarray for enter, target, exit, profit, bank, stock, stock_val, value and gobble
+              (see run)
 
-            # Calculate stock value after this action
-            still_open_df = df[(df.index <= i) & pd.isnull(df['exit'])]
-            num_stocks_open = still_open_df['gobble'].sum()
-            df.at[i, 'stock'] = num_stocks_open
-            stock_value = price * num_stocks_open
-            df.at[i, 'stock_val'] = stock_value
+        """
+        engine = copy.copy(self)
+        engine.gobble_fn = copy.deepcopy(self.gobble_fn)
+        engine.exit_rate_fn = copy.deepcopy(self.exit_rate_fn)
+        engine.reset()
+
+        num_ticks = len(prices)
+        enter_col = np.empty(num_ticks)  # cash spent on opening position
+        target_col = np.empty(num_ticks)  # target selling price
+        exit_col = np.full(num_ticks, np.nan)  # cash made on exiting position
+
+        profit_col = np.empty(num_ticks)  # profit made on exiting all positions on this tick
+
+        bank_col = np.empty(num_ticks)  # value held in cash
+        stock_col = np.empty(num_ticks, dtype=np.int64)  # num stocks held
+        stock_val_col = np.empty(num_ticks)  # value held in stocks
+        value_col = np.empty(num_ticks)  # value held total
+
+        gobble_col = np.empty(num_ticks, dtype=np.int64)  # gobble = num stocks to purchase at given tick
+
+        tick_candles = [None] * num_ticks if candles is None else candles.to_dict('records')
+
+        # Iterate over prices (downwards) to simulate passing time
+        for i, (price, candle) in enumerate(zip(np.asarray(prices, dtype=np.float64).tolist(), tick_candles)):
+            action = engine.on_tick(price=price, candle=candle)
+
+            gobble_col[i] = action['gobble']
+            enter_col[i] = action['enter']
+            target_col[i] = action['target']
+
+            for close_i, exit_total in action['exits']:
+                exit_col[close_i] = exit_total
+
+            profit_col[i] = action['profit']
+            bank_col[i] = action['bank']
+            stock_col[i] = action['stock']
+            stock_val_col[i] = action['stock_val']
+            value_col[i] = action['value']
+
+        return {
+            'enter': enter_col,
+            'target': target_col,
+            'exit': exit_col,
+            'profit': profit_col,
+            'bank': bank_col,
+            'stock': stock_col,
+            'stock_val': stock_val_col,
+            'value': value_col,
+            'gobble': gobble_col,
+        }
+
+    def get_trades(self, df, to_file=False, input_label=None):
+        """Build the trade ledger of a run: one row per position (lot) opened with a non-zero number of stocks
 
-            # Calculate total value after this action
-            total_value = bank_value + stock_value
-            df.at[i, 'value'] = total_value
+        Args:
+            df (DataFrame): output of GobbleTick.run method
+            to_file (bool): if True, output ledger to CSV file next to the run output
+            input_label (str): optional additional dir level to label based off of input dataset
 
-            # print(df.head(10))
-            # if i > 10:
-            #     break
+        Returns:
+            DataFrame: ledger with entry/exit tick, stocks, prices, cash in/out, profit and holding period (in ticks)
+              of every lot; exit columns are -1/NaN for lots which are still open at the end of the run
 
-        df['gain'] = df['value'] / bank
-        df['stock_gain'] = df['price'] / df.at[0, 'price']
+        """
+        prices = df['price'].to_numpy(dtype=np.float64)
+        gobble = df['gobble'].to_numpy(dtype=np.int64)
+        lot_ticks = np.flatnonzero(gobble)
+
+        # Positions close on the first tick at or after entry which reaches their target
+        exit_ticks = first_passage(prices, df['target'].to_numpy(dtype=np.float64))[lot_ticks]
+        is_closed = exit_ticks < len(prices)
+
+        exit_prices = np.where(is_closed, prices[np.minimum(exit_ticks, len(prices) - 1)], np.nan)
+        enter = df['enter'].to_numpy(dtype=np.float64)[lot_ticks]
+        exit_total = exit_prices * gobble[lot_ticks]
+
+        trades_df = pd.DataFrame({
+            'entry_tick': lot_ticks,
+            'exit_tick': np.where(is_closed, exit_ticks, -1),
+            'stock': gobble[lot_ticks],
+            'entry_price': prices[lot_ticks],
+            'exit_price': exit_prices,
+            'enter': enter,
+            'exit': exit_total,
+            'profit': exit_total - enter,
+            'holding_ticks': np.where(is_closed, exit_ticks - lot_ticks, np.nan),
+        })
 
         if to_file:
-            self.output_data_to_file(df=df)
+            output_dir = self.get_output_dir(input_label=input_label)
+            trades_df.to_csv(os.path.join(output_dir, f"{self.get_id()}_trades.csv"))
 
-        return df
+        return trades_df
+
+    def get_output_dir(self, input_label=None):
+        """Form output dir for results and create it if needed
+
+        The instance is never mutated, so the same GobbleTick can be run on many inputs (or in many processes)
+
+        Args:
+            input_label (str): optional additional dir level to label based off of input dataset
+
+        Returns:
+            str: output dir
+
+        """
+        output_dir = self.DATA_OUTPUT_PATH if input_label is None else os.path.join(self.DATA_OUTPUT_PATH, input_label)
+        os.makedirs(output_dir, exist_ok=True)
+        return output_dir
 
-    def output_data_to_file(self, df):
+    def output_data_to_file(self, df, input_label=None):
         """Output algorithm data to file
 
         Args:
             df (DataFrame): output of GobbleTick.run method
+            input_label (str): optional additional dir level to label based off of input dataset
 
         Returns:
             str: output path
 
         """
-        output_path = os.path.join(self.DATA_OUTPUT_PATH, f"{self.get_id()}.csv")
+        output_path = os.path.join(self.get_output_dir(input_label=input_label), f"{self.get_id()}.csv")
         df.to_csv(output_path)
         return output_path
 
 
+def _get_fn_name(fn):
+    """Name of a function or callable object, to label dynamic parameters"""
+    return getattr(fn, '__name__', type(fn).__name__)
+
+
 def run_example():
     import finnhub.api
 
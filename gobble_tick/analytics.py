@@ -0,0 +1,150 @@
+"""
+Vectorized performance analytics for gobble tick runs
+
+Every metric works on the last axis of its inputs (ticks, or lots for trade metrics), so the same call covers a single
+run (1-D arrays) or a whole batch of runs (e.g. the (combinations x ticks) output of gobble_tick.sweep.sweep_paths).
+Lot-level inputs use NaN for lots which are still open (or padding).
+"""
+import numpy as np
+import pandas as pd
+
+# Number of ticks per year for each Finnhub resolution (390 trading minutes per day)
+TICKS_PER_YEAR = {'1': 252 * 390, '5': 252 * 78, '15': 252 * 26, '30': 252 * 13, '60': 252 * 7, 'D': 252, 'W': 52, 'M': 12}
+
+
+def max_drawdown(value):
+    """Largest drop from a running peak, as a fraction of that peak"""
+    value = np.asarray(value, dtype=np.float64)
+    peak = np.maximum.accumulate(value, axis=-1)
+    return np.max(1 - value / peak, axis=-1)
+
+
+def cagr(value, ticks_per_year):
+    """Compound annual growth rate between the first and last tick (NaN for a single tick)"""
+    value = np.asarray(value, dtype=np.float64)
+    years = (value.shape[-1] - 1) / ticks_per_year
+    if years == 0:
+        return np.full(value.shape[:-1], np.nan)[()]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (value[..., -1] / value[..., 0]) ** (1 / years) - 1
+
+
+def sharpe_ratio(value, ticks_per_year, risk_free_rate=0.0):
+    """Annualized Sharpe ratio of the tick-to-tick returns of value"""
+    value = np.asarray(value, dtype=np.float64)
+    excess_returns = value[..., 1:] / value[..., :-1] - 1 - risk_free_rate / ticks_per_year
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return excess_returns.mean(axis=-1) / excess_returns.std(axis=-1, ddof=1) * np.sqrt(ticks_per_year)
+
+
+def win_rate(trade_profit):
+    """Fraction of closed lots with positive profit (NaN lots are ignored)"""
+    trade_profit = np.asarray(trade_profit, dtype=np.float64)
+    num_closed = np.sum(~np.isnan(trade_profit), axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.sum(trade_profit > 0, axis=-1) / num_closed
+
+
+def average_holding(holding_ticks):
+    """Average number of ticks closed lots were held (NaN lots are ignored)"""
+    holding_ticks = np.asarray(holding_ticks, dtype=np.float64)
+    num_closed = np.sum(~np.isnan(holding_ticks), axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.nansum(holding_ticks, axis=-1) / num_closed
+
+
+def peak_capital_deployed(bank, profit, start_bank):
+    """Largest amount of cash tied up in open positions (at cost) at any tick
+
+    Cash out of the bank is the cost of open positions plus realized profit, so cost = start + profit so far - bank
+    """
+    bank = np.asarray(bank, dtype=np.float64)
+    deployed = start_bank + np.cumsum(profit, axis=-1) - bank
+    return np.max(deployed, axis=-1)
+
+
+def summarize(value, bank, profit, trade_profit, holding_ticks, start_bank, ticks_per_year):
+    """Compute every metric at once
+
+    Args:
+        value (np.ndarray): (..., ticks) total value
+        bank (np.ndarray): (..., ticks) value held in cash
+        profit (np.ndarray): (..., ticks) profit made on exiting positions at each tick
+        trade_profit (np.ndarray): (..., lots) profit of each lot, NaN if still open
+        holding_ticks (np.ndarray): (..., lots) holding period of each lot, NaN if still open
+        start_bank (float): bank at the start of the run(s)
+        ticks_per_year (float): e.g. TICKS_PER_YEAR['D']
+
+    Returns:
+        dict: metric name -> array of shape (...)
+
+    """
+    value = np.asarray(value, dtype=np.float64)
+    return {
+        'gain': value[..., -1] / start_bank,
+        'max_drawdown': max_drawdown(value),
+        'cagr': cagr(value, ticks_per_year=ticks_per_year),
+        'sharpe': sharpe_ratio(value, ticks_per_year=ticks_per_year),
+        'win_rate': win_rate(trade_profit),
+        'avg_holding_ticks': average_holding(holding_ticks),
+        'peak_capital_deployed': peak_capital_deployed(bank, profit, start_bank=start_bank),
+    }
+
+
+def summarize_run(df, trades_df, start_bank, ticks_per_year):
+    """Summarize a single run
+
+    Args:
+        df (DataFrame): output of GobbleTick.run
+        trades_df (DataFrame): output of GobbleTick.get_trades
+        start_bank (float): bank at the start of the run
+        ticks_per_year (float): e.g. TICKS_PER_YEAR['D']
+
+    Returns:
+        pd.Series: metric name -> value
+
+    """
+    metrics = summarize(
+        value=df['value'].to_numpy(),
+        bank=df['bank'].to_numpy(),
+        profit=df['profit'].to_numpy(),
+        trade_profit=trades_df['profit'].to_numpy(),
+        holding_ticks=trades_df['holding_ticks'].to_numpy(),
+        start_bank=start_bank,
+        ticks_per_year=ticks_per_year,
+    )
+    return pd.Series({name: float(metric) for name, metric in metrics.items()})
+
+
+def summarize_sweep_paths(paths, start_bank, ticks_per_year):
+    """Summarize every combination of a sweep at once
+
+    Args:
+        paths (dict): output of gobble_tick.sweep.sweep_paths
+        start_bank (float): bank at the start of every run
+        ticks_per_year (float): e.g. TICKS_PER_YEAR['D']
+
+    Returns:
+        DataFrame: one row per combination with gobble_amount, exit_rate and every metric
+
+    """
+    prices = paths['price']
+    num_ticks = len(prices)
+    exit_tick = paths['exit_tick']
+
+    # One lot per (combination, tick): NaN unless stocks were bought and the lot exited
+    is_closed = (paths['gobble'] != 0) & (exit_tick < num_ticks)
+    exit_price = prices[np.minimum(exit_tick, num_ticks - 1)]
+    trade_profit = np.where(is_closed, paths['gobble'] * (exit_price - prices), np.nan)
+    holding_ticks = np.where(is_closed, exit_tick - np.arange(num_ticks), np.nan)
+
+    metrics = summarize(
+        value=paths['value'],
+        bank=paths['bank'],
+        profit=paths['profit'],
+        trade_profit=trade_profit,
+        holding_ticks=holding_ticks,
+        start_bank=start_bank,
+        ticks_per_year=ticks_per_year,
+    )
+    return pd.DataFrame({'gobble_amount': paths['gobble_amount'], 'exit_rate': paths['exit_rate'], **metrics})
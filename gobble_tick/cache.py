@@ -0,0 +1,152 @@
+"""
+Content-addressed cache of gobble tick results
+
+Results are keyed by a hash of the input price series, the parameters and ENGINE_VERSION, so a run is reused
+whenever the same prices and parameters come back (whatever the file or label they came from), and results of
+changed input data or an older engine are never returned. Entries are stored as .npz files of NumPy arrays and
+evicted least recently used first once the cache grows over its size limit.
+"""
+import os
+import json
+import hashlib
+import zipfile
+import numpy as np
+
+# Bump whenever the output of GobbleTick.run or gobble_tick.sweep.sweep changes, to invalidate every cached result
+ENGINE_VERSION = 1
+
+
+def hash_prices(prices):
+    """SHA-256 hex digest of a price series (as float64), identifies the input of a run"""
+    return hashlib.sha256(np.ascontiguousarray(prices, dtype=np.float64).tobytes()).hexdigest()
+
+
+class ResultCache:
+    """Size-bounded on-disk cache of named NumPy arrays
+
+    Access time is tracked through file modification times (touched on every hit), so recency survives restarts
+    and is shared by every process using the same cache dir.
+    """
+
+    CACHE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), 'cache'))
+
+    # Default size limit of all entries together
+    MAX_BYTES = 2 ** 30
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        """
+
+        Args:
+            cache_dir (str): optional cache dir (defaults to gobble_tick/cache)
+            max_bytes (int): optional size limit (defaults to MAX_BYTES)
+
+        """
+        self.cache_dir = cache_dir if cache_dir is not None else self.CACHE_DIR
+        self.max_bytes = max_bytes if max_bytes is not None else self.MAX_BYTES
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def get_key(prices, kind, **params):
+        """Hash of a price series, the kind of result (e.g. 'run' or 'sweep'), parameters and ENGINE_VERSION
+
+        Numbers are compared as floats, so e.g. bank=50000 and bank=50000.0 share an entry.
+
+        Returns:
+            str: hex digest
+
+        """
+        params = {name: float(value) for name, value in params.items()}
+
+        digest = hashlib.sha256()
+        digest.update(json.dumps({'kind': kind, 'engine_version': ENGINE_VERSION, 'params': params}, sort_keys=True)
+                      .encode())
+        digest.update(hash_prices(prices).encode())
+        return digest.hexdigest()
+
+    def get_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def get(self, key):
+        """Load an entry and mark it as recently used
+
+        Returns:
+            dict: name -> np.ndarray, None if the key is not cached
+
+        """
+        path = self.get_path(key)
+        try:
+            with np.load(path) as npz:
+                arrays = {name: npz[name] for name in npz.files}
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, zipfile.BadZipFile):
+            # Unreadable (e.g. truncated) entry, treat as missing so it gets recomputed and overwritten
+            return None
+        return arrays
+
+    def put(self, key, arrays):
+        """Store an entry (replacing any previous one) and evict old entries if the cache is over its size limit
+
+        Args:
+            key (str): see get_key
+            arrays (dict): name -> array-like
+
+        Returns:
+            str: path of the entry
+
+        """
+        path = self.get_path(key)
+
+        # Written to a temporary file first, so other processes never read a partial entry
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+
+        self.evict()
+        return path
+
+    def get_entries(self):
+        """(modification time, size, path) of every entry, least recently used first"""
+        entries = []
+        with os.scandir(self.cache_dir) as dir_entries:
+            for dir_entry in dir_entries:
+                if dir_entry.name.endswith('.npz'):
+                    stat = dir_entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, dir_entry.path))
+        return sorted(entries)
+
+    def get_size(self):
+        """Total size of all entries in bytes"""
+        return sum(size for _, size, _ in self.get_entries())
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes
+
+        Returns:
+            int: number of entries removed
+
+        """
+        entries = self.get_entries()
+        total_size = sum(size for _, size, _ in entries)
+
+        num_removed = 0
+        for _, size, path in entries:
+            if total_size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+            num_removed += 1
+        return num_removed
+
+    def clear(self):
+        """Remove every entry"""
+        for _, _, path in self.get_entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
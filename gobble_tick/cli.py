@@ -0,0 +1,464 @@
+"""
+Command line entry point: fetch candles, run the gobble tick algorithm, sweep or search parameters, walk forward
+over start dates, run it over Monte Carlo paths, paper trade it on a trade stream and plot results
+
+Usage (from the repo root):
+    python -m gobble_tick.cli fetch SLAB --resolution D --count 100
+    python -m gobble_tick.cli run SLAB --resolution D --count 100 --gobble-amount 1000 --exit-rate 0.03
+    python -m gobble_tick.cli sweep SLAB --resolution D --count 100 --gobble-amounts 500 1000 --exit-rates 0.01 0.03
+    python -m gobble_tick.cli search SLAB --resolution D --count 100 --gobble-amounts 250 5000 30 --method hyperband
+    python -m gobble_tick.cli walk SLAB --resolution D --count 100 --window 20
+    python -m gobble_tick.cli montecarlo SLAB --resolution D --count 100 --paths 100000 --ticks 250 --float32
+    python -m gobble_tick.cli paper AAA BBB --synthetic 100000 --trades-per-second 5000 --bar-resolution 1
+    python -m gobble_tick.cli plot gobble_tick/data/SLAB_100D/50000_1000_0.03.csv
+
+Only the standard library is imported at module level. Every subcommand imports what it needs when it runs, so
+`run` on cached candles never loads plotly or requests, and sweep workers only load the NumPy engine.
+"""
+import os
+import sys
+import time
+import argparse
+
+START_TIME = time.perf_counter()
+
+
+def number(value):
+    """Parse an int if the value is whole (keeps result names like 50000_1000_0.03), float otherwise"""
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+def get_finnhub_request(args):
+    """FinnhubRequest of the candles selected on the command line (for a single symbol)"""
+    from finnhub.api import FinnhubRequest
+
+    request = FinnhubRequest(
+        symbol=args.symbol, resolution=args.resolution, count=args.count, from_time=args.from_time,
+        to_time=args.to_time,
+    )
+    if args.candle_data_dir is not None:
+        request.CANDLE_DATA_OUTPUT_DIR = args.candle_data_dir
+        os.makedirs(args.candle_data_dir, exist_ok=True)
+    return request
+
+
+def get_cache(args):
+    """ResultCache selected on the command line, None if caching is off"""
+    if not args.cache:
+        return None
+
+    from gobble_tick.cache import ResultCache
+
+    return ResultCache(cache_dir=args.cache_dir)
+
+
+def get_candle_df(request, args):
+    """Candles of a request from the CSV cache (default) or the CandleStore, requesting them if they are missing"""
+    if not args.store:
+        return request.get_candle_data(to_file=True)
+
+    if request.count is None:
+        return request.get_paged_candle_data()
+    return request.get_candle_store_data()
+
+
+def fetch(args):
+    """Download candles of every symbol into the local cache"""
+    for symbol in args.symbols:
+        args.symbol = symbol
+        request = get_finnhub_request(args)
+        df = get_candle_df(request, args)
+        print(f"{request.get_candle_id()}: {len(df.index)} candles")
+
+        if args.plot:
+            request.plot_candle_data(df=df, auto_open=not args.no_open, max_candles=request.MAX_PLOT_CANDLES)
+
+
+def run(args):
+    """Run the algorithm on the candles of one symbol and print a summary of its performance"""
+    from gobble_tick.algorithm import GobbleTick
+    from gobble_tick.analytics import TICKS_PER_YEAR, summarize_run
+
+    request = get_finnhub_request(args)
+    df = get_candle_df(request, args)
+
+    gt = GobbleTick(bank=args.bank, gobble_amount=args.gobble_amount, exit_rate=args.exit_rate)
+    if args.output_dir is not None:
+        gt.DATA_OUTPUT_PATH = args.output_dir
+
+    input_label = request.get_candle_id()
+    gt_df = gt.run_from_finnhub_df(df=df, to_file=not args.no_save, input_label=input_label, cache=get_cache(args))
+    trades_df = gt.get_trades(gt_df, to_file=not args.no_save, input_label=input_label)
+
+    summary = summarize_run(
+        gt_df, trades_df, start_bank=args.bank, ticks_per_year=TICKS_PER_YEAR.get(str(args.resolution), 252),
+    )
+    print(f"{input_label} {gt.get_id()}")
+    print(summary.to_string())
+
+    if args.plot:
+        from gobble_tick.plot import multiplot_gobble_tick, MAX_PLOT_POINTS
+
+        path = multiplot_gobble_tick(
+            df=gt_df, name=os.path.join(input_label, f"{gt.get_id()}.html"), auto_open=not args.no_open,
+            max_points=MAX_PLOT_POINTS,
+        )
+        print(f"Plot output to {path}")
+
+
+def sweep(args):
+    """Sweep a (gobble_amount x exit_rate) grid over every symbol and print the best combinations"""
+    import numpy as np
+    from gobble_tick.pool import run_universe
+
+    # Candles are read (or requested) here so workers never import the API module
+    prices_by_symbol = {}
+    input_refs = {}
+    for symbol in args.symbols:
+        args.symbol = symbol
+        request = get_finnhub_request(args)
+        df = get_candle_df(request, args)
+        prices_by_symbol[symbol] = df[args.price_column].to_numpy(dtype=np.float64)
+
+        if args.save_paths is not None:
+            from gobble_tick.results import get_input_ref
+
+            input_refs[symbol] = get_input_ref(
+                symbol, args.resolution, prices_by_symbol[symbol], t=df['t'].to_numpy(),
+                price_column=args.price_column,
+                csv_path=None if args.store else request.get_candle_data_file_path(),
+            )
+
+    cache = get_cache(args)
+    if args.save_paths is not None:
+        import pandas as pd
+        from gobble_tick.results import ResultWriter
+
+        # Full per-tick history of every combination, written in bulk on a background thread, final results taken
+        # from the same simulation
+        result_dfs = []
+        with ResultWriter(results_dir=args.save_paths) as writer:
+            for symbol, prices in prices_by_symbol.items():
+                result_df = writer.add_sweep(
+                    prices, bank=args.bank, gobble_amounts=args.gobble_amounts, exit_rates=args.exit_rates,
+                    input_ref=input_refs[symbol],
+                )
+                result_df.insert(0, 'symbol', symbol)
+                result_dfs.append(result_df)
+        sweep_df = pd.concat(result_dfs, ignore_index=True)
+        print(f"Paths output to {args.save_paths}")
+    elif args.workers == 1:
+        import pandas as pd
+        from gobble_tick.sweep import sweep as sweep_prices
+
+        result_dfs = []
+        for symbol, prices in prices_by_symbol.items():
+            result_df = sweep_prices(
+                prices, bank=args.bank, gobble_amounts=args.gobble_amounts, exit_rates=args.exit_rates, cache=cache,
+            )
+            result_df.insert(0, 'symbol', symbol)
+            result_dfs.append(result_df)
+        sweep_df = pd.concat(result_dfs, ignore_index=True)
+    else:
+        sweep_df = run_universe(
+            prices_by_symbol=prices_by_symbol, bank=args.bank, gobble_amounts=args.gobble_amounts,
+            exit_rates=args.exit_rates, max_workers=args.workers, cache=cache,
+        )
+
+    if args.output is not None:
+        sweep_df.to_csv(args.output)
+        print(f"Output to {args.output}")
+    print(sweep_df.sort_values('gain', ascending=False).head(args.top).to_string(index=False))
+
+
+def search(args):
+    """Search a (gobble_amount x exit_rate) grid with successive halving or Hyperband, scored over every symbol"""
+    import numpy as np
+    from gobble_tick.search import successive_halving, hyperband
+
+    prices_by_symbol = {}
+    for symbol in args.symbols:
+        args.symbol = symbol
+        prices_by_symbol[symbol] = get_candle_df(get_finnhub_request(args), args)[args.price_column].to_numpy()
+
+    gobble_amounts = np.linspace(*args.gobble_amounts[:2], int(args.gobble_amounts[2]))
+    exit_rates = np.linspace(*args.exit_rates[:2], int(args.exit_rates[2]))
+    kwargs = dict(bank=args.bank, gobble_amounts=gobble_amounts, exit_rates=exit_rates, min_fraction=args.min_fraction,
+                  eta=args.eta, metric=args.metric)
+    if args.method == 'hyperband':
+        result = hyperband(prices_by_symbol, seed=args.seed, num_candidates=args.num_candidates, **kwargs)
+    else:
+        result = successive_halving(prices_by_symbol, fidelity=args.fidelity, **kwargs)
+
+    if args.output is not None:
+        result['trace'].to_csv(args.output)
+        print(f"Trace output to {args.output}")
+    print(result['trace'].groupby(['bracket', 'rung', 'fraction'])['kept'].agg(['size', 'sum'])
+          .rename(columns={'size': 'candidates', 'sum': 'kept'}).to_string())
+    print(f"Best: {result['best']}")
+    print(f"Ticks simulated: {result['ticks_simulated']} vs {result['grid_ticks']} for the full grid "
+          f"({result['speedup']:.1f}x fewer)")
+    print(f"Combinations scored: {result['evaluated']} ({result['fraction_evaluated']:.0%} of the grid)")
+
+
+def walk(args):
+    """Run the algorithm from every step-th start date of one symbol and print the distribution of outcomes"""
+    from gobble_tick.walk_forward import walk_forward
+
+    df = get_candle_df(get_finnhub_request(args), args)
+    walk_df = walk_forward(
+        df[args.price_column], bank=args.bank, gobble_amount=args.gobble_amount, exit_rate=args.exit_rate,
+        window=args.window, step=args.step,
+    )
+
+    if args.output is not None:
+        walk_df.to_csv(args.output)
+        print(f"Output to {args.output}")
+    print(walk_df[['value', 'gain', 'trades', 'stock_gain']].describe().to_string())
+
+
+def montecarlo(args):
+    """Run the algorithm over synthetic paths bootstrapped from (or fitted to) one symbol and print the distribution
+    of gain and drawdown"""
+    from gobble_tick.monte_carlo import BlockBootstrap, GbmModel, monte_carlo, summarize_monte_carlo
+    from gobble_tick.analytics import TICKS_PER_YEAR
+    import numpy as np
+
+    prices = get_candle_df(get_finnhub_request(args), args)[args.price_column]
+    if args.model == 'gbm':
+        model = GbmModel.from_prices(prices, ticks_per_year=TICKS_PER_YEAR[args.resolution], num_ticks=args.ticks)
+    else:
+        model = BlockBootstrap(prices, num_ticks=args.ticks, block_size=args.block_size)
+
+    mc_df = monte_carlo(
+        model, num_paths=args.paths, bank=args.bank, gobble_amount=args.gobble_amount, exit_rate=args.exit_rate,
+        seed=args.seed, dtype=np.float32 if args.float32 else np.float64,
+    )
+
+    if args.output is not None:
+        mc_df.to_csv(args.output)
+        print(f"Output to {args.output}")
+    print(summarize_monte_carlo(mc_df).to_string())
+
+
+def paper(args):
+    """Paper trade the algorithm on a trade stream: a local replay of stored candles (default) or synthetic trades,
+    or Finnhub's live stream, and print fills, throughput and latency"""
+    import json
+    import asyncio
+    from gobble_tick.algorithm import GobbleTick
+    from gobble_tick.live import PaperTrader, run_replay
+
+    gt = GobbleTick(bank=args.bank, gobble_amount=args.gobble_amount, exit_rate=args.exit_rate)
+
+    if args.live:
+        from finnhub.stream import get_trade_stream_url
+
+        trader = PaperTrader(gt, symbols=args.symbols, resolution=args.bar_resolution)
+        report = asyncio.run(trader.run(get_trade_stream_url(), duration=args.duration))
+    else:
+        from finnhub.stream import get_candle_trades, get_synthetic_trades, SYNTHETIC_TRADES_PER_SECOND
+
+        if args.synthetic is not None:
+            market_trades_per_second = args.market_trades_per_second or SYNTHETIC_TRADES_PER_SECOND
+            trades_by_symbol = {symbol: get_synthetic_trades(args.synthetic, seed=seed,
+                                                             trades_per_second=market_trades_per_second)
+                                for seed, symbol in enumerate(args.symbols)}
+            resolution = args.bar_resolution
+        else:
+            # Bars at the candles' own resolution, so fills match an offline run over the same candles
+            trades_by_symbol = {}
+            for symbol in args.symbols:
+                args.symbol = symbol
+                trades_by_symbol[symbol] = get_candle_trades(get_candle_df(get_finnhub_request(args), args))
+            resolution = args.resolution
+
+        trader, server_stats = asyncio.run(run_replay(
+            gt, trades_by_symbol, resolution=resolution, trades_per_second=args.trades_per_second,
+        ))
+        report = dict(trader.get_report(), server=server_stats)
+
+    fills_df = trader.get_fills_df()
+    if args.output is not None:
+        fills_df.to_csv(args.output)
+        print(f"Output to {args.output}")
+    print(fills_df.tail(args.top).to_string(index=False))
+    print(json.dumps(report, indent=2))
+
+
+def plot(args):
+    """Plot saved gobble tick output CSVs, one HTML per run or a batch report of all of them"""
+    import pandas as pd
+
+    runs = []
+    for path in args.paths:
+        # e.g. gobble_tick/data/SLAB_100D/50000_1000_0.03.csv -> SLAB_100D/50000_1000_0.03
+        name = os.path.join(os.path.basename(os.path.dirname(os.path.abspath(path))),
+                            os.path.splitext(os.path.basename(path))[0])
+        runs.append((name, pd.read_csv(path, index_col=0)))
+
+    if args.report is not None:
+        from gobble_tick.report import render_report
+
+        print(f"Output to {render_report(runs=runs, report_dir=args.report, max_workers=args.workers)}")
+        return
+
+    from gobble_tick.plot import multiplot_gobble_tick, MAX_PLOT_POINTS
+
+    for name, df in runs:
+        path = multiplot_gobble_tick(
+            df=df, name=f"{name}.html", auto_open=not args.no_open, max_points=MAX_PLOT_POINTS,
+        )
+        print(f"Output to {path}")
+
+
+def add_candle_arguments(parser):
+    """Arguments selecting candles, see FinnhubRequest"""
+    parser.add_argument('--resolution', default='D', help="candle resolution (1, 5, 15, 30, 60, D, W, M)")
+    parser.add_argument('--count', type=int, help="number of candles (default 100 unless --from/--to are given)")
+    parser.add_argument('--from', dest='from_time', type=int, help="UNIX timestamp of the first candle")
+    parser.add_argument('--to', dest='to_time', type=int, help="UNIX timestamp of the last candle")
+    parser.add_argument('--store', action='store_true', help="use the columnar CandleStore instead of the CSV cache")
+    parser.add_argument('--candle-data-dir', help="CSV cache dir (defaults to finnhub/candle_data)")
+
+
+def add_cache_arguments(parser):
+    """Arguments of the result cache, see gobble_tick.cache"""
+    parser.add_argument('--cache', action='store_true', help="reuse cached results of the same prices and parameters")
+    parser.add_argument('--cache-dir', help="result cache dir (defaults to gobble_tick/cache)")
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--time', action='store_true', help="print wall time since start up on exit")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    fetch_parser = subparsers.add_parser('fetch', help=fetch.__doc__)
+    fetch_parser.add_argument('symbols', nargs='+')
+    add_candle_arguments(fetch_parser)
+    fetch_parser.add_argument('--plot', action='store_true', help="plot candles to HTML")
+    fetch_parser.add_argument('--no-open', action='store_true', help="don't open plots in a browser")
+    fetch_parser.set_defaults(func=fetch)
+
+    run_parser = subparsers.add_parser('run', help=run.__doc__)
+    run_parser.add_argument('symbol')
+    add_candle_arguments(run_parser)
+    run_parser.add_argument('--bank', type=number, default=50000)
+    run_parser.add_argument('--gobble-amount', type=number, default=1000)
+    run_parser.add_argument('--exit-rate', type=float, default=0.03)
+    run_parser.add_argument('--output-dir', help="results dir (defaults to gobble_tick/data)")
+    run_parser.add_argument('--no-save', action='store_true', help="don't write results to CSV")
+    run_parser.add_argument('--plot', action='store_true', help="plot results to HTML")
+    run_parser.add_argument('--no-open', action='store_true', help="don't open plots in a browser")
+    add_cache_arguments(run_parser)
+    run_parser.set_defaults(func=run)
+
+    sweep_parser = subparsers.add_parser('sweep', help=sweep.__doc__)
+    sweep_parser.add_argument('symbols', nargs='+')
+    add_candle_arguments(sweep_parser)
+    sweep_parser.add_argument('--bank', type=number, default=50000)
+    sweep_parser.add_argument('--gobble-amounts', type=float, nargs='+', required=True)
+    sweep_parser.add_argument('--exit-rates', type=float, nargs='+', required=True)
+    sweep_parser.add_argument('--price-column', default='o', help="candle column used as price")
+    sweep_parser.add_argument('--workers', type=int, default=1, help="worker processes (1 = sweep in process)")
+    sweep_parser.add_argument('--output', help="CSV file to write all results to")
+    sweep_parser.add_argument('--save-paths', help="results dir to store the per-tick history of every combination in "
+                                                   "(simulated once in this process, --workers/--cache are not used)")
+    sweep_parser.add_argument('--top', type=int, default=10, help="number of best combinations to print")
+    add_cache_arguments(sweep_parser)
+    sweep_parser.set_defaults(func=sweep)
+
+    search_parser = subparsers.add_parser('search', help=search.__doc__)
+    search_parser.add_argument('symbols', nargs='+')
+    add_candle_arguments(search_parser)
+    search_parser.add_argument('--bank', type=number, default=50000)
+    search_parser.add_argument('--gobble-amounts', type=float, nargs=3, default=[250, 5000, 20],
+                               metavar=('MIN', 'MAX', 'NUM'), help="grid of gobble amounts")
+    search_parser.add_argument('--exit-rates', type=float, nargs=3, default=[0.01, 0.1, 10],
+                               metavar=('MIN', 'MAX', 'NUM'), help="grid of exit rates")
+    search_parser.add_argument('--method', choices=['halving', 'hyperband'], default='halving')
+    search_parser.add_argument('--fidelity', choices=['grid', 'prefix'], default='grid',
+                               help="budget of a halving rung: grid spacing or prefix of the prices")
+    search_parser.add_argument('--min-fraction', type=float, default=1 / 9,
+                               help="grid spacing of the first rung, or shortest prefix of every series")
+    search_parser.add_argument('--eta', type=int, default=3, help="1/eta of the candidates survive each rung")
+    search_parser.add_argument('--num-candidates', type=int, help="candidates of Hyperband's first bracket "
+                               "(default: as many as fit in 1/eta of the ticks of the full grid)")
+    search_parser.add_argument('--metric', default='gain', help="result column to maximize")
+    search_parser.add_argument('--seed', type=int, default=0)
+    search_parser.add_argument('--price-column', default='o', help="candle column used as price")
+    search_parser.add_argument('--output', help="CSV file to write the evaluation trace to")
+    search_parser.set_defaults(func=search)
+
+    walk_parser = subparsers.add_parser('walk', help=walk.__doc__)
+    walk_parser.add_argument('symbol')
+    add_candle_arguments(walk_parser)
+    walk_parser.add_argument('--bank', type=number, default=50000)
+    walk_parser.add_argument('--gobble-amount', type=number, default=1000)
+    walk_parser.add_argument('--exit-rate', type=float, default=0.03)
+    walk_parser.add_argument('--window', type=int, help="ticks per run (default: every run goes to the last tick)")
+    walk_parser.add_argument('--step', type=int, default=1, help="ticks between start dates")
+    walk_parser.add_argument('--price-column', default='o', help="candle column used as price")
+    walk_parser.add_argument('--output', help="CSV file to write the result of every start to")
+    walk_parser.set_defaults(func=walk)
+
+    montecarlo_parser = subparsers.add_parser('montecarlo', help=montecarlo.__doc__)
+    montecarlo_parser.add_argument('symbol')
+    add_candle_arguments(montecarlo_parser)
+    montecarlo_parser.add_argument('--bank', type=number, default=50000)
+    montecarlo_parser.add_argument('--gobble-amount', type=number, default=1000)
+    montecarlo_parser.add_argument('--exit-rate', type=float, default=0.03)
+    montecarlo_parser.add_argument('--model', choices=['bootstrap', 'gbm'], default='bootstrap',
+                                   help="block bootstrap of the candles' returns, or GBM fitted to them")
+    montecarlo_parser.add_argument('--paths', type=int, default=10_000, help="number of paths")
+    montecarlo_parser.add_argument('--ticks', type=int, help="ticks per path (defaults to the number of candles)")
+    montecarlo_parser.add_argument('--block-size', type=int, default=5, help="returns per bootstrap block")
+    montecarlo_parser.add_argument('--seed', type=int, default=0)
+    montecarlo_parser.add_argument('--float32', action='store_true', help="simulate in float32 to halve memory")
+    montecarlo_parser.add_argument('--price-column', default='o', help="candle column used as price")
+    montecarlo_parser.add_argument('--output', help="CSV file to write the result of every path to")
+    montecarlo_parser.set_defaults(func=montecarlo)
+
+    paper_parser = subparsers.add_parser('paper', help=paper.__doc__)
+    paper_parser.add_argument('symbols', nargs='+')
+    add_candle_arguments(paper_parser)
+    paper_parser.add_argument('--bank', type=number, default=50000)
+    paper_parser.add_argument('--gobble-amount', type=number, default=1000)
+    paper_parser.add_argument('--exit-rate', type=float, default=0.03)
+    paper_parser.add_argument('--synthetic', type=int, help="replay this many synthetic trades per symbol")
+    paper_parser.add_argument('--live', action='store_true', help="use Finnhub's live trade stream")
+    paper_parser.add_argument('--duration', type=float, help="seconds to trade the live stream for")
+    paper_parser.add_argument('--bar-resolution', default='1', help="bar resolution of synthetic and live trades")
+    paper_parser.add_argument('--trades-per-second', type=float, help="replay rate per symbol (default: unthrottled)")
+    paper_parser.add_argument('--market-trades-per-second', type=float,
+                              help="trades per second of market time of synthetic trades, sets how many bars they span "
+                                   "(default: 10)")
+    paper_parser.add_argument('--output', help="CSV file to write the fills to")
+    paper_parser.add_argument('--top', type=int, default=10, help="number of last fills to print")
+    paper_parser.set_defaults(func=paper)
+
+    plot_parser = subparsers.add_parser('plot', help=plot.__doc__)
+    plot_parser.add_argument('paths', nargs='+', help="gobble tick output CSV files")
+    plot_parser.add_argument('--report', help="render a batch report into this dir instead of one plot per run")
+    plot_parser.add_argument('--workers', type=int, help="report worker processes (defaults to number of CPUs)")
+    plot_parser.add_argument('--no-open', action='store_true', help="don't open plots in a browser")
+    plot_parser.set_defaults(func=plot)
+
+    return parser
+
+
+def main(argv=None):
+    args = get_parser().parse_args(argv)
+
+    if getattr(args, 'resolution', None) is not None and args.count is None and args.from_time is None:
+        args.count = 100
+
+    args.func(args)
+
+    if args.time:
+        print(f"Done in {time.perf_counter() - START_TIME:.3f} s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,277 @@
+"""
+Rolling indicators, streaming (O(1) amortized per tick) and batch (whole series at once)
+
+Every indicator comes as a class updated one tick at a time (for GobbleTick.on_tick and live feeds) and a function
+over a whole series. Both paths perform the same floating point operations in the same order, so they produce
+identical values, not just close ones:
+  - rolling min/max: monotonic deque / sparse table of range extrema (exact either way)
+  - EMA and ATR (Wilder smoothing): the same recurrence, run over the series with itertools.accumulate in batch form
+  - rolling volatility: differences of running sums of returns and squared returns (sequential, like np.cumsum)
+
+Also holds dynamic sizing and exit rules for GobbleTick built on these indicators (see gobble_fn/exit_rate_fn).
+"""
+import math
+import itertools
+from collections import deque
+import numpy as np
+
+
+class RollingMax:
+    """Max of the last `window` values (of all values so far until the window is full)"""
+
+    def __init__(self, window):
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        # (tick, value) with decreasing values, front = max of the window
+        self.candidates = deque()
+        self.tick = 0
+        self.value = None
+
+    def keeps(self, old_value, new_value):
+        """True if old_value can still be the extremum once new_value is in the window"""
+        return old_value > new_value
+
+    def update(self, x):
+        candidates = self.candidates
+        while candidates and not self.keeps(candidates[-1][1], x):
+            candidates.pop()
+        candidates.append((self.tick, x))
+        if candidates[0][0] <= self.tick - self.window:
+            candidates.popleft()
+
+        self.tick += 1
+        self.value = candidates[0][1]
+        return self.value
+
+
+class RollingMin(RollingMax):
+    """Min of the last `window` values (of all values so far until the window is full)"""
+
+    def keeps(self, old_value, new_value):
+        return old_value < new_value
+
+
+class EMA:
+    """Exponential moving average, seeded with the first value"""
+
+    def __init__(self, span=None, alpha=None):
+        """
+
+        Args:
+            span (float): number of ticks, alpha = 2 / (span + 1)
+            alpha (float): smoothing factor (overrides span)
+
+        """
+        self.alpha = alpha if alpha is not None else 2 / (span + 1)
+        self.reset()
+
+    def reset(self):
+        self.value = None
+
+    def update(self, x):
+        self.value = x if self.value is None else self.value + self.alpha * (x - self.value)
+        return self.value
+
+
+class ATR:
+    """Average true range, Wilder smoothing (EMA with alpha = 1 / period) of the true range"""
+
+    def __init__(self, period=14):
+        self.period = period
+        self.ema = EMA(alpha=1 / period)
+        self.reset()
+
+    def reset(self):
+        self.ema.reset()
+        self.prev_close = None
+        self.value = None
+
+    def update(self, high, low, close):
+        true_range = high - low
+        if self.prev_close is not None:
+            true_range = max(true_range, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.prev_close = close
+
+        self.value = self.ema.update(true_range)
+        return self.value
+
+
+class RollingVolatility:
+    """Standard deviation of the last `window` simple returns, annualized (NaN until `window` returns are known)"""
+
+    def __init__(self, window, ticks_per_year=1):
+        _check_volatility_window(window)
+        self.window = window
+        self.scale = math.sqrt(ticks_per_year)
+        self.reset()
+
+    def reset(self):
+        self.prev_price = None
+        self.sum = 0.0
+        self.sum_sq = 0.0
+        # Running sums at the start of the window
+        self.window_sums = deque([(0.0, 0.0)])
+        self.value = float('nan')
+
+    def update(self, price):
+        if self.prev_price is None:
+            self.prev_price = price
+            return self.value
+
+        ret = price / self.prev_price - 1
+        self.prev_price = price
+        self.sum += ret
+        self.sum_sq += ret * ret
+        self.window_sums.append((self.sum, self.sum_sq))
+
+        if len(self.window_sums) > self.window:
+            start_sum, start_sum_sq = self.window_sums.popleft()
+            self.value = _volatility(self.sum - start_sum, self.sum_sq - start_sum_sq, self.window) * self.scale
+        return self.value
+
+
+def _check_volatility_window(window):
+    """The sample standard deviation needs at least 2 returns"""
+    if window < 2:
+        raise ValueError(f"Volatility window must be at least 2 returns, got {window}")
+
+
+def _volatility(window_sum, window_sum_sq, window):
+    """Sample standard deviation from the sum and sum of squares of a window (scalar or arrays)"""
+    variance = (window_sum_sq - window_sum * window_sum / window) / (window - 1)
+    return np.sqrt(np.maximum(variance, 0.0))
+
+
+def rolling_max(x, window):
+    """Batch RollingMax, from a sparse table of range maxima (O(n log window))"""
+    return _rolling_extremum(x, window, np.maximum, -np.inf)
+
+
+def rolling_min(x, window):
+    """Batch RollingMin"""
+    return _rolling_extremum(x, window, np.minimum, np.inf)
+
+
+def _rolling_extremum(x, window, combine, pad_value):
+    x = np.asarray(x, dtype=np.float64)
+    num_ticks = len(x)
+    window = max(1, min(window, num_ticks))
+
+    # Pad the front so partial windows at the start only cover real values
+    padded = np.concatenate([np.full(window - 1, pad_value), x])
+
+    # level[j] = extremum of padded[j:j + 2**k], for the largest 2**k <= window
+    level = padded
+    size = 1
+    while size * 2 <= window:
+        level = combine(level[:-size], level[size:])
+        size *= 2
+
+    # Window [i, i + window) of padded = two (possibly overlapping) blocks of 2**k
+    starts = np.arange(num_ticks)
+    return combine(level[starts], level[starts + window - size])
+
+
+def ema(x, span=None, alpha=None):
+    """Batch EMA"""
+    alpha = alpha if alpha is not None else 2 / (span + 1)
+    return np.fromiter(
+        itertools.accumulate(np.asarray(x, dtype=np.float64).tolist(), lambda value, y: value + alpha * (y - value)),
+        dtype=np.float64, count=len(x),
+    )
+
+
+def true_range(high, low, close):
+    """True range of every candle (high - low for the first one)"""
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+
+    prev_close = close[:-1]
+    tr = high - low
+    tr[1:] = np.maximum(tr[1:], np.maximum(np.abs(high[1:] - prev_close), np.abs(low[1:] - prev_close)))
+    return tr
+
+
+def atr(high, low, close, period=14):
+    """Batch ATR"""
+    return ema(true_range(high, low, close), alpha=1 / period)
+
+
+def rolling_volatility(prices, window, ticks_per_year=1):
+    """Batch RollingVolatility"""
+    _check_volatility_window(window)
+    prices = np.asarray(prices, dtype=np.float64)
+    returns = prices[1:] / prices[:-1] - 1
+
+    # Sequential running sums, same additions as RollingVolatility
+    sums = np.concatenate([[0.0], np.cumsum(returns)])
+    sums_sq = np.concatenate([[0.0], np.cumsum(returns * returns)])
+
+    volatility = np.full(len(prices), np.nan)
+    if len(returns) >= window:
+        volatility[window:] = _volatility(
+            sums[window:] - sums[:-window], sums_sq[window:] - sums_sq[:-window], window
+        ) * math.sqrt(ticks_per_year)
+    return volatility
+
+
+class SupportGobble:
+    """Gobble sizing rule: buy more near support (rolling min), less near resistance (rolling max)
+
+    gobble amount = base_amount * (1 + scale * (1 - 2 * position)), position = where the price sits in the rolling
+    [min, max] range (0 = at support, 1 = at resistance), so the amount moves between base * (1 - scale) and
+    base * (1 + scale).
+    """
+
+    def __init__(self, base_amount, window=20, scale=0.5):
+        self.base_amount = base_amount
+        self.scale = scale
+        self.support = RollingMin(window)
+        self.resistance = RollingMax(window)
+
+    def reset(self):
+        self.support.reset()
+        self.resistance.reset()
+
+    def __call__(self, price, candle=None):
+        support = self.support.update(price)
+        resistance = self.resistance.update(price)
+        position = (price - support) / (resistance - support) if resistance > support else 0.5
+        return self.base_amount * (1 + self.scale * (1 - 2 * position))
+
+
+class AtrExitRate:
+    """Exit rate rule: target a multiple of the average true range above the price, within [min_rate, max_rate]
+
+    Uses the candle's high/low/close when given (see GobbleTick.run), the price alone otherwise.
+    """
+
+    def __init__(self, multiple=2.0, period=14, min_rate=0.005, max_rate=0.1):
+        self.multiple = multiple
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.atr = ATR(period)
+
+    def reset(self):
+        self.atr.reset()
+
+    def __call__(self, price, candle=None):
+        if candle is not None:
+            value = self.atr.update(candle['h'], candle['l'], candle['c'])
+        else:
+            value = self.atr.update(price, price, price)
+        return min(max(self.multiple * value / price, self.min_rate), self.max_rate)
+
+
+if __name__ == '__main__':
+    from finnhub.api import FinnhubRequest
+    from gobble_tick.algorithm import GobbleTick
+
+    # Example: buy more near 20 day support, exit at 2 ATRs above the purchase price
+    example_df = FinnhubRequest(symbol="SLAB", resolution="D", count=100).get_candle_data()
+    example_gt = GobbleTick(bank=50000, gobble_amount=1000, exit_rate=0.03,
+                            gobble_fn=SupportGobble(base_amount=1000, window=20), exit_rate_fn=AtrExitRate(multiple=2))
+    print(example_gt.run_from_finnhub_df(example_df, to_file=False).tail())
@@ -0,0 +1,135 @@
+"""
+Opt-in instrumentation of the gobble tick algorithm
+
+Pass an Instrumentation to GobbleTick to collect per-phase timers and counters while it runs, plug in per-tick
+callbacks, or wrap a run in cProfile/tracemalloc. Without one, GobbleTick only pays for a single `is None` check
+per phase.
+"""
+import io
+import json
+import pstats
+import cProfile
+import tracemalloc
+from collections import defaultdict
+
+
+class Instrumentation:
+    """Collects timers and counters from GobbleTick.on_tick/run
+
+    Phases timed:
+      - entry: sizing the buy-in and opening the position
+      - exit_matching: finding and settling the positions which reached their target
+      - valuation: bank/stock/total value after the tick
+      - file_output: writing run results to file
+
+    Counters (lots include the empty positions opened on ticks where the bank is exhausted):
+      - ticks, lots_opened, lots_closed
+      - max_open_lots: max number of positions open at once
+      - bank_exhausted_ticks: ticks where the bank could not cover the full gobble amount
+    """
+
+    PHASES = ('entry', 'exit_matching', 'valuation', 'file_output')
+
+    def __init__(self, callbacks=None):
+        """
+
+        Args:
+            callbacks (list): optional functions called with the action dict (see GobbleTick.on_tick) after every tick
+
+        """
+        self.callbacks = list(callbacks or [])
+        self.reset()
+
+    def reset(self):
+        """Clear timers, counters and profiles"""
+        self.timers = defaultdict(float)
+        self.counters = {
+            'ticks': 0,
+            'lots_opened': 0,
+            'lots_closed': 0,
+            'max_open_lots': 0,
+            'bank_exhausted_ticks': 0,
+        }
+        self.profiles = {}
+
+    def add_time(self, phase, seconds):
+        self.timers[phase] += seconds
+
+    def record_tick(self, action, num_open_lots, bank_exhausted):
+        """Update counters and call callbacks after a tick
+
+        Args:
+            action (dict): action taken on this tick (see GobbleTick.on_tick)
+            num_open_lots (int): number of positions open after this tick
+            bank_exhausted (bool): True if the bank could not cover the full gobble amount
+
+        """
+        counters = self.counters
+        counters['ticks'] += 1
+        counters['lots_opened'] += 1
+        counters['lots_closed'] += len(action['exits'])
+        counters['max_open_lots'] = max(counters['max_open_lots'], num_open_lots)
+        counters['bank_exhausted_ticks'] += bank_exhausted
+
+        for callback in self.callbacks:
+            callback(action)
+
+    def profile(self, fn, *args, sort='cumulative', limit=25, **kwargs):
+        """Call fn under cProfile, keeping the top `limit` functions in the summary
+
+        Returns:
+            output of fn
+
+        """
+        profiler = cProfile.Profile()
+        result = profiler.runcall(fn, *args, **kwargs)
+
+        stats_stream = io.StringIO()
+        pstats.Stats(profiler, stream=stats_stream).sort_stats(sort).print_stats(limit)
+        self.profiles['cprofile'] = stats_stream.getvalue()
+        return result
+
+    def trace_memory(self, fn, *args, limit=10, **kwargs):
+        """Call fn under tracemalloc, keeping peak memory and the top `limit` allocation sites in the summary
+
+        Returns:
+            output of fn
+
+        """
+        was_tracing = tracemalloc.is_tracing()
+        if not was_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        try:
+            result = fn(*args, **kwargs)
+            peak_bytes = tracemalloc.get_traced_memory()[1]
+            top_stats = tracemalloc.take_snapshot().statistics('lineno')[:limit]
+        finally:
+            if not was_tracing:
+                tracemalloc.stop()
+
+        self.profiles['tracemalloc'] = {
+            'peak_bytes': peak_bytes,
+            'top_allocations': [str(stat) for stat in top_stats],
+        }
+        return result
+
+    def get_summary(self):
+        """Summary of everything collected, JSON-serializable"""
+        return {
+            'timers': {phase: self.timers.get(phase, 0.0) for phase in self.PHASES},
+            'counters': dict(self.counters),
+            'profiles': self.profiles,
+        }
+
+    def to_json(self, path):
+        """Export summary to JSON file
+
+        Returns:
+            str: output path
+
+        """
+        with open(path, 'w') as f:
+            json.dump(self.get_summary(), f, indent=2)
+        return path
+
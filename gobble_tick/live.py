@@ -0,0 +1,321 @@
+"""
+Live paper trading of the gobble tick algorithm on a trade stream
+
+Trades from Finnhub's trade stream (or the local stand-in finnhub.stream.ReplayServer) are aggregated into bars at
+the configured resolution as they arrive, and every closed bar goes through GobbleTick.on_tick of its symbol, so buys
+and exits follow the same rules as the offline runs over candles. Buys and exits are recorded as paper fills.
+
+Messages are read off the connection into a queue by one coroutine and processed by another, so the queue depth
+shows any backlog building up, and the latency of every trade and decision is measured from the moment its message
+was received (including time spent in the queue).
+"""
+import copy
+import json
+import time
+import asyncio
+import numpy as np
+import pandas as pd
+
+from finnhub.resample import get_bucket_keys, MARKET_TIMEZONE
+
+# Latency percentiles reported by PaperTrader.get_report
+LATENCY_PERCENTILES = (50, 90, 99, 99.9)
+
+
+class BarAggregator:
+    """Aggregate trades of one symbol into bars (o, h, l, c, v, t = time of the first trade in seconds)
+
+    A bar is closed by the first trade of the next bar (or flush at the end of the stream). Bar boundaries match
+    finnhub.resample, so trades replayed from candles aggregate back into the same candles.
+    """
+
+    def __init__(self, resolution, tz=MARKET_TIMEZONE):
+        """
+
+        Args:
+            resolution (str): bar resolution (1, 5, 15, 30, 60, D, W, M)
+            tz (str): timezone of day/week/month boundaries
+
+        """
+        self.resolution = str(resolution)
+        self.tz = tz
+        self.bucket_seconds = int(self.resolution) * 60 if self.resolution.isdigit() else None
+        self.reset()
+
+    def reset(self):
+        self.bar = None
+        self.bucket_key = None
+
+        # Day/week/month keys only change on whole minutes, so they are computed once per minute
+        self.key_minute = None
+        self.minute_key = None
+
+    def get_bucket_key(self, t):
+        """Bucket key of a UNIX timestamp (s), see finnhub.resample.get_bucket_keys"""
+        if self.bucket_seconds is not None:
+            return t // self.bucket_seconds
+
+        minute = t // 60
+        if minute != self.key_minute:
+            self.key_minute = minute
+            self.minute_key = int(get_bucket_keys(np.array([t]), self.resolution, tz=self.tz)[0])
+        return self.minute_key
+
+    def update(self, price, volume, t_ms):
+        """Add a trade
+
+        Args:
+            price (float): trade price
+            volume (float): trade volume
+            t_ms (int): UNIX timestamp of the trade in milliseconds
+
+        Returns:
+            dict: bar closed by this trade, None if the trade is part of the current bar
+
+        """
+        t = t_ms // 1000
+        key = self.get_bucket_key(t)
+
+        bar = self.bar
+        if bar is not None and key == self.bucket_key:
+            if price > bar['h']:
+                bar['h'] = price
+            elif price < bar['l']:
+                bar['l'] = price
+            bar['c'] = price
+            bar['v'] += volume
+            return None
+
+        self.bar = {'t': t, 'o': price, 'h': price, 'l': price, 'c': price, 'v': volume}
+        self.bucket_key = key
+        return bar
+
+    def flush(self):
+        """Close the current bar
+
+        Returns:
+            dict: closed bar, None if there was none
+
+        """
+        bar = self.bar
+        self.reset()
+        return bar
+
+
+class PaperTrader:
+    """Run GobbleTick per symbol on bars aggregated from a trade stream and record paper fills"""
+
+    def __init__(self, gobble_tick, symbols, resolution='1', price_column='o', tz=MARKET_TIMEZONE):
+        """
+
+        Args:
+            gobble_tick (GobbleTick): parameters of the algorithm, every symbol gets its own fresh copy (own bank)
+            symbols (list): symbols to trade
+            resolution (str): bar resolution (1, 5, 15, 30, 60, D, W, M)
+            price_column (str): bar column used as price (same default as the offline runs)
+            tz (str): timezone of day/week/month boundaries
+
+        """
+        self.symbols = list(symbols)
+        self.resolution = resolution
+        self.price_column = price_column
+
+        self.engines = {}
+        self.aggregators = {}
+        for symbol in self.symbols:
+            engine = copy.deepcopy(gobble_tick)
+            engine.reset()
+            self.engines[symbol] = engine
+            self.aggregators[symbol] = BarAggregator(resolution, tz=tz)
+
+        self.last_prices = {}
+        self.fills = []
+        self.num_trades = 0
+        self.num_messages = 0
+        self.num_bars = 0
+        self.max_queue_depth = 0
+        self.trade_latencies = []  # per message, seconds from receipt to all its trades processed
+        self.decision_latencies = []  # per closed bar, seconds from receipt of the trade closing it to the decision
+        self.elapsed = None
+
+    def on_message(self, message, received_at):
+        """Process one stream message (trades of any subscribed symbol, other message types are ignored)
+
+        Args:
+            message (str): JSON message
+            received_at (float): time.perf_counter() when the message was received
+
+        """
+        data = json.loads(message)
+        if data.get('type') != 'trade':
+            return
+
+        aggregators = self.aggregators
+        for trade in data['data']:
+            aggregator = aggregators.get(trade['s'])
+            if aggregator is None:
+                continue
+            bar = aggregator.update(trade['p'], trade['v'], trade['t'])
+            if bar is not None:
+                self.on_bar(trade['s'], bar, received_at)
+
+        self.num_trades += len(data['data'])
+        self.num_messages += 1
+        self.trade_latencies.append(time.perf_counter() - received_at)
+
+    def on_bar(self, symbol, bar, received_at):
+        """Apply the buy and exit rules of a symbol to a closed bar and record the fills
+
+        Returns:
+            dict: GobbleTick.on_tick action
+
+        """
+        price = bar[self.price_column]
+        action = self.engines[symbol].on_tick(price=price, timestamp=bar['t'], candle=bar)
+        self.last_prices[symbol] = price
+
+        if action['gobble'] != 0:
+            self.fills.append((symbol, bar['t'], 'buy', action['gobble'], price, action['tick']))
+        for entry_tick, exit_total in action['exits']:
+            if exit_total != 0:
+                self.fills.append((symbol, bar['t'], 'sell', round(exit_total / price), price, entry_tick))
+
+        self.num_bars += 1
+        self.decision_latencies.append(time.perf_counter() - received_at)
+        return action
+
+    def flush(self):
+        """Close the last bar of every symbol (end of stream)"""
+        flushed_at = time.perf_counter()
+        for symbol, aggregator in self.aggregators.items():
+            bar = aggregator.flush()
+            if bar is not None:
+                self.on_bar(symbol, bar, flushed_at)
+
+    async def run(self, url, duration=None):
+        """Subscribe to every symbol's trades and paper trade until the stream ends (or for duration seconds)
+
+        Args:
+            url (str): trade stream URL (see finnhub.stream.get_trade_stream_url, ReplayServer.start)
+            duration (float): optional number of seconds to run for
+
+        Returns:
+            dict: see get_report
+
+        """
+        from finnhub.websocket import connect
+        from finnhub.stream import subscribe
+
+        queue = asyncio.Queue()
+        start = time.perf_counter()
+
+        async def read(websocket):
+            try:
+                async for message in websocket:
+                    queue.put_nowait((time.perf_counter(), message))
+            finally:
+                queue.put_nowait(None)
+
+        async with await connect(url) as websocket:
+            await subscribe(websocket, self.symbols)
+            reader = asyncio.create_task(read(websocket))
+            try:
+                await asyncio.wait_for(self.consume(queue), timeout=duration)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                reader.cancel()
+
+        self.flush()
+        self.elapsed = time.perf_counter() - start
+        return self.get_report()
+
+    async def consume(self, queue):
+        """Process queued messages until the end of the stream (None)"""
+        while True:
+            self.max_queue_depth = max(self.max_queue_depth, queue.qsize())
+            item = await queue.get()
+            if item is None:
+                return
+            received_at, message = item
+            self.on_message(message, received_at)
+
+    def get_report(self):
+        """Throughput, backlog and latency of the session, and holdings of every symbol
+
+        Returns:
+            dict:
+              - trades, messages, bars, fills: counts
+              - trades_per_second: trades processed per second of wall time
+              - max_queue_depth: most messages waiting to be processed at once (0 = never behind the stream)
+              - trade_latency_ms, decision_latency_ms: latency percentiles (p50, p90, ...) and max, in ms
+              - holdings: symbol -> bank, stock and value (bank + stock at the price of the last bar) after the last bar
+
+        """
+        return {
+            'trades': self.num_trades,
+            'messages': self.num_messages,
+            'bars': self.num_bars,
+            'fills': len(self.fills),
+            'trades_per_second': self.num_trades / self.elapsed if self.elapsed else None,
+            'max_queue_depth': self.max_queue_depth,
+            'trade_latency_ms': get_latency_percentiles(self.trade_latencies),
+            'decision_latency_ms': get_latency_percentiles(self.decision_latencies),
+            'holdings': {
+                symbol: {
+                    'bank': engine.bank_value,
+                    'stock': engine.num_stocks_open,
+                    'value': engine.bank_value + engine.num_stocks_open * self.last_prices.get(symbol, 0.0),
+                }
+                for symbol, engine in self.engines.items()
+            },
+        }
+
+    def get_fills_df(self):
+        """Paper fills as DataFrame: symbol, bar time, side, stock, price and opening tick of the position"""
+        return pd.DataFrame(self.fills, columns=['symbol', 't', 'side', 'stock', 'price', 'entry_tick'])
+
+
+def get_latency_percentiles(latencies, percentiles=LATENCY_PERCENTILES):
+    """Percentiles and max of latencies (s), in ms"""
+    if not latencies:
+        return {}
+    latencies_ms = np.asarray(latencies) * 1000
+    values = np.percentile(latencies_ms, percentiles)
+    return {**{f"p{p:g}": float(value) for p, value in zip(percentiles, values)}, 'max': float(latencies_ms.max())}
+
+
+async def run_replay(gobble_tick, trades_by_symbol, resolution='1', trades_per_second=None, batch_size=100,
+                     price_column='o'):
+    """Paper trade against a local ReplayServer of the given trades
+
+    Returns:
+        tuple: PaperTrader after the session, and the server's stats (see ReplayServer.get_stats)
+
+    """
+    from finnhub.stream import ReplayServer
+
+    trader = PaperTrader(gobble_tick, symbols=list(trades_by_symbol), resolution=resolution,
+                         price_column=price_column)
+    async with ReplayServer(trades_by_symbol, trades_per_second=trades_per_second, batch_size=batch_size) as server:
+        await trader.run(server.url)
+    return trader, server.get_stats()
+
+
+if __name__ == '__main__':
+    from finnhub.api import FinnhubRequest
+    from finnhub.stream import get_candle_trades, get_synthetic_trades
+    from gobble_tick.algorithm import GobbleTick
+
+    example_gt = GobbleTick(bank=50000, gobble_amount=1000, exit_rate=0.03)
+
+    # Example: replay 100 days of SLAB as trades into daily bars, fills match the offline run over the same candles
+    example_trades = {"SLAB": get_candle_trades(FinnhubRequest(symbol="SLAB", resolution="D", count=100)
+                                                .get_candle_data())}
+    example_trader, _ = asyncio.run(run_replay(example_gt, example_trades, resolution="D"))
+    print(example_trader.get_fills_df().tail())
+
+    # Example: 2 synthetic symbols streamed at 5000 trades per second each, into 1 minute bars
+    example_trades = {symbol: get_synthetic_trades(50_000, seed=seed) for seed, symbol in enumerate(["AAA", "BBB"])}
+    example_trader, example_stats = asyncio.run(run_replay(example_gt, example_trades, trades_per_second=5000))
+    print(json.dumps(example_trader.get_report(), indent=2))
@@ -0,0 +1,239 @@
+"""
+Monte Carlo robustness of the gobble tick algorithm over many synthetic price paths
+
+Paths come from a price model (block bootstrap of the returns of a stored candle series, or geometric Brownian motion)
+as a (paths x ticks) array. Exit ticks of every entry of every path are resolved at once with
+gobble_tick.sweep.first_passage (along the tick axis), then the bank of all paths is stepped through time together,
+like gobble_tick.sweep. Paths are generated and simulated in chunks sized to stay under a memory cap, and can be held
+as float32 to halve memory (and fit twice the paths per chunk).
+"""
+import numpy as np
+import pandas as pd
+
+from gobble_tick.sweep import first_passage
+
+# Default memory cap of one chunk of paths (prices, exit ticks, exit schedule and first_passage sparse table)
+MAX_BYTES = 2 ** 28
+
+# Quantiles reported by summarize_monte_carlo
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+
+class BlockBootstrap:
+    """Price paths made of random blocks of consecutive log returns of a price series (keeps short-term autocorrelation
+    and volatility clustering within each block)"""
+
+    def __init__(self, prices, num_ticks=None, block_size=5, start_price=None):
+        """
+
+        Args:
+            prices (array-like): source price series (e.g. the 'o' column of Finnhub candle data)
+            num_ticks (int): ticks per path (defaults to the length of the source series)
+            block_size (int): consecutive returns per block
+            start_price (float): price at the first tick of every path (defaults to the first source price)
+
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        self.log_returns = np.diff(np.log(prices))
+        self.num_ticks = num_ticks if num_ticks is not None else len(prices)
+        self.block_size = max(1, min(block_size, len(self.log_returns)))
+        self.start_price = start_price if start_price is not None else prices[0]
+
+    def generate(self, rng, num_paths, dtype=np.float64):
+        """(num_paths x num_ticks) prices, drawn from rng"""
+        num_returns = self.num_ticks - 1
+        num_blocks = -(-num_returns // self.block_size)
+        block_starts = rng.integers(0, len(self.log_returns) - self.block_size + 1, size=(num_paths, num_blocks))
+
+        indices = (block_starts[:, :, None] + np.arange(self.block_size)).reshape(num_paths, -1)[:, :num_returns]
+        return _to_prices(self.log_returns.astype(dtype)[indices], self.start_price)
+
+
+class GbmModel:
+    """Geometric Brownian motion price paths (see gobble_tick.synthetic.gbm_prices)"""
+
+    def __init__(self, num_ticks, start_price=100.0, drift=0.05, volatility=0.3, ticks_per_year=252):
+        """
+
+        Args:
+            num_ticks (int): ticks per path
+            start_price (float): price at the first tick of every path
+            drift (float): annual drift
+            volatility (float): annual volatility
+            ticks_per_year (float): e.g. 252 for daily ticks
+
+        """
+        self.num_ticks = num_ticks
+        self.start_price = start_price
+        self.drift = drift
+        self.volatility = volatility
+        self.ticks_per_year = ticks_per_year
+
+    @classmethod
+    def from_prices(cls, prices, ticks_per_year=252, num_ticks=None):
+        """Fit drift and volatility to the log returns of a price series"""
+        prices = np.asarray(prices, dtype=np.float64)
+        log_returns = np.diff(np.log(prices))
+        volatility = log_returns.std(ddof=1) * np.sqrt(ticks_per_year)
+        drift = log_returns.mean() * ticks_per_year + volatility ** 2 / 2
+        return cls(num_ticks=num_ticks if num_ticks is not None else len(prices), start_price=prices[0], drift=drift,
+                   volatility=volatility, ticks_per_year=ticks_per_year)
+
+    def generate(self, rng, num_paths, dtype=np.float64):
+        """(num_paths x num_ticks) prices, drawn from rng"""
+        dt = 1 / self.ticks_per_year
+        log_returns = rng.standard_normal((num_paths, self.num_ticks - 1), dtype=dtype)
+        log_returns *= dtype(self.volatility * np.sqrt(dt))
+        log_returns += dtype((self.drift - self.volatility ** 2 / 2) * dt)
+        return _to_prices(log_returns, self.start_price)
+
+
+def _to_prices(log_returns, start_price):
+    """(paths x ticks) prices from (paths x ticks - 1) log returns, computed in place in their dtype"""
+    num_paths = log_returns.shape[0]
+    log_prices = np.empty((num_paths, log_returns.shape[1] + 1), dtype=log_returns.dtype)
+    log_prices[:, 0] = 0
+    np.cumsum(log_returns, axis=1, out=log_prices[:, 1:])
+    np.exp(log_prices, out=log_prices)
+    log_prices *= log_prices.dtype.type(start_price)
+    return log_prices
+
+
+def get_path_bytes(num_ticks, dtype=np.float64):
+    """Estimated peak memory of simulating one path (largest while first_passage holds its sparse table)"""
+    itemsize = np.dtype(dtype).itemsize
+    num_levels = max(1, int(num_ticks).bit_length())
+    # prices, targets and sparse table levels, plus int64 positions, exit ticks and a gathered block per tick
+    return num_ticks * (itemsize * (num_levels + 3) + 8 * 3)
+
+
+def monte_carlo(model, num_paths, bank, gobble_amount, exit_rate, seed=0, dtype=np.float64, max_bytes=MAX_BYTES):
+    """Run the algorithm over num_paths price paths of a model
+
+    Paths are drawn from one random stream in order, so results only depend on the seed and dtype, not on the chunk
+    size. In float64, each path matches GobbleTick.run over it up to float rounding of the order in which exits are
+    summed.
+
+    Args:
+        model: price model with num_ticks and generate(rng, num_paths, dtype), e.g. BlockBootstrap or GbmModel
+        num_paths (int): number of paths
+        bank (int): amount of money in bank (in dollars) at the start of every path
+        gobble_amount (int): amount of money to use to purchase stock each tick
+        exit_rate (float): rate above buying price to target to sell
+        seed (int): random seed, same seed = same paths
+        dtype: np.float64, or np.float32 to halve memory (prices and bank values rounded to float32)
+        max_bytes (int): memory cap, paths are processed in chunks to stay under it
+
+    Returns:
+        DataFrame: one row per path with final value, gain, max drawdown (of value), trades (exited lots) and the
+          stock's own gain over the path
+
+    """
+    dtype = np.dtype(dtype).type
+    rng = np.random.default_rng(seed)
+    chunk_size = max(1, max_bytes // get_path_bytes(model.num_ticks, dtype))
+
+    results = []
+    for chunk_start in range(0, num_paths, chunk_size):
+        prices = model.generate(rng, min(chunk_size, num_paths - chunk_start), dtype=dtype)
+        results.append(_simulate_paths(prices, bank, gobble_amount, exit_rate))
+
+    results = results or [(np.empty(0, dtype=dtype),) * 2 + (np.empty(0, dtype=np.int64), np.empty(0, dtype=dtype))]
+    value, drawdown, trades, stock_gain = (np.concatenate(arrays) for arrays in zip(*results))
+
+    return pd.DataFrame({
+        'value': value,
+        'gain': value / dtype(bank),
+        'max_drawdown': drawdown,
+        'trades': trades,
+        'stock_gain': stock_gain,
+    })
+
+
+def _simulate_paths(prices, bank, gobble_amount, exit_rate):
+    """Step the bank of every path through time (same steps as gobble_tick.sweep._sweep_chunk, one price per path)
+
+    Args:
+        prices (np.ndarray): (paths x ticks) prices, results are computed in their dtype
+
+    Returns:
+        tuple: final value, max drawdown, number of exited lots and stock gain of each path
+
+    """
+    num_paths, num_ticks = prices.shape
+    dtype = prices.dtype.type
+    paths = np.arange(num_paths)
+
+    exit_ticks = first_passage(prices, prices * dtype(1 + exit_rate))
+
+    # Stepped tick by tick, so keep each tick's values of all paths contiguous
+    tick_prices = np.ascontiguousarray(prices.T)
+    tick_exit_ticks = np.ascontiguousarray(exit_ticks.T)
+    del exit_ticks
+
+    # Shares due to exit at each tick (last row collects positions which never exit)
+    exit_schedule = np.zeros((num_ticks + 1, num_paths), dtype=dtype)
+
+    bank_value = np.full(num_paths, bank, dtype=dtype)
+    num_stocks_open = np.zeros(num_paths, dtype=dtype)
+    trades = np.zeros(num_paths, dtype=np.int64)
+    value = bank_value
+    peak = np.full(num_paths, -np.inf, dtype=dtype)
+    drawdown = np.zeros(num_paths, dtype=dtype)
+    gobble_amount = dtype(gobble_amount)
+
+    for i in range(num_ticks):
+        price = tick_prices[i]
+
+        # Limited to money in the bank
+        buy_in = np.where(bank_value < gobble_amount, bank_value, gobble_amount)
+        gobble = np.round(buy_in / price)
+
+        exit_tick = tick_exit_ticks[i]
+        exit_schedule[exit_tick, paths] += gobble
+        trades += (gobble != 0) & (exit_tick < num_ticks)
+
+        closed_stocks = exit_schedule[i]
+        bank_value = bank_value - gobble * price + closed_stocks * price
+        num_stocks_open += gobble - closed_stocks
+
+        # Drawdown from the running peak of value (see gobble_tick.analytics.max_drawdown)
+        value = bank_value + num_stocks_open * price
+        np.maximum(peak, value, out=peak)
+        np.maximum(drawdown, 1 - value / peak, out=drawdown)
+
+    stock_gain = prices[:, -1] / prices[:, 0] if num_ticks else np.ones(num_paths, dtype=dtype)
+    return value, drawdown, trades, stock_gain
+
+
+def summarize_monte_carlo(mc_df, quantiles=QUANTILES):
+    """Distribution of final gain, max drawdown and stock gain over all paths
+
+    Args:
+        mc_df (DataFrame): output of monte_carlo
+        quantiles (tuple): quantiles to report
+
+    Returns:
+        DataFrame: one row per metric with mean, std and quantiles, plus the probability of a loss (gain < 1)
+
+    """
+    metrics = mc_df[['gain', 'max_drawdown', 'stock_gain']].astype(np.float64)
+    summary_df = pd.concat([
+        metrics.mean().rename('mean'),
+        metrics.std().rename('std'),
+        metrics.quantile(list(quantiles)).T.rename(columns=lambda q: f"q{q:g}"),
+    ], axis=1)
+    summary_df['p_loss'] = (metrics < 1).mean()
+    summary_df.loc['max_drawdown', 'p_loss'] = np.nan
+    return summary_df
+
+
+if __name__ == '__main__':
+    from finnhub.api import FinnhubRequest
+
+    # Example: 10k one year paths bootstrapped from 100 days of SLAB, and from a GBM fitted to them
+    example_prices = FinnhubRequest(symbol="SLAB", resolution="D", count=100).get_candle_data()['o']
+    example_models = [BlockBootstrap(example_prices, num_ticks=252), GbmModel.from_prices(example_prices, 252, 252)]
+    for example_model in example_models:
+        example_mc_df = monte_carlo(example_model, num_paths=10_000, bank=50000, gobble_amount=1000, exit_rate=0.03)
+        print(summarize_monte_carlo(example_mc_df))
@@ -2,6 +2,7 @@
 Stand-alone functions to visualize output of gobble-tick algorithm
 """
 import os
+import numpy as np
 from plotly import subplots
 from plotly import graph_objects as go
 import plotly.express as px
@@ -9,6 +10,12 @@ import plotly.express as px
 # Unify output location
 PLOT_OUTPUT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), 'plot'))
 
+# Traces with more points than this are rendered with WebGL (Scattergl) instead of SVG
+WEBGL_THRESHOLD = 10_000
+
+# Suggested point budget per trace for long runs (see max_points)
+MAX_PLOT_POINTS = 5_000
+
 
 def get_plot_output_path(name):
     """Form final plot output path and create intermediate dirs if needed"""
@@ -17,22 +24,94 @@ def get_plot_output_path(name):
     return path
 
 
-def plot_gobble_tick(df, name='gobble_tick.html'):
+def lttb_indices(y, num_out):
+    """Pick num_out points of a line which preserve its shape (Largest-Triangle-Three-Buckets downsampling)
+
+    The first and last points are always kept. Every bucket in between keeps the point forming the largest triangle
+    with the point kept in the previous bucket and the average of the next bucket (x = position in the series).
+
+    Args:
+        y (array-like): line values
+        num_out (int): number of points to keep
+
+    Returns:
+        np.ndarray: sorted indices of the points to keep
+
+    """
+    y = np.asarray(y, dtype=np.float64)
+    num_points = len(y)
+    if num_out >= num_points or num_out < 3:
+        return np.arange(num_points)
+
+    # Bucket edges of the num_out - 2 inner buckets, the last bucket is the last point
+    bucket_size = (num_points - 2) / (num_out - 2)
+    edges = np.append((np.arange(num_out - 1) * bucket_size).astype(np.int64) + 1, num_points)
+
+    indices = np.empty(num_out, dtype=np.int64)
+    indices[0] = selected = 0
+    for bucket in range(num_out - 2):
+        start, stop, next_stop = edges[bucket], edges[bucket + 1], edges[bucket + 2]
+        next_x = (stop + next_stop - 1) / 2
+        next_y = y[stop:next_stop].mean()
+
+        # Twice the triangle area for every candidate (constant factor doesn't change the argmax)
+        x = np.arange(start, stop)
+        area = np.abs((selected - next_x) * (y[start:stop] - y[selected]) - (selected - x) * (next_y - y[selected]))
+        selected = start + int(np.nanargmax(area)) if not np.isnan(area).all() else start
+        indices[bucket + 1] = selected
+
+    indices[-1] = num_points - 1
+    return indices
+
+
+def add_line(fig, x, y, name, max_points=None, webgl_threshold=WEBGL_THRESHOLD, **kwargs):
+    """Add line trace to figure, downsampled to max_points and rendered with WebGL when it is long
+
+    Args:
+        fig (go.Figure): figure to add to
+        x (pd.Series): x values
+        y (pd.Series): y values
+        name (str): trace name
+        max_points (int): optional point budget (see lttb_indices)
+        webgl_threshold (int): use Scattergl above this many points
+        **kwargs: passed to fig.add_trace (e.g. row, col, secondary_y)
+
+    """
+    if max_points is not None and len(y) > max_points:
+        indices = lttb_indices(y.to_numpy(dtype=np.float64), num_out=max_points)
+        x, y = x.iloc[indices], y.iloc[indices]
+
+    if len(y) > webgl_threshold:
+        trace = go.Scattergl(x=x, y=y, name=name, mode='lines')
+    else:
+        trace = go.Scatter(x=x, y=y, name=name)
+    fig.add_trace(trace, **kwargs)
+
+
+def plot_gobble_tick(df, name='gobble_tick.html', auto_open=True, max_points=None):
     """
 
     Args:
         df (pd.DataFrame): gobble tick output df
         name (str): name of HTML plot with .html extension
+        auto_open (bool): if True, open the plot in a browser
+        max_points (int): optional point budget per line (see multiplot_gobble_tick)
 
     Returns:
         str: path to output HTML file
 
     """
+    value_vars = ['bank', 'stock_val', 'value']
+
+    # Keep the rows any of the lines needs to keep its shape
+    if max_points is not None and len(df.index) > max_points:
+        indices = np.unique(np.concatenate([lttb_indices(df[column], num_out=max_points) for column in value_vars]))
+        df = df.iloc[indices]
 
     # Shape data for plotly express
     melt_df = df.melt(
         id_vars=['tick', 'price', 'Date'],
-        value_vars=['bank', 'stock_val', 'value'],
+        value_vars=value_vars,
         var_name='money_location',
         value_name='money_value'
     )
@@ -43,27 +122,27 @@ def plot_gobble_tick(df, name='gobble_tick.html'):
         x='Date',
         y='money_value',
         color='money_location',
-        hover_data=['tick']
+        hover_data=['tick'],
+        render_mode='webgl' if len(df.index) > WEBGL_THRESHOLD else 'auto',
     )
 
     # Output to HTML file
     path = get_plot_output_path(name=name)
-    fig.write_html(path, auto_open=True)
+    fig.write_html(path, auto_open=auto_open)
     return path
 
 
-def multiplot_gobble_tick(df, name='multiplot_gobble_tick.html'):
-    """Plot GT algorithm + price data with ROI comparison
+def get_multiplot_gobble_tick_figure(df, max_points=None):
+    """Build the figure of multiplot_gobble_tick without writing it
 
     Args:
         df (pd.DataFrame): gobble tick output df
-        name (str): name of HTML plot with .html extension
+        max_points (int): optional point budget per trace (see multiplot_gobble_tick)
 
     Returns:
-        str: path to output HTML file
+        go.Figure: figure
 
     """
-
     fig = subplots.make_subplots(
         rows=2, cols=1, shared_xaxes=True,
         subplot_titles=['Value distribution', 'Price and performance'],
@@ -71,17 +150,38 @@ def multiplot_gobble_tick(df, name='multiplot_gobble_tick.html'):
     )
 
     # Add algo data
-    fig.add_scatter(row=1, col=1, x=df['Date'], y=df['bank'], name="Cash in Bank")
-    fig.add_scatter(row=1, col=1, x=df['Date'], y=df['stock_val'], name="Cash in Stock")
-    fig.add_scatter(row=1, col=1, x=df['Date'], y=df['value'], name="Total Value")
+    add_line(fig, row=1, col=1, x=df['Date'], y=df['bank'], name="Cash in Bank", max_points=max_points)
+    add_line(fig, row=1, col=1, x=df['Date'], y=df['stock_val'], name="Cash in Stock", max_points=max_points)
+    add_line(fig, row=1, col=1, x=df['Date'], y=df['value'], name="Total Value", max_points=max_points)
+
+    add_line(fig, row=2, col=1, x=df['Date'], y=df['price'], name="Price", max_points=max_points)
+    add_line(fig, row=2, col=1, x=df['Date'], y=df['gain'], name="ROI", max_points=max_points, secondary_y=True)
+    add_line(
+        fig, row=2, col=1, x=df['Date'], y=df['stock_gain'], name="Stock ROI", max_points=max_points, secondary_y=True
+    )
+
+    return fig
+
 
-    fig.add_scatter(row=2, col=1, x=df['Date'], y=df['price'], name="Price")
-    fig.add_scatter(row=2, col=1, x=df['Date'], y=df['gain'], name="ROI", secondary_y=True)
-    fig.add_scatter(row=2, col=1, x=df['Date'], y=df['stock_gain'], name="Stock ROI", secondary_y=True)
+def multiplot_gobble_tick(df, name='multiplot_gobble_tick.html', auto_open=True, max_points=None):
+    """Plot GT algorithm + price data with ROI comparison
+
+    Args:
+        df (pd.DataFrame): gobble tick output df
+        name (str): name of HTML plot with .html extension
+        auto_open (bool): if True, open the plot in a browser
+        max_points (int): optional point budget per trace, longer runs are downsampled to keep the HTML small and
+          responsive (e.g. MAX_PLOT_POINTS for minute data)
+
+    Returns:
+        str: path to output HTML file
+
+    """
+    fig = get_multiplot_gobble_tick_figure(df=df, max_points=max_points)
 
     # Output to HTML file
     path = get_plot_output_path(name=name)
-    fig.write_html(path, auto_open=True)
+    fig.write_html(path, auto_open=auto_open)
     return path
 
 
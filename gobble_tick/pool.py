@@ -0,0 +1,147 @@
+"""
+Run the gobble tick parameter sweep over a universe of symbols in a process pool
+
+Price arrays of every symbol are packed into one shared memory block, so workers read them in place instead of
+receiving pickled DataFrames. Each task only carries the symbol, its slice of the block and the parameter grid.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory, util
+import numpy as np
+import pandas as pd
+
+from gobble_tick.sweep import sweep
+
+# Worker-side handles to the shared price block (set once per worker by _attach_shared_prices)
+_shared_block = None
+_shared_prices = None
+
+
+def load_universe_prices(symbols, resolution="D", count=100, price_column='o'):
+    """Read price arrays for many symbols from the Finnhub candle cache (requesting any missing ones)
+
+    Args:
+        symbols (list): stock symbols
+        resolution (str): candle resolution, see FinnhubRequest
+        count (int): number of candles, see FinnhubRequest
+        price_column (str): candle column to use as price ('o' = open, matching GobbleTick.run_from_finnhub_df)
+
+    Returns:
+        dict: symbol -> np.ndarray of prices
+
+    """
+    # Imported here so pool workers never pay for the API/plotting imports
+    from finnhub.api import FinnhubRequest
+
+    prices_by_symbol = {}
+    for symbol in symbols:
+        df = FinnhubRequest(symbol=symbol, resolution=resolution, count=count).get_candle_data()
+        prices_by_symbol[symbol] = df[price_column].to_numpy(dtype=np.float64)
+    return prices_by_symbol
+
+
+def share_prices(prices_by_symbol):
+    """Pack price arrays into a single shared memory block
+
+    Args:
+        prices_by_symbol (dict): symbol -> np.ndarray of prices
+
+    Returns:
+        tuple: (SharedMemory block, dict of symbol -> (offset, length) into the block)
+
+    """
+    layout = {}
+    offset = 0
+    for symbol, prices in prices_by_symbol.items():
+        layout[symbol] = (offset, len(prices))
+        offset += len(prices)
+
+    block = shared_memory.SharedMemory(create=True, size=max(1, offset) * np.dtype(np.float64).itemsize)
+    shared_prices = np.ndarray((offset,), dtype=np.float64, buffer=block.buf)
+    for symbol, prices in prices_by_symbol.items():
+        start, length = layout[symbol]
+        shared_prices[start:start + length] = prices
+
+    return block, layout
+
+
+def _attach_shared_prices(block_name, num_prices):
+    """Pool initializer: attach to the shared price block once per worker (closed again when the worker exits)"""
+    global _shared_block, _shared_prices
+    _shared_block = shared_memory.SharedMemory(name=block_name)
+    _shared_prices = np.ndarray((num_prices,), dtype=np.float64, buffer=_shared_block.buf)
+
+    # Pool workers end with os._exit, which skips atexit but not multiprocessing finalizers
+    util.Finalize(None, _detach_shared_prices, exitpriority=0)
+
+
+def _detach_shared_prices():
+    """Close the worker's handle to the shared price block (the parent unlinks it)"""
+    global _shared_block, _shared_prices
+    if _shared_block is not None:
+        # The array exports the block's buffer, so it has to go first
+        _shared_prices = None
+        _shared_block.close()
+        _shared_block = None
+
+
+def _sweep_shared_symbol(symbol, offset, length, bank, gobble_amounts, exit_rates, cache=None):
+    """Pool task: sweep the parameter grid over one symbol's slice of the shared price block"""
+    result_df = sweep(
+        prices=_shared_prices[offset:offset + length],
+        bank=bank,
+        gobble_amounts=gobble_amounts,
+        exit_rates=exit_rates,
+        cache=cache,
+    )
+    result_df.insert(0, 'symbol', symbol)
+    return result_df
+
+
+def run_universe(prices_by_symbol, bank, gobble_amounts, exit_rates, max_workers=None, cache=None):
+    """Sweep a (gobble_amount x exit_rate) grid over every symbol, one pool task per symbol
+
+    Args:
+        prices_by_symbol (dict): symbol -> np.ndarray of prices (e.g. from load_universe_prices)
+        bank (int): amount of money in bank (in dollars) at the start of every run
+        gobble_amounts (array-like): gobble amounts to try
+        exit_rates (array-like): exit rates to try
+        max_workers (int): number of worker processes (defaults to number of CPUs)
+        cache (ResultCache): optional result cache shared by the workers (see gobble_tick.sweep.sweep)
+
+    Returns:
+        DataFrame: sweep results of all symbols, see gobble_tick.sweep.sweep
+
+    """
+    gobble_amounts = np.asarray(gobble_amounts, dtype=np.float64)
+    exit_rates = np.asarray(exit_rates, dtype=np.float64)
+
+    block, layout = share_prices(prices_by_symbol)
+    num_prices = sum(length for _, length in layout.values())
+    try:
+        with ProcessPoolExecutor(
+            max_workers=max_workers or os.cpu_count(),
+            initializer=_attach_shared_prices,
+            initargs=(block.name, num_prices),
+        ) as executor:
+            futures = [
+                executor.submit(_sweep_shared_symbol, symbol, offset, length, bank, gobble_amounts, exit_rates, cache)
+                for symbol, (offset, length) in layout.items()
+            ]
+            result_dfs = [future.result() for future in futures]
+    finally:
+        block.close()
+        block.unlink()
+
+    return pd.concat(result_dfs, ignore_index=True)
+
+
+if __name__ == '__main__':
+    universe_prices = load_universe_prices(symbols=["SLAB"], resolution="D", count=100)
+    universe_df = run_universe(
+        prices_by_symbol=universe_prices,
+        bank=50000,
+        gobble_amounts=np.linspace(250, 5000, 20),
+        exit_rates=np.linspace(0.01, 0.1, 10),
+    )
+    print(universe_df.sort_values('gain', ascending=False).head(10))
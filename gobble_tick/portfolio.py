@@ -0,0 +1,235 @@
+"""
+Gobble tick over a portfolio of symbols sharing one bank
+
+Every tick the gobble amount is split across the symbols which have a price on that tick (by weight), limited to the
+money left in the shared bank, and every lot exits on the first tick its own symbol reaches its target. Exit ticks of
+all lots of all symbols are resolved at once on the (symbols x ticks) price panel, and the ticks are stepped through
+with array operations across the symbol axis.
+"""
+import os
+import numpy as np
+import pandas as pd
+
+from gobble_tick.sweep import first_passage
+
+
+class GobblePortfolio:
+    """GobbleTick across many symbols with one shared bank
+    - Each tick, spend gobble_amount (or what is left in the bank) across the symbols priced on that tick
+    - Each purchase targets its own price * (1 + exit_rate) and is sold as soon as its symbol reaches it
+    """
+
+    DATA_OUTPUT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), 'data'))
+
+    def __init__(self, bank, gobble_amount, exit_rate, weights=None):
+        """
+
+        Args:
+            bank (int): amount of money in the shared bank (in dollars)
+            gobble_amount (int): amount of money to use to purchase stock each tick, across all symbols
+            exit_rate: rate above buying price to target to sell, float or dict of symbol -> float
+            weights (dict): optional symbol -> relative share of the gobble amount (default: equal shares)
+
+        """
+        self.bank = bank
+        self.gobble_amount = gobble_amount
+        self.exit_rate = exit_rate
+        self.weights = weights
+
+    def get_id(self):
+        """Create unique ID to store results"""
+        exit_rate_id = 'custom' if isinstance(self.exit_rate, dict) else self.exit_rate
+        return f"portfolio_{self.bank}_{self.gobble_amount}_{exit_rate_id}"
+
+    def get_exit_ticks(self, price_panel):
+        """Exit tick of a lot opened on every (symbol, tick) of the panel (missing prices never reach a target)
+
+        Returns:
+            np.ndarray: (symbols x ticks) exit ticks, number of ticks if the target is never reached
+
+        """
+        prices = price_panel.to_numpy(dtype=np.float64).T
+        exit_rates = _get_symbol_values(self.exit_rate, price_panel.columns)
+        return first_passage(np.where(np.isnan(prices), -np.inf, prices), prices * (1 + exit_rates[:, None]))
+
+    def run(self, price_panel, to_file=False, input_label=None):
+        """Run the algorithm over a date-aligned price panel
+
+        Args:
+            price_panel (DataFrame): one column of prices per symbol, one row per tick (NaN = no price on that tick)
+            to_file (bool): if True, output per-tick totals and holdings to CSV files
+            input_label (str): optional additional dir level to label based off of input dataset
+
+        Returns:
+            dict:
+              - 'summary': DataFrame of per-tick totals (enter, exit, profit, bank, stock_val, value, gain)
+              - 'gobble': DataFrame (ticks x symbols) of stocks bought on each tick
+              - 'stock': DataFrame (ticks x symbols) of stocks held after each tick
+
+        """
+        symbols = list(price_panel.columns)
+        prices = price_panel.to_numpy(dtype=np.float64).T  # symbols x ticks
+        num_symbols, num_ticks = prices.shape
+
+        has_price = ~np.isnan(prices)
+        buy_prices = np.where(has_price, prices, 1.0)
+        mark_prices = price_panel.ffill().fillna(0.0).to_numpy(dtype=np.float64).T  # last known price, for valuation
+
+        # Exit tick of every possible lot
+        exit_ticks = self.get_exit_ticks(price_panel)
+
+        weights = _get_symbol_values(self.weights, symbols, default=1.0)
+        tick_weights = np.where(has_price, weights[:, None], 0.0)
+        total_weights = tick_weights.sum(axis=0)
+        shares = np.divide(tick_weights, total_weights, out=np.zeros_like(tick_weights), where=total_weights > 0)
+
+        # Stocks and cost due to exit at each tick per symbol (last column collects lots which never exit)
+        rows = np.arange(num_symbols)
+        exit_schedule = np.zeros((num_symbols, num_ticks + 1))
+        exit_cost_schedule = np.zeros((num_symbols, num_ticks + 1))
+
+        gobble_panel = np.zeros((num_symbols, num_ticks), dtype=np.int64)
+        stock_panel = np.zeros((num_symbols, num_ticks), dtype=np.int64)
+        summary = {column: np.empty(num_ticks) for column in ('enter', 'exit', 'profit', 'bank', 'stock_val', 'value')}
+
+        bank_value = float(self.bank)
+        num_stocks_open = np.zeros(num_symbols)
+        for i in range(num_ticks):
+            price = buy_prices[:, i]
+
+            # Limited to money in the shared bank, split across the symbols priced on this tick
+            buy_in = (bank_value if bank_value < self.gobble_amount else self.gobble_amount) * shares[:, i]
+            gobble = np.round(buy_in / price)
+            enter = gobble * price
+
+            exit_tick = exit_ticks[:, i]
+            exit_schedule[rows, exit_tick] += gobble
+            exit_cost_schedule[rows, exit_tick] += enter
+
+            # All lots which reached their target on this tick
+            closed_stocks = exit_schedule[:, i]
+            closed_returns = closed_stocks * price
+            exit_total = closed_returns.sum()
+
+            enter_total = enter.sum()
+            bank_value = bank_value - enter_total + exit_total
+            num_stocks_open += gobble - closed_stocks
+
+            gobble_panel[:, i] = gobble
+            stock_panel[:, i] = num_stocks_open
+            stock_value = num_stocks_open @ mark_prices[:, i]
+
+            summary['enter'][i] = enter_total
+            summary['exit'][i] = exit_total
+            summary['profit'][i] = exit_total - exit_cost_schedule[:, i].sum()
+            summary['bank'][i] = bank_value
+            summary['stock_val'][i] = stock_value
+            summary['value'][i] = bank_value + stock_value
+
+        summary_df = pd.DataFrame(summary, index=price_panel.index)
+        summary_df['gain'] = summary_df['value'] / self.bank
+        result = {
+            'summary': summary_df,
+            'gobble': pd.DataFrame(gobble_panel.T, index=price_panel.index, columns=symbols),
+            'stock': pd.DataFrame(stock_panel.T, index=price_panel.index, columns=symbols),
+        }
+
+        if to_file:
+            self.output_data_to_file(result, input_label=input_label)
+
+        return result
+
+    def get_trades(self, price_panel, result):
+        """Build the trade ledger of a run: one row per lot opened with a non-zero number of stocks
+
+        Args:
+            price_panel (DataFrame): price panel the portfolio was run on
+            result (dict): output of run
+
+        Returns:
+            DataFrame: same columns as GobbleTick.get_trades, plus the symbol of every lot
+
+        """
+        symbols = list(price_panel.columns)
+        prices = price_panel.to_numpy(dtype=np.float64).T
+        exit_ticks = self.get_exit_ticks(price_panel)
+
+        gobble = result['gobble'].to_numpy().T
+        lot_symbols, lot_ticks = np.nonzero(gobble)
+        num_ticks = prices.shape[1]
+
+        lot_exit_ticks = exit_ticks[lot_symbols, lot_ticks]
+        is_closed = lot_exit_ticks < num_ticks
+        entry_prices = prices[lot_symbols, lot_ticks]
+        exit_prices = np.where(is_closed, prices[lot_symbols, np.minimum(lot_exit_ticks, num_ticks - 1)], np.nan)
+        lot_stock = gobble[lot_symbols, lot_ticks]
+        enter = lot_stock * entry_prices
+        exit_total = exit_prices * lot_stock
+
+        return pd.DataFrame({
+            'symbol': np.array(symbols, dtype=object)[lot_symbols],
+            'entry_tick': lot_ticks,
+            'exit_tick': np.where(is_closed, lot_exit_ticks, -1),
+            'stock': lot_stock,
+            'entry_price': entry_prices,
+            'exit_price': exit_prices,
+            'enter': enter,
+            'exit': exit_total,
+            'profit': exit_total - enter,
+            'holding_ticks': np.where(is_closed, lot_exit_ticks - lot_ticks, np.nan),
+        }).sort_values(['entry_tick', 'symbol'], ignore_index=True)
+
+    def output_data_to_file(self, result, input_label=None):
+        """Output per-tick totals and holdings to CSV files
+
+        Returns:
+            str: output dir
+
+        """
+        output_dir = self.DATA_OUTPUT_PATH if input_label is None else os.path.join(self.DATA_OUTPUT_PATH, input_label)
+        os.makedirs(output_dir, exist_ok=True)
+        for name in ('summary', 'stock'):
+            result[name].to_csv(os.path.join(output_dir, f"{self.get_id()}_{name}.csv"))
+        return output_dir
+
+
+def _get_symbol_values(values, symbols, default=None):
+    """Per-symbol array of a scalar or dict (symbol -> value) parameter, symbols missing from a dict get default"""
+    if isinstance(values, dict):
+        return np.array([values[symbol] if default is None else values.get(symbol, default) for symbol in symbols],
+                        dtype=np.float64)
+    return np.full(len(symbols), default if values is None else values, dtype=np.float64)
+
+
+def get_price_panel(candles_by_symbol, price_column='o'):
+    """Align candle data of many symbols on their timestamps
+
+    Args:
+        candles_by_symbol (dict): symbol -> DataFrame of candles with a 't' column (e.g. FinnhubRequest.get_candle_data)
+        price_column (str): candle column to use as price
+
+    Returns:
+        DataFrame: one column per symbol indexed by sorted UNIX timestamp, NaN where a symbol has no candle
+
+    """
+    return pd.DataFrame({
+        symbol: pd.Series(df[price_column].to_numpy(dtype=np.float64), index=df['t'].to_numpy())
+        for symbol, df in candles_by_symbol.items()
+    }).sort_index()
+
+
+def load_price_panel(symbols, resolution="D", count=100, price_column='o'):
+    """Read the candles of many symbols from the Finnhub candle cache (requesting any missing ones) into a panel"""
+    from finnhub.api import FinnhubRequest
+
+    return get_price_panel({
+        symbol: FinnhubRequest(symbol=symbol, resolution=resolution, count=count).get_candle_data()
+        for symbol in symbols
+    }, price_column=price_column)
+
+
+if __name__ == '__main__':
+    example_panel = load_price_panel(symbols=["SLAB"], resolution="D", count=100)
+    example_portfolio = GobblePortfolio(bank=50000, gobble_amount=1000, exit_rate=0.03)
+    example_result = example_portfolio.run(example_panel)
+    print(example_result['summary'].tail())
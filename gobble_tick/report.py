@@ -0,0 +1,150 @@
+"""
+Batch HTML report of many gobble tick runs, for headless servers
+
+Pages are rendered in a process pool and never opened in a browser. Instead of embedding its own copy of plotly.js
+(several MB), every page references one local plotly.js file written next to them (no CDN, so no network needed).
+index.html links every run along with its final value and gain.
+"""
+import os
+import html
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+
+from gobble_tick.plot import get_multiplot_gobble_tick_figure, MAX_PLOT_POINTS
+
+REPORT_OUTPUT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), 'report'))
+
+PLOTLYJS_NAME = 'plotly.min.js'
+
+
+def write_plotlyjs(report_dir):
+    """Write the plotly.js bundle shipped with the plotly package into the report dir (once)
+
+    Returns:
+        str: path to plotly.js
+
+    """
+    from plotly.offline import get_plotlyjs
+
+    path = os.path.join(report_dir, PLOTLYJS_NAME)
+    plotlyjs = get_plotlyjs()
+    if not os.path.exists(path) or os.path.getsize(path) != len(plotlyjs.encode()):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(plotlyjs)
+    return path
+
+
+def render_run_page(name, df, report_dir, max_points=MAX_PLOT_POINTS):
+    """Write the page of a single run, referencing the shared plotly.js
+
+    Args:
+        name (str): run name, may contain '/' to group runs in sub dirs (e.g. 'SLAB_100D/50000_1000_0.03')
+        df (pd.DataFrame): gobble tick output df
+        report_dir (str): report root dir
+        max_points (int): point budget per trace (see gobble_tick.plot.multiplot_gobble_tick)
+
+    Returns:
+        dict: name, page path relative to report_dir, number of ticks, final value and gain
+
+    """
+    page_path = os.path.join(report_dir, 'runs', f"{name}.html")
+    os.makedirs(os.path.dirname(page_path), exist_ok=True)
+
+    fig = get_multiplot_gobble_tick_figure(df=df, max_points=max_points)
+    fig.update_layout(title=name)
+    plotlyjs_src = os.path.relpath(os.path.join(report_dir, PLOTLYJS_NAME), os.path.dirname(page_path))
+    fig.write_html(page_path, include_plotlyjs=plotlyjs_src.replace(os.sep, '/'), auto_open=False)
+
+    return {
+        'name': name,
+        'path': os.path.relpath(page_path, report_dir).replace(os.sep, '/'),
+        'ticks': len(df.index),
+        'value': float(df['value'].iloc[-1]) if len(df.index) else None,
+        'gain': float(df['gain'].iloc[-1]) if len(df.index) else None,
+    }
+
+
+def _render_run_page_from_tuple(run, report_dir, max_points):
+    """Pool task: unpack (name, df)"""
+    name, df = run
+    return render_run_page(name=name, df=df, report_dir=report_dir, max_points=max_points)
+
+
+def write_index(report_dir, pages, title):
+    """Write index.html linking every run page
+
+    Args:
+        report_dir (str): report root dir
+        pages (list): output of render_run_page for every run
+        title (str): page title
+
+    Returns:
+        str: path to index.html
+
+    """
+    def format_number(value, spec):
+        return '' if value is None else format(value, spec)
+
+    rows = '\n'.join(
+        f'<tr><td><a href="{html.escape(page["path"])}">{html.escape(page["name"])}</a></td>'
+        f'<td>{page["ticks"]}</td><td>{format_number(page["value"], ",.2f")}</td>'
+        f'<td>{format_number(page["gain"], ".4f")}</td></tr>'
+        for page in pages
+    )
+    index_html = f"""<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><title>{html.escape(title)}</title></head>
+<body>
+<h1>{html.escape(title)}</h1>
+<table>
+<tr><th>Run</th><th>Ticks</th><th>Final value</th><th>Gain</th></tr>
+{rows}
+</table>
+</body>
+</html>
+"""
+    path = os.path.join(report_dir, 'index.html')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(index_html)
+    return path
+
+
+def render_report(runs, report_dir=REPORT_OUTPUT_PATH, max_workers=None, max_points=MAX_PLOT_POINTS,
+                  title='Gobble tick report'):
+    """Render every run to its own page in a process pool, plus the shared plotly.js and index.html
+
+    Args:
+        runs (list): (name, df) of every run, df = gobble tick output df
+        report_dir (str): output dir
+        max_workers (int): number of worker processes (defaults to number of CPUs)
+        max_points (int): point budget per trace (see gobble_tick.plot.multiplot_gobble_tick)
+        title (str): title of the index page
+
+    Returns:
+        str: path to index.html
+
+    """
+    os.makedirs(report_dir, exist_ok=True)
+    write_plotlyjs(report_dir)
+
+    max_workers = max_workers or os.cpu_count()
+    render = partial(_render_run_page_from_tuple, report_dir=report_dir, max_points=max_points)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        pages = list(executor.map(render, runs, chunksize=max(1, len(runs) // (4 * max_workers))))
+
+    return write_index(report_dir, pages=pages, title=title)
+
+
+if __name__ == '__main__':
+    import pandas as pd
+    from gobble_tick.algorithm import GobbleTick
+    from finnhub.api import FinnhubRequest
+
+    example_runs = []
+    for candle_id in ['SLAB_52W', 'SLAB_100D']:
+        candle_df = pd.read_csv(os.path.join(FinnhubRequest.CANDLE_DATA_OUTPUT_DIR, f'{candle_id}.csv'), index_col=0)
+        for exit_rate in [0.01, 0.02, 0.03, 0.05, 0.1]:
+            gt = GobbleTick(bank=50000, gobble_amount=1000, exit_rate=exit_rate)
+            example_runs.append((f'{candle_id}/{gt.get_id()}', gt.run_from_finnhub_df(df=candle_df, to_file=False)))
+
+    print(f"Output to {render_report(runs=example_runs)}")
@@ -0,0 +1,371 @@
+"""
+Batched, partitioned store of gobble tick results
+
+Instead of one wide CSV per run (repeating every candle column), runs are buffered and written in bulk, one part file
+per batch, partitioned like the candle store:
+    results/<symbol>/<resolution>/part-<timestamp>-<seq>.npz
+
+A part holds the engine's output columns of all its runs concatenated (one array per column, plus the offset of
+every run into them) and a JSON list describing each run: its parameters and a reference to its input series
+(symbol, resolution, time range, price column, hash of the prices and the CSV file the candles were read from, if
+not the candle store), so inputs are stored once, in the candle store or CSV cache.
+Parts are written on a background thread, so simulation never waits on the disk.
+"""
+import os
+import json
+import time
+import queue
+import threading
+import numpy as np
+import pandas as pd
+
+from gobble_tick.cache import hash_prices
+
+RESULTS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), 'results'))
+
+# Upper bound on (combinations x ticks) cells of each sweep_paths call in ResultWriter.add_sweep
+MAX_PATH_CELLS = 10_000_000
+
+# Marks the end of the queue for the writer thread
+_CLOSE = object()
+
+
+def get_input_ref(symbol, resolution, prices, t=None, price_column='o', csv_path=None):
+    """Reference to the input series of a run, enough to reload it and check it didn't change
+
+    Args:
+        symbol (str): stock symbol
+        resolution (str): candle resolution
+        prices (np.ndarray): price at each tick
+        t (np.ndarray): optional UNIX timestamp of each tick (e.g. the 't' column of the candles)
+        price_column (str): candle column used as price
+        csv_path (str): CSV file the candles were read from (see FinnhubRequest.get_candle_data), None if they come
+          from the candle store
+
+    Returns:
+        dict: JSON-serializable reference
+
+    """
+    has_t = t is not None and len(t)
+    return {
+        'symbol': symbol,
+        'resolution': str(resolution),
+        'from_time': int(t[0]) if has_t else None,
+        'to_time': int(t[-1]) if has_t else None,
+        'price_column': price_column,
+        'num_ticks': len(prices),
+        'prices_sha256': hash_prices(prices),
+        'csv_path': os.path.abspath(csv_path) if csv_path is not None else None,
+    }
+
+
+def get_run_id(bank, gobble_amount, exit_rate):
+    """Same format as GobbleTick.get_id, with whole floats written as ints (e.g. 50000_1000_0.03)"""
+    return '_'.join(
+        str(int(value)) if float(value).is_integer() else str(float(value))
+        for value in (bank, gobble_amount, exit_rate)
+    )
+
+
+class ResultWriter:
+    """Buffers runs and writes them to a partitioned results dir from a background thread
+
+    Use as a context manager (or call close) so the last batches are written before exiting.
+    """
+
+    def __init__(self, results_dir=None, batch_size=1000, max_pending=10_000, compress=False):
+        """
+
+        Args:
+            results_dir (str): optional results dir (defaults to gobble_tick/results)
+            batch_size (int): number of runs per part file
+            max_pending (int): number of runs which can wait for the writer thread before add blocks (bounds memory)
+            compress (bool): if True, zip-compress parts (smaller on disk, slower to write and read)
+
+        """
+        self.results_dir = results_dir if results_dir is not None else RESULTS_DIR
+        self.batch_size = batch_size
+        self.compress = compress
+
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.error = None
+        self.num_parts = 0
+        self.thread = threading.Thread(target=self._write_loop, daemon=True)
+        self.thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add(self, columns, params, input_ref):
+        """Queue a run to be written
+
+        Args:
+            columns (dict): output column -> 1-D np.ndarray over the ticks of the run (e.g. GobbleTick.simulate)
+            params (dict): JSON-serializable parameters of the run (e.g. bank, gobble_amount, exit_rate)
+            input_ref (dict): reference to the input series, see get_input_ref
+
+        """
+        if self.error is not None:
+            raise self.error
+        self.queue.put(({name: np.asarray(values) for name, values in columns.items()}, params, input_ref))
+
+    def add_gobble_tick(self, gt, prices, input_ref):
+        """Simulate a GobbleTick over prices and queue its output columns
+
+        Returns:
+            dict: output columns (see GobbleTick.simulate)
+
+        """
+        columns = gt.simulate(prices)
+        params = {'bank': gt.bank, 'gobble_amount': gt.gobble_amount, 'exit_rate': gt.exit_rate}
+        self.add(columns, params=params, input_ref=input_ref)
+        return columns
+
+    def add_sweep_paths(self, paths, bank, input_ref):
+        """Queue every combination of a sweep as a run
+
+        Args:
+            paths (dict): output of gobble_tick.sweep.sweep_paths
+            bank (int): starting bank of the sweep
+            input_ref (dict): reference to the input series, see get_input_ref
+
+        """
+        for combo, (gobble_amount, exit_rate) in enumerate(zip(paths['gobble_amount'], paths['exit_rate'])):
+            columns = {
+                'gobble': paths['gobble'][combo].astype(np.int64),
+                'exit_tick': paths['exit_tick'][combo],
+                'profit': paths['profit'][combo],
+                'bank': paths['bank'][combo],
+                'stock': paths['stock'][combo].astype(np.int64),
+                'value': paths['value'][combo],
+            }
+            params = {'bank': bank, 'gobble_amount': float(gobble_amount), 'exit_rate': float(exit_rate)}
+            self.add(columns, params=params, input_ref=input_ref)
+
+    def add_sweep(self, prices, bank, gobble_amounts, exit_rates, input_ref, max_path_cells=MAX_PATH_CELLS):
+        """Run gobble_tick.sweep.sweep_paths over a grid in chunks of gobble amounts and queue every combination
+
+        Args:
+            prices (np.ndarray): price at each tick
+            bank (int): starting bank
+            gobble_amounts (array-like): gobble amounts to try
+            exit_rates (array-like): exit rates to try
+            input_ref (dict): reference to the input series, see get_input_ref
+            max_path_cells (int): max (combinations x ticks) cells simulated at once
+
+        Returns:
+            DataFrame: final results of every combination, same as gobble_tick.sweep.sweep (no need to sweep again)
+
+        """
+        from gobble_tick.sweep import sweep_paths, get_paths_results
+
+        gobble_amounts = np.asarray(gobble_amounts, dtype=np.float64).ravel()
+        exit_rates = np.asarray(exit_rates, dtype=np.float64).ravel()
+        chunk_size = max(1, max_path_cells // max(1, len(exit_rates) * len(prices)))
+        result_dfs = []
+        for start in range(0, len(gobble_amounts), chunk_size):
+            paths = sweep_paths(prices, bank=bank, gobble_amounts=gobble_amounts[start:start + chunk_size],
+                                exit_rates=exit_rates)
+            self.add_sweep_paths(paths, bank=bank, input_ref=input_ref)
+            result_dfs.append(get_paths_results(paths, bank=bank))
+        return pd.concat(result_dfs, ignore_index=True)
+
+    def close(self):
+        """Write everything still buffered and stop the writer thread (raises any error the writer hit)"""
+        if self.thread.is_alive():
+            self.queue.put(_CLOSE)
+            self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def _write_loop(self):
+        """Writer thread: group queued runs by partition and column set, write a part per full batch"""
+        batches = {}
+        while True:
+            item = self.queue.get()
+            if item is _CLOSE:
+                break
+            if self.error is not None:
+                continue  # Keep draining so add never blocks forever
+
+            columns, params, input_ref = item
+            batch_key = (input_ref['symbol'], input_ref['resolution'], tuple(columns))
+            batch = batches.setdefault(batch_key, [])
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                self._write_batch(batch_key, batches.pop(batch_key))
+
+        for batch_key, batch in batches.items():
+            self._write_batch(batch_key, batch)
+
+    def _write_batch(self, batch_key, batch):
+        try:
+            write_part(
+                self.results_dir, symbol=batch_key[0], resolution=batch_key[1], runs=batch, seq=self.num_parts,
+                compress=self.compress,
+            )
+            self.num_parts += 1
+        except Exception as error:  # Surfaced to the simulating thread on its next add/close
+            self.error = error
+
+
+def write_part(results_dir, symbol, resolution, runs, seq=0, compress=False):
+    """Write runs sharing the same output columns into a single part file
+
+    Args:
+        results_dir (str): results root dir
+        symbol (str): stock symbol (partition)
+        resolution (str): candle resolution (partition)
+        runs (list): (columns, params, input_ref) of every run, see ResultWriter.add
+        seq (int): sequence number of the part, keeps names unique within a writer
+        compress (bool): if True, zip-compress the part
+
+    Returns:
+        str: path of the part
+
+    """
+    part_dir = get_partition_dir(results_dir, symbol, resolution)
+    os.makedirs(part_dir, exist_ok=True)
+
+    lengths = [len(next(iter(columns.values()), [])) for columns, _, _ in runs]
+    offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+    column_names = list(runs[0][0])
+
+    arrays = {name: np.concatenate([columns[name] for columns, _, _ in runs]) for name in column_names}
+    arrays['__offsets__'] = offsets
+    arrays['__runs__'] = np.array(json.dumps([
+        {'run_id': get_run_id(**params) if set(params) == {'bank', 'gobble_amount', 'exit_rate'} else None,
+         'params': params, 'input': input_ref}
+        for _, params, input_ref in runs
+    ]))
+
+    path = os.path.join(part_dir, f"part-{time.time_ns()}-{os.getpid()}-{seq:05}.npz")
+
+    # Written to a temporary file first, so readers never see a partial part
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        (np.savez_compressed if compress else np.savez)(f, **arrays)
+    os.replace(tmp_path, path)
+    return path
+
+
+def get_partition_dir(results_dir, symbol, resolution):
+    return os.path.join(results_dir, symbol, str(resolution))
+
+
+def iter_parts(results_dir=RESULTS_DIR, symbol=None, resolution=None):
+    """Yield paths of every part, optionally restricted to a symbol and/or resolution"""
+    if not os.path.isdir(results_dir):
+        return
+    for part_symbol in sorted(os.listdir(results_dir)):
+        if symbol is not None and part_symbol != symbol:
+            continue
+        for part_resolution in sorted(os.listdir(os.path.join(results_dir, part_symbol))):
+            if resolution is not None and part_resolution != str(resolution):
+                continue
+            part_dir = get_partition_dir(results_dir, part_symbol, part_resolution)
+            for name in sorted(os.listdir(part_dir)):
+                if name.endswith('.npz'):
+                    yield os.path.join(part_dir, name)
+
+
+def load_runs(results_dir=RESULTS_DIR, symbol=None, resolution=None):
+    """Index of every stored run (without loading the output columns)
+
+    Returns:
+        DataFrame: one row per run with run_id, parameters, input reference, part path and row range in the part
+
+    """
+    rows = []
+    for path in iter_parts(results_dir, symbol=symbol, resolution=resolution):
+        with np.load(path) as npz:
+            offsets = npz['__offsets__']
+            runs = json.loads(str(npz['__runs__']))
+        for i, run in enumerate(runs):
+            rows.append({
+                'run_id': run['run_id'], **run['params'], **run['input'],
+                'part': path, 'start': int(offsets[i]), 'stop': int(offsets[i + 1]),
+            })
+    return pd.DataFrame(rows)
+
+
+def load_run_df(run, store=None, join_input=False):
+    """Load the output columns of a stored run
+
+    Args:
+        run: row of load_runs
+        store (CandleStore): optional store to join the input candles from (defaults to finnhub/candle_store), unless
+          the run's input was read from a CSV file
+        join_input (bool): if True, join the referenced input candles (and a 'price' column) onto the output
+
+    Returns:
+        DataFrame: output columns of the run (plus input candles if join_input)
+
+    Raises:
+        LookupError: if join_input and the input candles can't be found (e.g. never written to the candle store)
+        ValueError: if join_input and the input candles changed since the run was written
+
+    """
+    with np.load(run['part']) as npz:
+        df = pd.DataFrame({
+            name: npz[name][run['start']:run['stop']] for name in npz.files if not name.startswith('__')
+        })
+
+    if not join_input:
+        return df
+
+    input_df, source = load_input_df(run, store=store)
+    if input_df.empty and run['num_ticks']:
+        raise LookupError(f"Input of run {run['run_id']} ({run['symbol']} {run['resolution']} from {run['from_time']} "
+                          f"to {run['to_time']}) is not in {source}")
+
+    prices = input_df[run['price_column']].to_numpy(dtype=np.float64)
+    if hash_prices(prices) != run['prices_sha256']:
+        raise ValueError(f"Input of run {run['run_id']} changed in {source} since it was written")
+
+    return pd.concat([input_df.assign(price=prices), df], axis=1)
+
+
+def load_input_df(run, store=None):
+    """Input candles referenced by a run, from its CSV file if it has one, the candle store otherwise
+
+    Returns:
+        tuple: DataFrame of the candles in the run's time range (empty if there are none), and description of where
+          they were looked up
+
+    """
+    csv_path = run.get('csv_path')
+    if isinstance(csv_path, str):
+        if not os.path.exists(csv_path):
+            return pd.DataFrame(columns=['c', 'h', 'l', 'o', 't', 'v']), csv_path
+        input_df = pd.read_csv(csv_path, index_col=0)
+        in_range = (input_df['t'] >= run['from_time']) & (input_df['t'] <= run['to_time'])
+        return input_df[in_range].reset_index(drop=True), csv_path
+
+    from finnhub.store import CandleStore
+
+    store = store if store is not None else CandleStore()
+    input_df = store.load_df(run['symbol'], run['resolution'], from_time=run['from_time'], to_time=run['to_time'])
+    return input_df, f"the candle store {store.store_dir}"
+
+
+if __name__ == '__main__':
+    from finnhub.api import FinnhubRequest
+
+    # Example: 10 x 10 sweep over 100 days of SLAB, every combination stored as a run in a single part
+    example_df = FinnhubRequest(symbol="SLAB", resolution="D", count=100).get_candle_data()
+    example_prices = example_df['o'].to_numpy(dtype=np.float64)
+    example_ref = get_input_ref("SLAB", "D", example_prices, t=example_df['t'].to_numpy())
+
+    with ResultWriter() as writer:
+        writer.add_sweep(
+            example_prices, bank=50000, gobble_amounts=np.linspace(100, 5000, 10),
+            exit_rates=np.linspace(0.005, 0.1, 10), input_ref=example_ref,
+        )
+
+    example_runs = load_runs(symbol="SLAB", resolution="D")
+    print(example_runs.head())
+    print(load_run_df(example_runs.iloc[0]).tail())
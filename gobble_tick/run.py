@@ -3,25 +3,30 @@ Get data via finnhub API, run gobble tick algorithm, and plot results to HTML
 """
 from finnhub.api import FinnhubRequest
 from gobble_tick.algorithm import GobbleTick
-import gobble_tick.plot
 
 
-def run_gobble_tick(finnhub_request, gt):
+def run_gobble_tick(finnhub_request, gt, plot=True):
     """Combine API and algorithm calls into single function
 
     Args:
         finnhub_request (FinnhubRequest):
         gt (GobbleTick):
+        plot (bool): if True, plot candles and results to HTML (plotly is only imported then)
 
     Returns:
+        DataFrame: gobble tick output
 
     """
-
     df = finnhub_request.get_candle_data(to_file=True)
-    finnhub_request.plot_candle_data(df=df)
-
     gt_df = gt.run_from_finnhub_df(df=df, to_file=True, input_label=finnhub_request.get_candle_id())
-    gobble_tick.plot.multiplot_gobble_tick(df=gt_df, name=f'{finnhub_request.get_candle_id()}\\{gt.get_id()}.html')
+
+    if plot:
+        import gobble_tick.plot
+
+        finnhub_request.plot_candle_data(df=df)
+        gobble_tick.plot.multiplot_gobble_tick(df=gt_df, name=f'{finnhub_request.get_candle_id()}\\{gt.get_id()}.html')
+
+    return gt_df
 
 
 if __name__ == '__main__':
@@ -0,0 +1,311 @@
+"""
+Adaptive search of gobble tick parameters: successive halving and Hyperband
+
+Successive halving scores a set of candidates on a small budget, keeps the best 1/eta of them and scores those on a
+budget eta times bigger, and so on up to the full budget. The budget of a rung (its fidelity) is either:
+  - 'grid': spacing of the (gobble_amount x exit_rate) grid. The first rung scores a coarse sub-grid (every
+    1/min_fraction-th value of each parameter) and every later rung the grid points eta times closer around the
+    survivors of the previous one, always on the full history.
+  - 'prefix': length of the price series. Every combination of the grid is first scored on a prefix of each series
+    (the first min_fraction of its ticks), the best 1/eta move on to a prefix eta times longer, and so on until the
+    survivors are scored on the full history.
+Hyperband runs several prefix brackets, from many candidates on short prefixes to few candidates on the full history.
+
+Every rung is one vectorized sweep of its candidates (gobble_tick.sweep.sweep_combos), and rungs restart from the
+first tick, so ticks_simulated counts every tick of every rung.
+"""
+import math
+import numpy as np
+import pandas as pd
+
+from gobble_tick.sweep import get_grid, sweep_combos
+
+# Shortest prefix any candidate is scored on
+MIN_PREFIX_TICKS = 10
+
+FIDELITIES = ('grid', 'prefix')
+
+
+def successive_halving(prices, bank, gobble_amounts, exit_rates, min_fraction=1 / 9, eta=3, metric='gain',
+                       fidelity='grid'):
+    """Successive halving over the (gobble_amount x exit_rate) grid
+
+    Args:
+        prices: price array of one symbol, or dict of symbol -> price array (scores are averaged over symbols)
+        bank (int): amount of money in bank (in dollars) at the start of every run
+        gobble_amounts (array-like): gobble amounts to try (sorted, so neighbours on the grid are similar)
+        exit_rates (array-like): exit rates to try (sorted)
+        min_fraction (float): first rung's spacing of the sub-grid along each parameter (1/min_fraction grid steps)
+          with grid fidelity, or fraction of each price series it is scored on with prefix fidelity
+        eta (int): 1/eta of the candidates survive each rung, and the budget grows eta times
+        metric (str): result column to maximize (see gobble_tick.sweep.sweep, e.g. 'gain' or 'value')
+        fidelity (str): budget of a rung, 'grid' or 'prefix' (see module doc)
+
+    Returns:
+        dict: see get_search_result
+
+    """
+    if fidelity not in FIDELITIES:
+        raise ValueError(f"Unknown fidelity {fidelity}, expected one of {FIDELITIES}")
+
+    prices_by_symbol = _get_prices_by_symbol(prices)
+    combo_gobble, combo_exit_rate = get_grid(gobble_amounts, exit_rates)
+
+    s = _get_num_brackets(min_fraction, eta) - 1
+    if fidelity == 'grid':
+        grid_shape = (len(np.ravel(gobble_amounts)), len(np.ravel(exit_rates)))
+        trace_df = _run_grid_bracket(prices_by_symbol, bank, combo_gobble, combo_exit_rate, grid_shape, s, eta, metric)
+    else:
+        trace_df = _run_bracket(prices_by_symbol, bank, combo_gobble, combo_exit_rate, s, eta, metric, bracket=0)
+    return get_search_result(trace_df, prices_by_symbol, len(combo_gobble), metric)
+
+
+def hyperband(prices, bank, gobble_amounts, exit_rates, min_fraction=1 / 9, eta=3, metric='gain', seed=0,
+              num_candidates=None):
+    """Hyperband: brackets of successive halving from many candidates on short prefixes to few on the full history
+
+    Bracket s starts ceil(num_candidates * num_brackets / (s + 1) * eta**(s - s_max)) candidates (sampled from the
+    grid without replacement) on prefixes of eta**-s of each series, for s = s_max = num_brackets - 1 down to 0.
+
+    Args:
+        prices: price array of one symbol, or dict of symbol -> price array (scores are averaged over symbols)
+        bank (int): amount of money in bank (in dollars) at the start of every run
+        gobble_amounts (array-like): gobble amounts to try
+        exit_rates (array-like): exit rates to try
+        min_fraction (float): shortest prefix (fraction of each price series) of any bracket
+        eta (int): 1/eta of the candidates survive each rung, and the prefix grows eta times
+        metric (str): result column to maximize (see gobble_tick.sweep.sweep, e.g. 'gain' or 'value')
+        seed (int): random seed of the candidates sampled by each bracket
+        num_candidates (int): candidates of the first (shortest prefix) bracket, by default the most whose brackets
+          simulate at most 1/eta of the ticks of a full grid sweep (on large grids, most combinations are then
+          never scored, see fraction_evaluated)
+
+    Returns:
+        dict: see get_search_result
+
+    """
+    prices_by_symbol = _get_prices_by_symbol(prices)
+    combo_gobble, combo_exit_rate = get_grid(gobble_amounts, exit_rates)
+    rng = np.random.default_rng(seed)
+
+    num_brackets = _get_num_brackets(min_fraction, eta)
+    s_max = num_brackets - 1
+    if num_candidates is None:
+        num_candidates = _get_default_num_candidates(prices_by_symbol, len(combo_gobble), s_max, eta)
+
+    trace_dfs = []
+    for s in range(s_max, -1, -1):
+        bracket_size = _get_bracket_size(num_candidates, len(combo_gobble), s, s_max, eta)
+        candidates = np.sort(rng.choice(len(combo_gobble), size=bracket_size, replace=False))
+        trace_dfs.append(_run_bracket(
+            prices_by_symbol, bank, combo_gobble[candidates], combo_exit_rate[candidates], s, eta, metric,
+            bracket=s_max - s,
+        ))
+
+    return get_search_result(pd.concat(trace_dfs, ignore_index=True), prices_by_symbol, len(combo_gobble), metric)
+
+
+def get_search_result(trace_df, prices_by_symbol, grid_size, metric):
+    """Best candidate scored on the full history, with the trace and cost of the search
+
+    Returns:
+        dict:
+          - 'best': dict of gobble_amount, exit_rate and metric of the best candidate on the full history
+          - 'trace': DataFrame of every evaluation (bracket, rung, fraction, candidate, metric, ticks, kept)
+          - 'evaluated': number of distinct combinations scored (on any prefix)
+          - 'fraction_evaluated': evaluated / number of combinations in the grid
+          - 'ticks_simulated': ticks simulated by the search (summed over candidates, rungs and symbols)
+          - 'grid_ticks': ticks a full grid sweep over the full history of every symbol would simulate
+          - 'speedup': grid_ticks / ticks_simulated
+
+    """
+    full_df = trace_df[trace_df['fraction'] == 1]
+    best = full_df.loc[full_df[metric].idxmax()]
+
+    evaluated = len(trace_df[['gobble_amount', 'exit_rate']].drop_duplicates())
+    ticks_simulated = int(trace_df['ticks'].sum())
+    grid_ticks = grid_size * sum(len(prices) for prices in prices_by_symbol.values())
+    return {
+        'best': {'gobble_amount': float(best['gobble_amount']), 'exit_rate': float(best['exit_rate']),
+                 metric: float(best[metric])},
+        'trace': trace_df,
+        'evaluated': evaluated,
+        'fraction_evaluated': evaluated / grid_size,
+        'ticks_simulated': ticks_simulated,
+        'grid_ticks': grid_ticks,
+        'speedup': grid_ticks / ticks_simulated if ticks_simulated else np.nan,
+    }
+
+
+def _run_bracket(prices_by_symbol, bank, combo_gobble, combo_exit_rate, s, eta, metric, bracket):
+    """Successive halving from a prefix of eta**-s of each series up to the full history (s + 1 rungs)
+
+    Returns:
+        DataFrame: one row per candidate evaluated on each rung
+    """
+    trace_dfs = []
+    candidates = np.arange(len(combo_gobble))
+    for rung in range(s + 1):
+        fraction = float(eta) ** (rung - s)
+        scores, ticks = _get_scores(prices_by_symbol, bank, combo_gobble[candidates], combo_exit_rate[candidates],
+                                    fraction, metric)
+
+        # Best 1/eta survive (stable order, so ties keep the grid order)
+        num_kept = max(1, len(candidates) // eta) if rung < s else 0
+        kept = np.zeros(len(candidates), dtype=bool)
+        kept[np.argsort(-scores, kind='stable')[:num_kept]] = True
+
+        trace_dfs.append(pd.DataFrame({
+            'bracket': bracket,
+            'rung': rung,
+            'fraction': fraction,
+            'gobble_amount': combo_gobble[candidates],
+            'exit_rate': combo_exit_rate[candidates],
+            metric: scores,
+            'ticks': ticks,
+            'kept': kept,
+        }))
+        candidates = candidates[kept]
+
+    return pd.concat(trace_dfs, ignore_index=True)
+
+
+def _run_grid_bracket(prices_by_symbol, bank, combo_gobble, combo_exit_rate, grid_shape, s, eta, metric):
+    """Successive halving over the spacing of the grid, every rung scored on the full history (s + 1 rungs)
+
+    Rung r scores the grid points eta**(s - r) steps apart along each parameter: all of them (centered on the grid)
+    for the first rung, and those within one step of a survivor of the previous rung after that. Combinations
+    already scored by an earlier rung keep their score, so they cost no ticks.
+
+    Returns:
+        DataFrame: one row per candidate of each rung
+    """
+    grid_size = len(combo_gobble)
+    scores = np.full(grid_size, np.nan)
+    is_scored = np.zeros(grid_size, dtype=bool)
+    num_ticks = sum(len(prices) for prices in prices_by_symbol.values())
+
+    trace_dfs = []
+    survivors = None
+    for rung in range(s + 1):
+        spacing = eta ** (s - rung)
+        if survivors is None:
+            axes = [np.arange(((size - 1) % spacing) // 2, size, spacing) for size in grid_shape]
+            rows, columns = (index.ravel() for index in np.meshgrid(*axes, indexing='ij'))
+        else:
+            steps = np.arange(-(eta // 2), eta // 2 + 1) * spacing
+            survivor_rows, survivor_columns = np.unravel_index(survivors, grid_shape)
+            rows, columns = np.broadcast_arrays(survivor_rows[:, None, None] + steps[:, None],
+                                                survivor_columns[:, None, None] + steps)
+            in_grid = (rows >= 0) & (rows < grid_shape[0]) & (columns >= 0) & (columns < grid_shape[1])
+            rows, columns = rows[in_grid], columns[in_grid]
+        candidates = np.unique(np.ravel_multi_index((rows, columns), grid_shape))
+
+        is_new = ~is_scored[candidates]
+        new = candidates[is_new]
+        if len(new):
+            scores[new], _ = _get_scores(prices_by_symbol, bank, combo_gobble[new], combo_exit_rate[new], 1.0, metric)
+            is_scored[new] = True
+
+        # Best 1/eta survive (stable order, so ties keep the grid order)
+        candidate_scores = scores[candidates]
+        num_kept = max(1, len(candidates) // eta) if rung < s else 0
+        kept = np.zeros(len(candidates), dtype=bool)
+        kept[np.argsort(-candidate_scores, kind='stable')[:num_kept]] = True
+
+        trace_dfs.append(pd.DataFrame({
+            'bracket': 0,
+            'rung': rung,
+            'fraction': 1.0,
+            'gobble_amount': combo_gobble[candidates],
+            'exit_rate': combo_exit_rate[candidates],
+            metric: candidate_scores,
+            'ticks': np.where(is_new, num_ticks, 0),
+            'kept': kept,
+        }))
+        survivors = candidates[kept]
+
+    return pd.concat(trace_dfs, ignore_index=True)
+
+
+def _get_scores(prices_by_symbol, bank, combo_gobble, combo_exit_rate, fraction, metric):
+    """Metric of every combination on the prefix of each symbol, averaged over symbols
+
+    Returns:
+        tuple: np.ndarray of scores, and ticks simulated per combination (summed over symbols)
+
+    """
+    scores = np.zeros(len(combo_gobble))
+    ticks = 0
+    for prices in prices_by_symbol.values():
+        prefix = prices[:get_prefix_length(len(prices), fraction)]
+        scores += sweep_combos(prefix, bank, combo_gobble, combo_exit_rate)[metric]
+        ticks += len(prefix)
+    return scores / len(prices_by_symbol), ticks
+
+
+def get_prefix_length(num_ticks, fraction):
+    """Number of ticks of a prefix covering fraction of a series"""
+    return min(num_ticks, max(MIN_PREFIX_TICKS, math.ceil(num_ticks * fraction)))
+
+
+def _get_bracket_size(num_candidates, grid_size, s, s_max, eta):
+    """Candidates of the bracket starting on a prefix of eta**-s, given those of the first one (s = s_max)"""
+    return min(grid_size, math.ceil(num_candidates * (s_max + 1) / (s + 1) * eta ** (s - s_max)))
+
+
+def _get_hyperband_ticks(prices_by_symbol, num_candidates, grid_size, s_max, eta):
+    """Ticks all brackets of hyperband simulate with num_candidates in the first one"""
+    ticks = 0
+    for s in range(s_max, -1, -1):
+        num_rung_candidates = _get_bracket_size(num_candidates, grid_size, s, s_max, eta)
+        for rung in range(s + 1):
+            fraction = float(eta) ** (rung - s)
+            ticks += num_rung_candidates * sum(get_prefix_length(len(prices), fraction)
+                                               for prices in prices_by_symbol.values())
+            num_rung_candidates = max(1, num_rung_candidates // eta)
+    return ticks
+
+
+def _get_default_num_candidates(prices_by_symbol, grid_size, s_max, eta):
+    """Most candidates of the first bracket whose brackets simulate at most 1/eta of the ticks of the full grid"""
+    max_ticks = grid_size * sum(len(prices) for prices in prices_by_symbol.values()) / eta
+    low, high = 1, grid_size
+    while low < high:
+        middle = (low + high + 1) // 2
+        if _get_hyperband_ticks(prices_by_symbol, middle, grid_size, s_max, eta) <= max_ticks:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def _get_num_brackets(min_fraction, eta):
+    """Number of prefix lengths eta**-s >= min_fraction (s = 0, 1, ...), i.e. rungs of a full bracket"""
+    return int(math.floor(math.log(1 / min_fraction, eta) + 1e-9)) + 1
+
+
+def _get_prices_by_symbol(prices):
+    if isinstance(prices, dict):
+        return {symbol: np.asarray(symbol_prices, dtype=np.float64) for symbol, symbol_prices in prices.items()}
+    return {None: np.asarray(prices, dtype=np.float64)}
+
+
+if __name__ == '__main__':
+    from gobble_tick.pool import load_universe_prices
+    from gobble_tick.sweep import sweep
+
+    # Example: 30 x 30 grid over SLAB, rank of the combination each search finds among all of them on the full history
+    example_prices = load_universe_prices(symbols=["SLAB"], resolution="D", count=100)
+    example_grid = dict(bank=50000, gobble_amounts=np.linspace(250, 5000, 30), exit_rates=np.linspace(0.01, 0.1, 30))
+    example_df = sweep(example_prices["SLAB"], **example_grid)
+    example_ranks = example_df.set_index(['gobble_amount', 'exit_rate'])['gain'].rank(ascending=False, method='min')
+
+    for example_search, example_kwargs in [(successive_halving, {}), (successive_halving, {'fidelity': 'prefix'}),
+                                           (hyperband, {})]:
+        example_result = example_search(example_prices, **example_grid, **example_kwargs)
+        example_best = example_result['best']
+        example_rank = example_ranks[(example_best['gobble_amount'], example_best['exit_rate'])]
+        print(example_search.__name__, example_kwargs, example_best,
+              f"rank {example_rank:.0f} of {len(example_ranks)}, {example_result['evaluated']} scored,",
+              f"{example_result['speedup']:.1f}x fewer ticks")
@@ -0,0 +1,298 @@
+"""
+Vectorized parameter sweep of the gobble tick algorithm
+
+Every position opened by GobbleTick exits on the first tick (at or after its entry) whose price reaches its target,
+regardless of the bank or how many shares were bought. That exit tick only depends on the price series and the
+exit rate, so it is computed once per exit rate and shared by every gobble amount in the grid. The bank itself is
+then stepped through time for all (gobble_amount, exit_rate) combinations at once as NumPy arrays.
+"""
+import numpy as np
+import pandas as pd
+
+# Upper bound on cells of the (combinations x ticks) exit schedule held in memory at once
+MAX_SCHEDULE_CELLS = 50_000_000
+
+# Columns of the cached sweep table of a price series (see sweep with cache)
+SWEEP_TABLE_DTYPES = {
+    'gobble_amount': np.float64,
+    'exit_rate': np.float64,
+    'bank': np.float64,
+    'stock': np.int64,
+    'value': np.float64,
+    'gain': np.float64,
+    'trades': np.int64,
+}
+
+
+def first_passage(prices, targets):
+    """Find the first tick at or after each entry whose price reaches that entry's target
+
+    Uses a sparse table of range maxima so all entries are resolved with O(n log n) array operations. Works along the
+    last axis, so a (symbols x ticks) panel resolves every symbol at once.
+
+    Args:
+        prices (np.ndarray): price at each tick (float32 prices are kept as float32 to halve memory)
+        targets (np.ndarray): target price of the position opened at each tick (same shape as prices)
+
+    Returns:
+        np.ndarray: exit tick for each entry (number of ticks if the target is never reached)
+
+    """
+    dtype = np.float32 if getattr(prices, 'dtype', None) == np.float32 else np.float64
+    prices = np.asarray(prices, dtype=dtype)
+    targets = np.asarray(targets, dtype=dtype)
+    num_ticks = prices.shape[-1]
+
+    # levels[k][..., j] = max(prices[..., j:j + 2**k])
+    levels = [prices]
+    while (1 << len(levels)) <= num_ticks:
+        prev = levels[-1]
+        half = 1 << (len(levels) - 1)
+        levels.append(np.maximum(prev[..., :-half], prev[..., half:]))
+
+    # Greedily skip the largest blocks which stay below target (engine exits when target <= price)
+    pos = np.broadcast_to(np.arange(num_ticks), prices.shape)
+    for k in range(len(levels) - 1, -1, -1):
+        level = levels[k]
+        level_len = level.shape[-1]
+        in_range = pos < level_len
+        block_max = np.take_along_axis(level, np.minimum(pos, level_len - 1), axis=-1)
+        pos = pos + ((in_range & (block_max < targets)) << k)
+
+    return pos
+
+
+def sweep(prices, bank, gobble_amounts, exit_rates, max_schedule_cells=MAX_SCHEDULE_CELLS, cache=None):
+    """Run the gobble tick algorithm for every (gobble_amount, exit_rate) combination over one price series
+
+    Results match GobbleTick.run up to float rounding of the order in which exits are summed.
+
+    Args:
+        prices (array-like): price at each tick (e.g. the 'o' column of Finnhub candle data)
+        bank (int): amount of money in bank (in dollars) at the start of every run
+        gobble_amounts (array-like): gobble amounts to try
+        exit_rates (array-like): exit rates to try
+        max_schedule_cells (int): memory cap, combinations are processed in chunks to stay under it
+        cache (ResultCache): optional result cache, only combinations never swept over the same prices and bank are
+          simulated, so overlapping sweeps reuse each other's results (see gobble_tick.cache)
+
+    Returns:
+        DataFrame: one row per combination with final bank, stock, value, gain and number of trades (exited lots)
+
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    combo_gobble, combo_exit_rate = get_grid(gobble_amounts, exit_rates)
+
+    if cache is None:
+        results = sweep_combos(prices, bank, combo_gobble, combo_exit_rate, max_schedule_cells)
+    else:
+        results = _sweep_combos_cached(prices, bank, combo_gobble, combo_exit_rate, max_schedule_cells, cache)
+
+    return pd.DataFrame({'gobble_amount': combo_gobble, 'exit_rate': combo_exit_rate, **results})
+
+
+def sweep_paths(prices, bank, gobble_amounts, exit_rates):
+    """Same as sweep, but keep the full per-tick history of every combination (e.g. for gobble_tick.analytics)
+
+    Holds several (combinations x ticks) arrays in memory, so keep grids smaller than for sweep.
+
+    Args:
+        prices (array-like): price at each tick
+        bank (int): amount of money in bank (in dollars) at the start of every run
+        gobble_amounts (array-like): gobble amounts to try
+        exit_rates (array-like): exit rates to try
+
+    Returns:
+        dict: arrays of shape (combinations,) for 'gobble_amount' and 'exit_rate', (ticks,) for 'price', and
+          (combinations x ticks) for 'gobble', 'exit_tick', 'profit', 'bank', 'stock' and 'value'
+          (same meaning as the GobbleTick.run columns, exit_tick = ticks if the position never exits)
+
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    combo_gobble, combo_exit_rate = get_grid(gobble_amounts, exit_rates)
+    rate_exit_ticks, combo_rate = _get_exit_ticks(prices, combo_exit_rate)
+    exit_ticks = rate_exit_ticks[combo_rate]
+
+    paths = {column: np.empty(exit_ticks.shape) for column in ('gobble', 'profit', 'bank', 'stock')}
+    _sweep_chunk(prices, bank, combo_gobble, exit_ticks, paths=paths)
+
+    paths['value'] = paths['bank'] + paths['stock'] * prices
+    paths.update(gobble_amount=combo_gobble, exit_rate=combo_exit_rate, price=prices, exit_tick=exit_ticks)
+    return paths
+
+
+def get_paths_results(paths, bank):
+    """Final results of every combination of sweep_paths, same columns as sweep
+
+    Args:
+        paths (dict): output of sweep_paths
+        bank (int): starting bank of the sweep
+
+    Returns:
+        DataFrame: one row per combination with final bank, stock, value, gain and number of trades (exited lots)
+
+    """
+    num_ticks = len(paths['price'])
+    if num_ticks:
+        bank_value, num_stocks_open, value = paths['bank'][:, -1], paths['stock'][:, -1], paths['value'][:, -1]
+    else:
+        bank_value = np.full(len(paths['gobble_amount']), bank, dtype=np.float64)
+        num_stocks_open, value = np.zeros(len(bank_value)), bank_value
+
+    return pd.DataFrame({
+        'gobble_amount': paths['gobble_amount'],
+        'exit_rate': paths['exit_rate'],
+        'bank': bank_value,
+        'stock': num_stocks_open.astype(np.int64),
+        'value': value,
+        'gain': value / bank,
+        'trades': ((paths['gobble'] != 0) & (paths['exit_tick'] < num_ticks)).sum(axis=1).astype(np.int64),
+    })
+
+
+def get_grid(gobble_amounts, exit_rates):
+    """Expand a (gobble_amount x exit_rate) grid into flat combinations (gobble amount major)
+
+    Returns:
+        tuple: np.ndarray of the gobble amount and of the exit rate of each combination
+
+    """
+    gobble_amounts = np.asarray(gobble_amounts, dtype=np.float64).ravel()
+    exit_rates = np.asarray(exit_rates, dtype=np.float64).ravel()
+    return np.repeat(gobble_amounts, len(exit_rates)), np.tile(exit_rates, len(gobble_amounts))
+
+
+def _get_exit_ticks(prices, combo_exit_rate):
+    """Exit tick of every entry, resolved once per distinct exit rate and shared across all gobble amounts
+
+    Returns:
+        tuple: (exit rates x ticks) exit ticks, and index of each combination's exit rate into them
+
+    """
+    exit_rates, combo_rate = np.unique(combo_exit_rate, return_inverse=True)
+    exit_ticks = np.stack([first_passage(prices, prices * (1 + exit_rate)) for exit_rate in exit_rates])
+    return exit_ticks, combo_rate
+
+
+def sweep_combos(prices, bank, combo_gobble, combo_exit_rate, max_schedule_cells=MAX_SCHEDULE_CELLS):
+    """Final results of any list of (gobble_amount, exit_rate) combinations, exit ticks resolved once per exit rate
+
+    Unlike sweep, combinations don't have to form a full grid (e.g. the candidates of gobble_tick.search).
+
+    Args:
+        prices (np.ndarray): price at each tick (float64)
+        bank (int): amount of money in bank (in dollars) at the start of every run
+        combo_gobble (np.ndarray): gobble amount of each combination
+        combo_exit_rate (np.ndarray): exit rate of each combination
+        max_schedule_cells (int): memory cap, combinations are processed in chunks to stay under it
+
+    Returns:
+        dict: column -> np.ndarray for bank, stock, value, gain and trades of each combination
+
+    """
+    num_ticks = len(prices)
+    exit_ticks, combo_rate = _get_exit_ticks(prices, combo_exit_rate)
+
+    chunk_size = max(1, max_schedule_cells // (num_ticks + 1))
+    results = [
+        _sweep_chunk(prices, bank, combo_gobble[start:stop], exit_ticks[combo_rate[start:stop]])
+        for start, stop in ((start, start + chunk_size) for start in range(0, len(combo_gobble), chunk_size))
+    ] or [(np.empty(0),) * 3]
+    bank_value, num_stocks_open, trades = (np.concatenate(arrays) for arrays in zip(*results))
+
+    value = bank_value + num_stocks_open * prices[-1] if num_ticks else bank_value
+
+    return {
+        'bank': bank_value,
+        'stock': num_stocks_open.astype(np.int64),
+        'value': value,
+        'gain': value / bank,
+        'trades': trades.astype(np.int64),
+    }
+
+
+def _sweep_combos_cached(prices, bank, combo_gobble, combo_exit_rate, max_schedule_cells, cache):
+    """Same as sweep_combos, but look up combinations in the cached sweep table of these prices and bank first
+
+    Newly simulated combinations are added to the table, so it grows into the union of every sweep run over them.
+    """
+    cache_key = cache.get_key(prices, kind='sweep', bank=bank)
+    table = cache.get(cache_key)
+    if table is None:
+        table = {column: np.empty(0, dtype=dtype) for column, dtype in SWEEP_TABLE_DTYPES.items()}
+
+    row_by_combo = {combo: row for row, combo in enumerate(zip(table['gobble_amount'].tolist(),
+                                                               table['exit_rate'].tolist()))}
+    rows = np.array([row_by_combo.get(combo, -1) for combo in zip(combo_gobble.tolist(), combo_exit_rate.tolist())],
+                    dtype=np.int64)
+
+    is_missing = rows < 0
+    if is_missing.any():
+        # Simulate every missing combination once (the requested grid may repeat combinations)
+        missing_gobble, missing_exit_rate = np.unique(
+            np.stack([combo_gobble[is_missing], combo_exit_rate[is_missing]]), axis=1
+        )
+        new_results = sweep_combos(prices, bank, missing_gobble, missing_exit_rate, max_schedule_cells)
+        new_results.update(gobble_amount=missing_gobble, exit_rate=missing_exit_rate)
+
+        num_cached = len(table['gobble_amount'])
+        table = {column: np.concatenate([table[column], new_results[column]]) for column in SWEEP_TABLE_DTYPES}
+        cache.put(cache_key, table)
+
+        row_by_combo = {combo: num_cached + row for row, combo in enumerate(zip(missing_gobble.tolist(),
+                                                                                missing_exit_rate.tolist()))}
+        rows[is_missing] = [row_by_combo[combo] for combo in zip(combo_gobble[is_missing].tolist(),
+                                                                 combo_exit_rate[is_missing].tolist())]
+
+    return {column: table[column][rows] for column in ('bank', 'stock', 'value', 'gain', 'trades')}
+
+
+def _sweep_chunk(prices, bank, gobble_amount, exit_ticks, paths=None):
+    """Step the bank through time for a chunk of combinations
+
+    Args:
+        prices (np.ndarray): price at each tick
+        bank (int): starting bank
+        gobble_amount (np.ndarray): gobble amount of each combination
+        exit_ticks (np.ndarray): (combinations x ticks) exit tick of each entry
+        paths (dict): optional (combinations x ticks) arrays to record 'gobble', 'profit', 'bank' and 'stock' into
+
+    Returns:
+        tuple: final bank, final number of stocks held and number of exited lots for each combination
+
+    """
+    num_combos, num_ticks = exit_ticks.shape
+    rows = np.arange(num_combos)
+
+    # Shares due to exit at each tick (last column collects positions which never exit)
+    exit_schedule = np.zeros((num_combos, num_ticks + 1))
+
+    bank_value = np.full(num_combos, bank, dtype=np.float64)
+    num_stocks_open = np.zeros(num_combos)
+    trades = np.zeros(num_combos, dtype=np.int64)
+
+    # Cost of the shares due to exit at each tick, only needed to record profit
+    if paths is not None:
+        exit_cost_schedule = np.zeros((num_combos, num_ticks + 1))
+
+    for i, price in enumerate(prices):
+        # Limited to money in the bank
+        buy_in = np.where(bank_value < gobble_amount, bank_value, gobble_amount)
+        gobble = np.round(buy_in / price)
+
+        exit_tick = exit_ticks[:, i]
+        exit_schedule[rows, exit_tick] += gobble
+        trades += (gobble != 0) & (exit_tick < num_ticks)
+
+        closed_stocks = exit_schedule[:, i]
+        bank_value = bank_value - gobble * price + closed_stocks * price
+        num_stocks_open += gobble - closed_stocks
+
+        if paths is not None:
+            exit_cost_schedule[rows, exit_tick] += gobble * price
+            paths['gobble'][:, i] = gobble
+            paths['profit'][:, i] = closed_stocks * price - exit_cost_schedule[:, i]
+            paths['bank'][:, i] = bank_value
+            paths['stock'][:, i] = num_stocks_open
+
+    return bank_value, num_stocks_open, trades
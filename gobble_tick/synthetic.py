@@ -0,0 +1,67 @@
+"""
+Seeded synthetic price series for benchmarking and stress testing the gobble tick algorithm
+"""
+import numpy as np
+
+
+def gbm_prices(num_ticks, seed=0, start_price=100.0, drift=0.05, volatility=0.3, ticks_per_year=252):
+    """Geometric Brownian motion price path
+
+    Args:
+        num_ticks (int): number of prices
+        seed (int): random seed, same seed = same path
+        start_price (float): price at the first tick
+        drift (float): annual drift
+        volatility (float): annual volatility
+        ticks_per_year (float): e.g. 252 for daily ticks
+
+    Returns:
+        np.ndarray: prices
+
+    """
+    rng = np.random.default_rng(seed)
+    dt = 1 / ticks_per_year
+    log_returns = rng.normal((drift - volatility ** 2 / 2) * dt, volatility * np.sqrt(dt), num_ticks - 1)
+    return start_price * np.exp(np.concatenate([[0.0], np.cumsum(log_returns)]))
+
+
+def declining_prices(num_ticks, start_price=100.0, decline_rate=1e-6):
+    """Strictly declining price path: no position ever reaches its target, so every lot stays open (worst case)
+
+    Args:
+        num_ticks (int): number of prices
+        start_price (float): price at the first tick
+        decline_rate (float): relative drop per tick
+
+    Returns:
+        np.ndarray: prices
+
+    """
+    return start_price * (1 - decline_rate) ** np.arange(num_ticks)
+
+
+def synthetic_candles(prices, seed=0, start_time=1_600_000_000, resolution_seconds=60):
+    """Wrap a price path into Finnhub-style candles (opens = prices)
+
+    Args:
+        prices (np.ndarray): open price of every candle
+        seed (int): random seed for the intra-candle range and volume
+        start_time (int): UNIX timestamp of the first candle
+        resolution_seconds (int): seconds between candles
+
+    Returns:
+        dict: column -> np.ndarray for t, o, h, l, c, v
+
+    """
+    rng = np.random.default_rng(seed)
+    prices = np.asarray(prices, dtype=np.float64)
+    close = np.concatenate([prices[1:], prices[-1:]])
+    spread = np.abs(rng.normal(0, 0.001, len(prices))) * prices
+    return {
+        't': start_time + resolution_seconds * np.arange(len(prices), dtype=np.int64),
+        'o': prices,
+        'h': np.maximum(prices, close) + spread,
+        'l': np.minimum(prices, close) - spread,
+        'c': close,
+        'v': rng.integers(100, 10_000, len(prices)).astype(np.float64),
+    }
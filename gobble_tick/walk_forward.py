@@ -0,0 +1,185 @@
+"""
+Walk-forward backtests: the gobble tick algorithm started from many offsets of one price series
+
+Each start runs with a fresh bank, either up to the end of the series (expanding window) or over a fixed number of
+ticks (rolling window). The exit tick of every position only depends on its entry tick, so it is resolved once for
+the whole series and shared by every start.
+
+While the bank can cover the full gobble amount, a run's trades don't depend on its start, so the results of every
+such start come from prefix sums: each position adds its cost, shares and exit cash to the contiguous range of starts
+whose window it opens in (and, for the exit cash, closes in), via difference arrays, so all of them cost O(n) in total.
+Starts whose bank may run dry are stepped through time together as NumPy arrays, like gobble_tick.sweep.
+"""
+import numpy as np
+import pandas as pd
+
+from gobble_tick.sweep import first_passage, MAX_SCHEDULE_CELLS
+
+
+def walk_forward(prices, bank, gobble_amount, exit_rate, window=None, step=1, starts=None,
+                 max_schedule_cells=MAX_SCHEDULE_CELLS):
+    """Run the algorithm from every step-th start offset (or the given starts) of a price series
+
+    Results match GobbleTick.run over prices[start:end] up to float rounding of the order in which exits are summed.
+
+    Args:
+        prices (array-like): price at each tick
+        bank (int): amount of money in bank (in dollars) at the start of every run
+        gobble_amount (int): amount of money to use to purchase stock each tick
+        exit_rate (float): rate above buying price to target to sell
+        window (int): optional number of ticks per run (rolling window), runs go to the end of the series if None
+        step (int): distance between start offsets (ignored if starts is given)
+        starts (array-like): optional explicit start offsets
+        max_schedule_cells (int): memory cap of the starts stepped through time, processed in chunks to stay under it
+
+    Returns:
+        DataFrame: one row per start with start, end (exclusive), final bank, stock, value, gain, trades and the
+          stock's own gain over the same ticks
+
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    num_ticks = len(prices)
+
+    if starts is None:
+        last_start = num_ticks if window is None else num_ticks - window + 1
+        starts = np.arange(0, max(0, last_start), step)
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.full(len(starts), num_ticks) if window is None else np.minimum(starts + window, num_ticks)
+
+    # Shared by every start: exit tick of each entry, and what each entry buys while the bank isn't limiting
+    exit_ticks = first_passage(prices, prices * (1 + exit_rate))
+    full_gobble = np.round(gobble_amount / prices)
+    full_cost = full_gobble * prices
+    cum_cost = np.concatenate([[0.0], np.cumsum(full_cost)])
+
+    # Bank stays >= gobble amount if it covers every purchase before the last tick, even without any exit
+    spent_before_last = cum_cost[np.maximum(ends - 1, starts)] - cum_cost[starts]
+    is_unlimited = bank - spent_before_last >= gobble_amount
+
+    final_bank = np.empty(len(starts))
+    final_stock = np.empty(len(starts))
+    trades = np.empty(len(starts), dtype=np.int64)
+
+    unlimited = np.flatnonzero(is_unlimited)
+    final_bank[unlimited], final_stock[unlimited], trades[unlimited] = _walk_unlimited(
+        prices, bank, window, full_gobble, cum_cost, exit_ticks, starts[unlimited], ends[unlimited]
+    )
+
+    # Starts whose bank may run dry are stepped together, in chunks of consecutive starts under the memory cap
+    limited = np.flatnonzero(~is_unlimited)
+    limited = limited[np.argsort(starts[limited], kind='stable')]
+    schedule_width = num_ticks + 1 if window is None else window + 1
+    chunk_size = max(1, max_schedule_cells // schedule_width)
+    for chunk_start in range(0, len(limited), chunk_size):
+        rows = limited[chunk_start:chunk_start + chunk_size]
+        final_bank[rows], final_stock[rows], trades[rows] = _walk_stepped(
+            prices, bank, gobble_amount, exit_ticks, starts[rows], ends[rows], schedule_width
+        )
+
+    last_prices = prices[np.maximum(ends - 1, 0)] if num_ticks else np.zeros(len(starts))
+    value = final_bank + final_stock * last_prices
+
+    return pd.DataFrame({
+        'start': starts,
+        'end': ends,
+        'bank': final_bank,
+        'stock': final_stock.astype(np.int64),
+        'value': value,
+        'gain': value / bank,
+        'trades': trades,
+        'stock_gain': last_prices / prices[starts] if num_ticks else last_prices,
+    })
+
+
+def _walk_unlimited(prices, bank, window, full_gobble, cum_cost, exit_ticks, starts, ends):
+    """Final bank, stock and trades of starts whose bank never limits a purchase, from prefix sums
+
+    A position opened at tick i is part of every run with start <= i < end, and closes within the run of every start
+    in (exit_tick - window, i] (every start <= i for expanding windows).
+    """
+    num_ticks = len(prices)
+    entry_ticks = np.arange(num_ticks)
+
+    cum_gobble = np.concatenate([[0.0], np.cumsum(full_gobble)])
+    spent = cum_cost[ends] - cum_cost[starts]
+    bought = cum_gobble[ends] - cum_gobble[starts]
+
+    # Positions which close within the series, and the first start whose window still includes their exit
+    is_closed = exit_ticks < num_ticks
+    if window is not None:
+        # Positions held for window ticks or more never close within any run
+        is_closed &= exit_ticks - entry_ticks < window
+    closed_entry = entry_ticks[is_closed]
+    closed_exit = exit_ticks[is_closed]
+    if window is None:
+        first_start = np.zeros(len(closed_entry), dtype=np.int64)
+    else:
+        first_start = np.maximum(closed_exit - window + 1, 0)
+
+    closed_gobble = full_gobble[is_closed]
+    closed_cash = closed_gobble * prices[closed_exit]
+
+    def per_start(values):
+        """Sum of values over the positions closing in each start's run (difference array over start offsets)"""
+        diff = np.zeros(num_ticks + 1)
+        np.add.at(diff, first_start, values)
+        np.add.at(diff, closed_entry + 1, -values)
+        return np.cumsum(diff)[starts]
+
+    returns = per_start(closed_cash)
+    sold = per_start(closed_gobble)
+    num_trades = per_start((closed_gobble != 0).astype(np.float64))
+
+    return bank - spent + returns, bought - sold, np.round(num_trades).astype(np.int64)
+
+
+def _walk_stepped(prices, bank, gobble_amount, exit_ticks, starts, ends, schedule_width):
+    """Final bank, stock and trades of a chunk of starts (sorted), stepped through time together
+
+    Same steps as gobble_tick.sweep._sweep_chunk, each row only active on its own [start, end) ticks (ends are sorted
+    too, since every run has the same window or goes to the end of the series). Positions exit
+    less than schedule_width ticks after entry within their run, so the exit schedule is a ring buffer of that width.
+    """
+    num_runs = len(starts)
+
+    # Shares due to exit at each tick, at column tick % schedule_width (cleared once the tick has passed)
+    exit_schedule = np.zeros((num_runs, schedule_width))
+
+    bank_value = np.full(num_runs, bank, dtype=np.float64)
+    num_stocks_open = np.zeros(num_runs)
+    trades = np.zeros(num_runs, dtype=np.int64)
+
+    # Starts and ends are both sorted, so the runs active at each tick are a contiguous range of rows
+    first_active = np.searchsorted(ends, np.arange(int(starts.min()), int(ends.max())), side='right')
+    last_active = np.searchsorted(starts, np.arange(int(starts.min()), int(ends.max())), side='right')
+
+    for i, a, b in zip(range(int(starts.min()), int(ends.max())), first_active.tolist(), last_active.tolist()):
+        price = prices[i]
+        active_bank = bank_value[a:b]
+
+        # Limited to money in the bank
+        buy_in = np.where(active_bank < gobble_amount, active_bank, gobble_amount)
+        gobble = np.round(buy_in / price)
+
+        # Exits after the end of a run are never reached
+        is_exiting = exit_ticks[i] < ends[a:b]
+        exit_schedule[a:b, exit_ticks[i] % schedule_width] += np.where(is_exiting, gobble, 0)
+        trades[a:b] += (gobble != 0) & is_exiting
+
+        column = i % schedule_width
+        closed_stocks = exit_schedule[a:b, column].copy()
+        exit_schedule[a:b, column] = 0
+        bank_value[a:b] = active_bank - gobble * price + closed_stocks * price
+        num_stocks_open[a:b] += gobble - closed_stocks
+
+    return bank_value, num_stocks_open, trades
+
+
+if __name__ == '__main__':
+    from finnhub.api import FinnhubRequest
+
+    # Example: every start date over the last 52 weeks of SLAB, to the end and over rolling 26 week windows
+    example_df = FinnhubRequest(symbol="SLAB", resolution="W", count=52).get_candle_data()
+    for example_window in [None, 26]:
+        walk_df = walk_forward(example_df['o'], bank=50000, gobble_amount=1000, exit_rate=0.03, window=example_window)
+        print(walk_df['gain'].describe())
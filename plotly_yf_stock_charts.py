@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.colors
@@ -6,6 +7,8 @@ from plotly.subplots import make_subplots
 import yfinance as yf
 import datetime
 
+from corporate_actions import get_holdings, get_date_index
+
 # key = event
 # value = (MM, DD, YYYY)
 COMPLETION_DATE_LABEL = "Completion (SLAB -> SWKS)"
@@ -129,41 +132,34 @@ def plot_color_months(ticker, start, end=None):
 
 
 def get_swks_slab_transfer_bank_df(start_shares, to_csv=False):
+    """Bank of `start_shares` of SLAB converted to SWKS (at the same value) on the completion date
 
+    Shares are tracked with the corporate actions engine (see corporate_actions.get_holdings), which finds the
+    conversion date by binary search on the date index (the next trading day if it isn't one).
+    """
     tdf = get_swks_slab_tdf(to_csv=to_csv)
 
-    bank_shares = start_shares
-    bank_ticker = 'SLAB'
-    data = []
-    for row in tdf.to_dict(orient='records'):
-
-        if COMPLETION_DATE_STR in str(row['Date']):
-            print(f"ACQUISITION COMPLETION DATE: {row['Date']}")
-            new_bank_ticker = 'SWKS'
-
-            price = row[f'Close_{bank_ticker}']
-            new_price = row[f'Close_{new_bank_ticker}']
-            new_bank_shares = round(bank_shares * price / new_price)
+    prices = pd.DataFrame({'SLAB': tdf['Close_SLAB'], 'SWKS': tdf['Close_SWKS']}, index=tdf.index)
+    actions = [{'date': COMPLETION_DATE_STR, 'symbol': 'SLAB', 'kind': 'convert', 'target': 'SWKS'}]
+    holdings = get_holdings(prices, start_shares={'SLAB': start_shares}, actions=actions, round_shares=True)
 
-            print(
-                f'CONVERTING {bank_shares} * {bank_ticker} @ {price:.2f} -> '
-                f'{new_bank_shares} * {new_bank_ticker} @ {new_price:.2f}'
-            )
-
-            bank_shares = new_bank_shares
-            bank_ticker = new_bank_ticker
-
-        row['Bank Ticker'] = bank_ticker
-        row['Bank Shares'] = bank_shares
-        row['$'] = bank_shares * row[f'Close_{bank_ticker}']
-        data.append(row)
+    for action in holdings['actions'].to_dict(orient='records'):
+        print(f"ACQUISITION COMPLETION DATE: {action['date_applied']}")
+        row = action['date_index']
+        print(
+            f"CONVERTING {action['shares']} * {action['symbol']} @ {prices[action['symbol']].iloc[row]:.2f} -> "
+            f"{action['new_shares']} * {action['target']} @ {prices[action['target']].iloc[row]:.2f}"
+        )
 
-    df = pd.DataFrame(data)
+    df = tdf.reset_index(drop=True)
+    shares = holdings['shares'].to_numpy()
+    bank_column = (shares != 0).argmax(axis=1)
+    df['Bank Ticker'] = np.array(prices.columns)[bank_column]
+    df['Bank Shares'] = shares[np.arange(len(df)), bank_column].astype(np.int64)
+    df['$'] = holdings['summary']['value'].to_numpy()
 
     # Point out transfer of shares
-    transition_df = df[df['Date'].astype('str').str.contains(COMPLETION_DATE_STR)]
-    transition_index = transition_df.index[0]
-    # print(transition_df)
+    transition_index = get_date_index(prices.index, COMPLETION_DATE_STR)
 
     df['%'] = 100 * df['$'] / df['$'].iloc[transition_index]
 
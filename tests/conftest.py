@@ -0,0 +1,94 @@
+"""
+Local stand-in for Finnhub's candle API, so the store and fetcher are tested without the network
+"""
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+import pytest
+
+from finnhub.api import FinnhubRequest
+
+DAY = 24 * 60 * 60
+
+
+class StubCandleServer:
+    """Serves candles of a single dataset in Finnhub's JSON format, after any queued failures
+
+    Every request is logged as (time.monotonic() when received, query dict).
+    """
+
+    def __init__(self):
+        self.candles = {column: np.empty(0) for column in 'tohlcv'}
+        self.failures = []  # (status, headers) to answer the next requests with, in order
+        self.delays = []  # seconds to wait before answering the next requests, in order
+        self.requests = []
+        self.lock = threading.Lock()
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                query = {name: values[0] for name, values in parse_qs(urlsplit(self.path).query).items()}
+                status, headers, body = stub.respond(query)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                payload = json.dumps(body).encode()
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/api/v1/stock/candle"
+
+    def set_candles(self, t, close):
+        """Candles at times t with o = h = l = c = close (v = 100)"""
+        close = np.asarray(close, dtype=np.float64)
+        self.candles = {'t': np.asarray(t, dtype=np.int64), 'o': close, 'h': close, 'l': close, 'c': close,
+                        'v': np.full(len(close), 100.0)}
+
+    def respond(self, query):
+        with self.lock:
+            self.requests.append((time.monotonic(), query))
+            delay = self.delays.pop(0) if self.delays else 0
+        if delay:
+            time.sleep(delay)
+
+        with self.lock:
+            if self.failures:
+                status, headers = self.failures.pop(0)
+                return status, headers, {'error': 'stub failure'}
+
+        t = self.candles['t']
+        if 'count' in query:
+            selected = np.arange(len(t))[-int(query['count']):]
+        else:
+            selected = np.flatnonzero((t >= int(query['from'])) & (t <= int(query['to'])))
+        if not len(selected):
+            return 200, {}, {'s': 'no_data'}
+        return 200, {}, {'s': 'ok', **{column: values[selected].tolist() for column, values in self.candles.items()}}
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def candle_server(monkeypatch, tmp_path):
+    """StubCandleServer with FinnhubRequest pointed at it, and its CSV/plot dirs in a temporary dir"""
+    server = StubCandleServer()
+    monkeypatch.setattr(FinnhubRequest, 'CANDLE_API', server.url)
+    monkeypatch.setattr(FinnhubRequest, 'CANDLE_DATA_OUTPUT_DIR', str(tmp_path / 'candle_data'))
+    monkeypatch.setattr(FinnhubRequest, 'CANDLE_PLOT_OUTPUT_DIR', str(tmp_path / 'candle_plot'))
+    yield server
+    server.close()
@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from corporate_actions import get_holdings
+
+DATES = pd.date_range('2021-01-01', periods=10, freq='B')
+
+
+@pytest.fixture
+def prices():
+    """Same prices as the corporate_actions example: C only trades from the 4th date (2021-01-06) on"""
+    return pd.DataFrame({
+        'A': np.linspace(100, 60, 10),
+        'B': np.linspace(90, 110, 10),
+        'C': [np.nan] * 3 + list(np.linspace(20, 25, 7)),
+    }, index=DATES)
+
+
+def test_example(prices):
+    actions = [
+        {'date': '2021-01-04', 'symbol': 'A', 'kind': 'split', 'ratio': 2},
+        {'date': '2021-01-06', 'symbol': 'A', 'kind': 'spinoff', 'target': 'C', 'ratio': 0.25},
+        # A Saturday, applied on the next trading date
+        {'date': '2021-01-09', 'symbol': 'A', 'kind': 'merger', 'target': 'B', 'ratio': 0.5, 'cash': 3.0},
+    ]
+    holdings = get_holdings(prices, {'A': 1000}, actions)
+
+    shares = holdings['shares']
+    np.testing.assert_array_equal(shares['A'], [1000] + [2000] * 5 + [0] * 4)
+    np.testing.assert_array_equal(shares['B'], [0] * 6 + [1000] * 4)
+    np.testing.assert_array_equal(shares['C'], [0] * 3 + [500] * 7)
+    np.testing.assert_array_equal(holdings['summary']['cash'], [0] * 6 + [6000] * 4)
+    assert holdings['summary']['value'].iloc[-1] == 1000 * 110 + 500 * 25 + 6000
+    assert holdings['actions']['date_applied'].tolist() == [DATES[1], DATES[3], DATES[6]]
+
+
+def test_reverse_split(prices):
+    holdings = get_holdings(prices, {'A': 1000}, [{'date': '2021-01-05', 'symbol': 'A', 'kind': 'split',
+                                                   'ratio': 0.1}])
+    np.testing.assert_array_equal(holdings['shares']['A'], [1000] * 2 + [100] * 8)
+
+
+def test_spinoff_before_target_trades(prices):
+    holdings = get_holdings(prices, {'A': 1000}, [{'date': '2021-01-04', 'symbol': 'A', 'kind': 'spinoff',
+                                                   'target': 'C', 'ratio': 0.25}])
+    # Held from the spinoff, but only worth something once it trades
+    np.testing.assert_array_equal(holdings['shares']['C'], [0] + [250] * 9)
+    np.testing.assert_array_equal(holdings['value']['C'], [0] * 3 + list(250 * prices['C'].iloc[3:]))
+    np.testing.assert_array_equal(holdings['shares']['A'], [1000] * 10)
+
+
+def test_convert(prices):
+    holdings = get_holdings(prices, {'A': 1000}, [{'date': '2021-01-06', 'symbol': 'A', 'kind': 'convert',
+                                                   'target': 'C'}], round_shares=True)
+    assert holdings['shares']['C'].iloc[-1] == round(1000 * prices['A'].iloc[3] / prices['C'].iloc[3])
+    assert holdings['shares']['A'].iloc[-1] == 0
+
+
+def test_convert_without_close_price(prices):
+    with pytest.raises(ValueError, match='C.*2021-01-05'):
+        get_holdings(prices, {'A': 1000}, [{'date': '2021-01-05', 'symbol': 'A', 'kind': 'convert',
+                                            'target': 'C'}])
+
+
+def test_actions_before_first_date_are_skipped(prices):
+    holdings = get_holdings(prices, {'A': 1000}, [{'date': '2020-12-01', 'symbol': 'A', 'kind': 'split',
+                                                   'ratio': 2}])
+    np.testing.assert_array_equal(holdings['shares']['A'], [1000] * 10)
+    assert holdings['actions'].empty
+
+
+@pytest.mark.parametrize('start_shares, action', [
+    ({'A': 1000}, {'date': '2021-01-05', 'symbol': 'A', 'kind': 'merger', 'target': 'D'}),
+    ({'A': 1000}, {'date': '2021-01-05', 'symbol': 'D', 'kind': 'split', 'ratio': 2}),
+    ({'D': 1000}, {'date': '2021-01-05', 'symbol': 'A', 'kind': 'split', 'ratio': 2}),
+])
+def test_unknown_symbol(prices, start_shares, action):
+    with pytest.raises(ValueError, match="'D'"):
+        get_holdings(prices, start_shares, [action])
+
+
+def get_baseline_bank_df(tdf, start_shares, completion_date_str):
+    """Share transfer of plotly_yf_stock_charts before it used get_holdings"""
+    bank_shares = start_shares
+    bank_ticker = 'SLAB'
+    data = []
+    for row in tdf.to_dict(orient='records'):
+        if completion_date_str in str(row['Date']):
+            new_bank_ticker = 'SWKS'
+            bank_shares = round(bank_shares * row[f'Close_{bank_ticker}'] / row[f'Close_{new_bank_ticker}'])
+            bank_ticker = new_bank_ticker
+
+        row['Bank Ticker'] = bank_ticker
+        row['Bank Shares'] = bank_shares
+        row['$'] = bank_shares * row[f'Close_{bank_ticker}']
+        data.append(row)
+
+    df = pd.DataFrame(data)
+    transition_index = df.index[df['Date'].astype('str').str.contains(completion_date_str)][0]
+    df['%'] = 100 * df['$'] / df['$'].iloc[transition_index]
+    return df
+
+
+def test_swks_slab_transfer_matches_baseline(monkeypatch):
+    pytest.importorskip('plotly')
+    pytest.importorskip('yfinance')
+    import plotly_yf_stock_charts
+
+    dates = pd.date_range('2021-07-12', periods=20, freq='B', tz='America/New_York', name='Date')
+    rng = np.random.default_rng(0)
+    tdf = pd.DataFrame({
+        'Close_SWKS': 180 * np.exp(np.cumsum(rng.normal(0, 0.02, len(dates)))),
+        'Close_SLAB': 150 * np.exp(np.cumsum(rng.normal(0, 0.02, len(dates)))),
+    }, index=dates)
+    tdf['Date'] = tdf.index
+    monkeypatch.setattr(plotly_yf_stock_charts, 'get_swks_slab_tdf', lambda to_csv=False: tdf.copy())
+
+    df = plotly_yf_stock_charts.get_swks_slab_transfer_bank_df(start_shares=1000)
+    expected_df = get_baseline_bank_df(tdf, 1000, plotly_yf_stock_charts.COMPLETION_DATE_STR)
+    assert df['Bank Ticker'].tolist() == expected_df['Bank Ticker'].tolist()
+    assert df['Bank Shares'].tolist() == expected_df['Bank Shares'].tolist()
+    np.testing.assert_allclose(df['$'], expected_df['$'], rtol=1e-12)
+    np.testing.assert_allclose(df['%'], expected_df['%'], rtol=1e-12)
@@ -0,0 +1,84 @@
+import time
+from email.utils import formatdate
+
+import numpy as np
+import pytest
+import requests
+
+from finnhub.api import FinnhubRequest
+from finnhub.fetch import CandleFetcher, TokenBucket, get_retry_after
+from finnhub.store import CandleStore
+
+DAY = 24 * 60 * 60
+
+# 2020-01-01 00:00 UTC
+START = 1_577_836_800
+
+
+@pytest.fixture
+def fetcher(candle_server, tmp_path):
+    candle_server.set_candles(START + np.arange(10) * DAY, np.arange(10) + 100.0)
+    return CandleFetcher(store=CandleStore(store_dir=str(tmp_path / 'candle_store')), max_workers=4, backoff=0.01,
+                         max_retries=3, timeout=5)
+
+
+def get_requests(symbols):
+    return [FinnhubRequest(symbol, 'D', from_time=START, to_time=START + 9 * DAY) for symbol in symbols]
+
+
+def test_fetch_streams_every_symbol_into_the_store(candle_server, fetcher):
+    symbols = ['A', 'B', 'C', 'D', 'E']
+    assert fetcher.fetch_all(get_requests(symbols)) == len(symbols)
+    for symbol in symbols:
+        assert fetcher.store.load_df(symbol, 'D')['c'].tolist() == list(np.arange(10) + 100.0)
+
+    # Everything is covered now, so nothing is requested again
+    assert fetcher.fetch_all(get_requests(symbols)) == 0
+    assert len(candle_server.requests) == len(symbols)
+
+
+def test_rate_limit(candle_server, fetcher):
+    rate, capacity = 20, 2
+    fetcher.rate_limiter = TokenBucket(rate=rate, capacity=capacity)
+
+    num_requests = 8
+    fetcher.fetch_all(get_requests([f"S{i}" for i in range(num_requests)]))
+
+    # After the initial burst, requests can't arrive faster than the refill rate
+    times = sorted(received_at for received_at, _ in candle_server.requests)
+    assert len(times) == num_requests
+    assert times[-1] - times[0] >= (num_requests - capacity) / rate * 0.9
+
+
+def test_retries_on_429_and_5xx(candle_server, fetcher):
+    candle_server.failures = [
+        (429, {'Retry-After': '0'}),
+        (503, {}),
+        (429, {'Retry-After': formatdate(time.time() - 1, usegmt=True)}),
+    ]
+    json_data, _ = fetcher.request_json(get_requests(['A'])[0])
+    assert json_data['s'] == 'ok'
+    assert len(candle_server.requests) == 4
+
+
+def test_gives_up_after_max_retries(candle_server, fetcher):
+    candle_server.failures = [(500, {})] * (fetcher.max_retries + 1)
+    with pytest.raises(requests.HTTPError):
+        fetcher.request_json(get_requests(['A'])[0])
+    assert len(candle_server.requests) == fetcher.max_retries + 1
+
+
+def test_retries_on_timeout(candle_server, fetcher):
+    fetcher.timeout = 0.2
+    candle_server.delays = [1.0]
+    json_data, _ = fetcher.request_json(get_requests(['A'])[0])
+    assert json_data['s'] == 'ok'
+    assert len(candle_server.requests) == 2
+
+
+def test_get_retry_after():
+    assert get_retry_after(None) is None
+    assert get_retry_after('3') == 3.0
+    assert get_retry_after('not a date') is None
+    assert get_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+    assert 5 < get_retry_after(formatdate(time.time() + 10, usegmt=True)) <= 10
@@ -0,0 +1,88 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from gobble_tick.algorithm import GobbleTick
+from gobble_tick.indicators import (
+    RollingMax, RollingMin, EMA, ATR, RollingVolatility, SupportGobble, AtrExitRate,
+    rolling_max, rolling_min, ema, atr, rolling_volatility,
+)
+
+CANDLE_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'finnhub', 'candle_data')
+
+
+@pytest.fixture(scope='module')
+def candles():
+    return pd.read_csv(os.path.join(CANDLE_DATA_DIR, 'SLAB_52W.csv'), index_col=0)
+
+
+def stream(indicator, *columns):
+    """Values of a streaming indicator updated with every row of columns"""
+    return np.array([indicator.update(*row) for row in zip(*(column.tolist() for column in columns))])
+
+
+# Batch and streaming indicators must be identical, not just close (see the indicators module doc)
+
+@pytest.mark.parametrize('window', [1, 5, 20, 1000])
+def test_rolling_max(candles, window):
+    assert np.array_equal(stream(RollingMax(window), candles['h']), rolling_max(candles['h'], window))
+
+
+@pytest.mark.parametrize('window', [1, 5, 20, 1000])
+def test_rolling_min(candles, window):
+    assert np.array_equal(stream(RollingMin(window), candles['l']), rolling_min(candles['l'], window))
+
+
+def test_ema(candles):
+    assert np.array_equal(stream(EMA(span=10), candles['c']), ema(candles['c'], span=10))
+
+
+def test_atr(candles):
+    assert np.array_equal(stream(ATR(14), candles['h'], candles['l'], candles['c']),
+                          atr(candles['h'], candles['l'], candles['c'], period=14))
+
+
+@pytest.mark.parametrize('window', [2, 10])
+def test_rolling_volatility(candles, window):
+    assert np.array_equal(stream(RollingVolatility(window, ticks_per_year=52), candles['c']),
+                          rolling_volatility(candles['c'], window, ticks_per_year=52), equal_nan=True)
+
+
+def test_volatility_window_below_2_returns():
+    with pytest.raises(ValueError):
+        RollingVolatility(1)
+    with pytest.raises(ValueError):
+        rolling_volatility([1.0, 2.0, 3.0], 1)
+
+
+def test_support_gobble_in_run(candles):
+    # Bank big enough to never limit purchases, so every gobble is the rule's amount
+    gobble_tick = GobbleTick(bank=10 ** 9, gobble_amount=1000, exit_rate=0.03,
+                             gobble_fn=SupportGobble(base_amount=1000, window=20, scale=0.5))
+    df = gobble_tick.run_from_finnhub_df(candles, to_file=False)
+
+    prices = candles['o'].to_numpy()
+    support, resistance = rolling_min(prices, 20), rolling_max(prices, 20)
+    spread = resistance - support
+    position = np.divide(prices - support, spread, out=np.full(len(prices), 0.5), where=spread > 0)
+    amounts = 1000 * (1 + 0.5 * (1 - 2 * position))
+    np.testing.assert_array_equal(df['gobble'], np.round(amounts / prices))
+    assert df['gobble'].nunique() > 1
+
+    # The rule's state is reset on every run
+    pd.testing.assert_frame_equal(gobble_tick.run_from_finnhub_df(candles, to_file=False), df)
+
+
+def test_atr_exit_rate_in_run(candles):
+    gobble_tick = GobbleTick(bank=50000, gobble_amount=1000, exit_rate=0.03,
+                             exit_rate_fn=AtrExitRate(multiple=2, period=14, min_rate=0.005, max_rate=0.1))
+    df = gobble_tick.run_from_finnhub_df(candles, to_file=False)
+
+    prices = candles['o'].to_numpy()
+    exit_rates = np.clip(2 * atr(candles['h'], candles['l'], candles['c'], period=14) / prices, 0.005, 0.1)
+    np.testing.assert_allclose(df['target'], prices * (1 + exit_rates), rtol=1e-12)
+    assert len(np.unique(exit_rates)) > 1
+
+    pd.testing.assert_frame_equal(gobble_tick.run_from_finnhub_df(candles, to_file=False), df)
@@ -0,0 +1,110 @@
+import os
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from finnhub.stream import get_candle_trades
+from finnhub.websocket import connect, serve, ConnectionClosed, OP_PING, OP_PONG
+from gobble_tick.algorithm import GobbleTick
+from gobble_tick.live import run_replay
+
+CANDLE_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'finnhub', 'candle_data')
+
+
+async def with_server(handler, client):
+    """Run client(websocket) against a local server calling handler(websocket, path) for the connection"""
+    server = await serve(handler)
+    host, port = server.sockets[0].getsockname()[:2]
+    try:
+        async with await connect(f"ws://{host}:{port}/path") as websocket:
+            return await client(websocket)
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+async def echo(websocket, path):
+    async for message in websocket:
+        await websocket.send(message)
+
+
+# Lengths around the 7 bit, 16 bit and 64 bit length headers
+@pytest.mark.parametrize('length', [0, 125, 126, 2 ** 16 - 1, 2 ** 16])
+def test_round_trip(length):
+    text = ''.join(chr(ord('a') + i % 26) for i in range(length))
+    binary = bytes(i % 256 for i in range(length))
+
+    async def client(websocket):
+        await websocket.send(text)
+        assert await websocket.recv() == text
+        await websocket.send(binary)
+        assert await websocket.recv() == binary
+
+    asyncio.run(with_server(echo, client))
+
+
+def test_ping_is_answered_with_pong():
+    pongs = []
+
+    async def handler(websocket, path):
+        await websocket.send_frame(OP_PING, b'are you there')
+        pongs.append(await websocket.recv_frame())
+        await websocket.send('done')
+
+    async def client(websocket):
+        # The ping is answered inside recv, which only returns the next message
+        return await websocket.recv()
+
+    assert asyncio.run(with_server(handler, client)) == 'done'
+    assert pongs == [(OP_PONG, True, b'are you there')]
+
+
+def test_close_from_server_ends_the_client():
+    async def handler(websocket, path):
+        await websocket.send('bye')
+        await websocket.close()
+
+    async def client(websocket):
+        messages = [message async for message in websocket]
+        assert websocket.closed
+        with pytest.raises(ConnectionClosed):
+            await websocket.send('too late')
+        return messages
+
+    assert asyncio.run(with_server(handler, client)) == ['bye']
+
+
+def test_close_from_client_ends_the_server():
+    received = []
+
+    async def handler(websocket, path):
+        received.append(path)
+        with pytest.raises(ConnectionClosed):
+            await websocket.recv()
+        received.append('closed')
+
+    async def client(websocket):
+        await websocket.close()
+        # Give the server's handler time to see the close frame
+        await asyncio.sleep(0.1)
+
+    asyncio.run(with_server(handler, client))
+    assert received == ['/path', 'closed']
+
+
+def test_replay_matches_offline_run():
+    candles = pd.read_csv(os.path.join(CANDLE_DATA_DIR, 'SLAB_100D.csv'), index_col=0)
+    gobble_tick = GobbleTick(bank=50000, gobble_amount=1000, exit_rate=0.03)
+
+    trader, stats = asyncio.run(run_replay(gobble_tick, {'SLAB': get_candle_trades(candles)}, resolution='D'))
+    run_df = gobble_tick.run_from_finnhub_df(candles, to_file=False)
+
+    report = trader.get_report()
+    assert report['bars'] == len(candles) == 70
+    assert stats['trades'] == report['trades'] == 4 * len(candles)
+    holdings = report['holdings']['SLAB']
+    assert np.isclose(holdings['bank'], run_df['bank'].iloc[-1])
+    assert holdings['stock'] == run_df['stock'].iloc[-1] == 174
+    assert round(holdings['bank'], 2) == 35959.81
@@ -0,0 +1,99 @@
+import time
+
+import numpy as np
+import pytest
+
+from finnhub.api import FinnhubRequest
+from finnhub.store import CandleStore
+
+DAY = 24 * 60 * 60
+
+# 2020-01-01 00:00 UTC, far enough in the past that every stub candle is final
+START = 1_577_836_800
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CandleStore(store_dir=str(tmp_path / 'candle_store'))
+
+
+def test_add_coverage_merges_touching_and_overlapping_ranges(store):
+    store.add_coverage('X', 'D', 100, 199)
+    store.add_coverage('X', 'D', 300, 399)
+    assert store.get_coverage('X', 'D') == [[100, 199], [300, 399]]
+
+    # Touching (200 follows 199) and overlapping ranges merge into one
+    store.add_coverage('X', 'D', 200, 250)
+    store.add_coverage('X', 'D', 240, 320)
+    assert store.get_coverage('X', 'D') == [[100, 399]]
+
+    # Contained ranges change nothing
+    assert store.add_coverage('X', 'D', 150, 160) == [[100, 399]]
+
+
+def test_get_missing_ranges(store):
+    assert store.get_missing_ranges('X', 'D', 0, 1000) == [[0, 1000]]
+
+    store.add_coverage('X', 'D', 100, 199)
+    store.add_coverage('X', 'D', 300, 399)
+    assert store.get_missing_ranges('X', 'D', 0, 1000) == [[0, 99], [200, 299], [400, 1000]]
+    assert store.get_missing_ranges('X', 'D', 150, 350) == [[200, 299]]
+    assert store.get_missing_ranges('X', 'D', 100, 199) == []
+    assert store.get_missing_ranges('X', 'D', 250, 260) == [[250, 260]]
+
+
+def test_covered_range_is_answered_without_request(candle_server, store):
+    candle_server.set_candles(START + np.arange(30) * DAY, np.arange(30) + 100.0)
+
+    request = FinnhubRequest('X', 'D', from_time=START, to_time=START + 19 * DAY)
+    df = request.get_candle_store_data(store=store)
+    assert len(candle_server.requests) == 1
+    np.testing.assert_array_equal(df['c'], np.arange(20) + 100.0)
+
+    # Same range again: no request
+    request.get_candle_store_data(store=store)
+    assert len(candle_server.requests) == 1
+
+    # Overlapping range: only the part after the covered one (which ends at the last requested second) is requested
+    overlapping = FinnhubRequest('X', 'D', from_time=START + 10 * DAY, to_time=START + 29 * DAY)
+    df = overlapping.get_candle_store_data(store=store)
+    assert len(candle_server.requests) == 2
+    _, query = candle_server.requests[-1]
+    assert (int(query['from']), int(query['to'])) == (START + 19 * DAY + 1, START + 29 * DAY)
+    np.testing.assert_array_equal(df['c'], np.arange(10, 30) + 100.0)
+
+
+def test_no_data_range_is_cached(candle_server, store):
+    candle_server.set_candles(START + np.arange(5) * DAY, np.arange(5) + 100.0)
+
+    # Range before the first candle returns no_data, which is recorded as covered
+    request = FinnhubRequest('X', 'D', from_time=START - 10 * DAY, to_time=START - DAY)
+    assert request.get_candle_store_data(store=store).empty
+    assert store.get_coverage('X', 'D') == [[START - 10 * DAY, START - DAY]]
+
+    request.get_candle_store_data(store=store)
+    assert len(candle_server.requests) == 1
+
+
+def test_no_data_response_is_cached_to_csv(candle_server):
+    request = FinnhubRequest('X', 'D', from_time=START, to_time=START + DAY)
+    assert request.get_candle_data().empty
+    assert request.get_candle_data().empty
+    assert len(candle_server.requests) == 1
+
+
+def test_newest_candle_is_refreshed(candle_server, store):
+    # Last candle is today's, still in progress when first requested
+    now = int(time.time())
+    t = now - now % DAY - np.arange(4)[::-1] * DAY
+    candle_server.set_candles(t, [100.0, 101.0, 102.0, 103.0])
+
+    request = FinnhubRequest('X', 'D', count=4)
+    assert request.get_candle_store_data(store=store)['c'].tolist() == [100.0, 101.0, 102.0, 103.0]
+    assert store.get_coverage('X', 'D')[-1][1] < t[-1]
+
+    # Today's candle moved on since, the refresh requests it again and replaces it
+    candle_server.set_candles(t, [100.0, 101.0, 102.0, 105.0])
+    assert request.get_candle_store_data(store=store)['c'].tolist() == [100.0, 101.0, 102.0, 105.0]
+    _, query = candle_server.requests[-1]
+    assert int(query['from']) <= t[-1]
@@ -0,0 +1,59 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from gobble_tick.algorithm import GobbleTick
+from gobble_tick.sweep import first_passage, sweep
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CANDLE_DATA_DIR = os.path.join(REPO_DIR, 'finnhub', 'candle_data')
+DATA_DIR = os.path.join(REPO_DIR, 'gobble_tick', 'data')
+
+# Committed reference outputs of GobbleTick.run (see gobble_tick/run.py)
+REFERENCE_COLUMNS = ['enter', 'target', 'exit', 'profit', 'bank', 'stock', 'stock_val', 'value', 'gobble', 'gain']
+
+
+def load_candles(label):
+    return pd.read_csv(os.path.join(CANDLE_DATA_DIR, f"{label}.csv"), index_col=0)
+
+
+@pytest.mark.parametrize('label', ['SLAB_100D', 'SLAB_52W'])
+def test_run_matches_reference_output(label):
+    reference_df = pd.read_csv(os.path.join(DATA_DIR, label, '50000_1000_0.03.csv'), index_col=0)
+    df = GobbleTick(bank=50000, gobble_amount=1000, exit_rate=0.03).run_from_finnhub_df(load_candles(label),
+                                                                                         to_file=False)
+    pd.testing.assert_frame_equal(df[REFERENCE_COLUMNS], reference_df[REFERENCE_COLUMNS], check_dtype=False)
+
+
+@pytest.mark.parametrize('label', ['SLAB_100D', 'SLAB_52W'])
+def test_sweep_matches_run(label):
+    candles = load_candles(label)
+    sweep_df = sweep(candles['o'], bank=50000, gobble_amounts=[500, 1000, 2500], exit_rates=[0.01, 0.03, 0.1])
+
+    for row in sweep_df.itertuples():
+        run_df = GobbleTick(bank=50000, gobble_amount=row.gobble_amount, exit_rate=row.exit_rate).run_from_finnhub_df(
+            candles, to_file=False)
+        last = run_df.iloc[-1]
+        assert row.stock == last['stock']
+        assert np.isclose(row.bank, last['bank'])
+        assert np.isclose(row.value, last['value'])
+        assert np.isclose(row.gain, last['gain'])
+        assert row.trades == (run_df['exit'].notna() & (run_df['gobble'] != 0)).sum()
+
+
+def test_first_passage_matches_brute_force():
+    rng = np.random.default_rng(0)
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (3, 200)), axis=1))
+    targets = prices * rng.uniform(1.0, 1.1, prices.shape)
+
+    expected = np.full(prices.shape, prices.shape[1])
+    for symbol in range(prices.shape[0]):
+        for entry in range(prices.shape[1]):
+            reached = np.flatnonzero(prices[symbol, entry:] >= targets[symbol, entry])
+            if len(reached):
+                expected[symbol, entry] = entry + reached[0]
+
+    np.testing.assert_array_equal(first_passage(prices, targets), expected)
+    np.testing.assert_array_equal(first_passage(prices[1], targets[1]), expected[1])